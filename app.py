@@ -6,44 +6,62 @@ import calendar
 
 from constants import DESP_CATS, REC_CATS, METS, TIPOS, ACCOUNTS
 from utils import fmt_currency, money_input
-from sheets import get_sheet, load_main_df, load_pm_df
+from sheets import (get_sheet, load_main_df, load_pm_df, load_plan_df, load_parc_df, load_metas_df,
+                    pre_carregar, painel_local,
+                    observar_alteracoes,
+                    BufferEscrita, FalhaEscrita)
 from period import obter_df_periodo
-from tabs import visao, receitas, detalhamento, fatura, parcelas, pagamentos, planejamento
+from ledger import ledger_de
+from installments import linha_plano, plano_de
+import perfil
+import tabs
+import transport
+
+# filtros das abas viram visões do livro (sem cópia) e nunca o alteram
+pd.set_option("mode.copy_on_write", True)
 
 st.set_page_config(page_title="Controle de Despesas", page_icon="📊",
                    layout="wide", initial_sidebar_state="expanded")
+transport.marcar_rerun(st)
+perfil.iniciar_rerun(st)
 
 # CSS
 st.markdown("""
 <style>
 div.block-container{max-width:none;padding-left:2rem;padding-right:2rem;}
-.stTabs [data-baseweb="tab-list"]{flex-wrap:wrap;}
-.stTabs [data-baseweb="tab"]{padding:6px 12px;}
 .tbl th{background:#4f81bd;color:#fff;text-align:left}
 .tbl tr:nth-child(even){background:#f2f2f2}
 .tbl td.center{text-align:center}.tbl td.right{text-align:right}
 </style>
 """, unsafe_allow_html=True)
 
-spreadsheet = get_sheet(st)
-df = load_main_df(st, spreadsheet)
-
-(df_mes, df_rec, df_desp, df_saldo, sel_mes, sel_ano, label_periodo,
- saldo_inicial, saldo_final, saldo_periodo,
- out_cc, variacao_caixa, saldo_final_caixa) = obter_df_periodo(st, df)
+spreadsheet = perfil.armazenamento(st, get_sheet(st, adiada=True))
+# reroda quando outra sessão gravar (cache das abas é comum ao processo)
+observar_alteracoes(st)
+
+# abas da planilha usadas pelas fontes preguiçosas do Contexto
+ABAS_FONTES = {"dfpm": "PagamentosMensais", "dfplan": "Planejamento", "dfmetas": "Metas"}
+# lê de uma vez Lancamentos, os parcelamentos (viram parcelas no livro) e o
+# que a aba aberta vai pedir; Parcelamentos só é criada no primeiro parcelamento
+with perfil.medir(st, "pre_carregar"):
+    pre_carregar(st, spreadsheet, ["Lancamentos", "Parcelamentos"]
+                 + [ABAS_FONTES[d] for d in tabs.aba_ativa(st).DEPENDE if d in ABAS_FONTES])
+with perfil.medir(st, "load_main_df + ledger"):
+    plano = plano_de(st, load_parc_df(st, spreadsheet))
+    df = ledger_de(st, load_main_df(st, spreadsheet), plano).visao()
+
+with perfil.medir(st, "obter_df_periodo"):
+    (df_mes, df_rec, df_desp, df_saldo, sel_mes, sel_ano, label_periodo,
+     saldo_inicial, saldo_final, saldo_periodo,
+     out_cc, variacao_caixa, saldo_final_caixa) = obter_df_periodo(st, df)
 
 # persist for other tabs
 st.session_state["sel_mes"] = sel_mes
 st.session_state["sel_ano"] = sel_ano
 
-abas = ["📊 Visão Geral","💰 Receitas","🔍 Detalhamento",
-        "💳 Resumo de Fatura","📅 Parcelas Futuras",
-        "💸 Pagamentos Mensais","📋 Planejamento"]
-(tab_visao, tab_rec, tab_det, tab_fat, tab_parc, tab_pag, tab_plan) = st.tabs(abas)
-
 # Sidebar utils
 if st.sidebar.button("🔄 Atualizar dados"):
-    load_main_df.clear(); st.rerun()
+    load_main_df.clear(completo=True); load_parc_df.clear(completo=True); st.rerun()
 
 # Novo registro
 st.sidebar.header("➕ Lançar novo registro")
@@ -79,25 +97,22 @@ with st.sidebar.form("novo_reg", clear_on_submit=True):
                 categoria, metodo = "Pagamento Cartão", "Transferência Bancária"
             valor = val if tipo == "Receita" else -abs(val)
 
-            registros = []
-            import dateutil.relativedelta
+            # parcelado no cartão: uma linha com o plano, as parcelas saem dele
             if metodo == "Cartão de Crédito" and parcelas > 1 and tipo != "Transferência":
-                v_parc = round(valor / parcelas, 2)
-                for i in range(parcelas):
-                    dt_parc = dt + dateutil.relativedelta.relativedelta(months=i)
-                    registros.append([
-                        dt_parc.strftime("%d/%m/%Y"), resp, tipo,
-                        f"{desc} ({i+1}/{parcelas})", categoria, metodo, f"{v_parc:.2f}"
-                    ])
+                aba, registro = "Parcelamentos", linha_plano(dt, resp, tipo, desc, categoria, metodo,
+                                                             valor, parcelas)
             else:
-                registros.append([
+                aba, registro = "Lancamentos", [
                     dt.strftime("%d/%m/%Y"), resp, tipo, desc, categoria, metodo, f"{valor:.2f}"
-                ])
+                ]
 
-            for reg in registros:
-                spreadsheet.sheet1.append_row(reg, value_input_option="USER_ENTERED")
-            st.success("Registro salvo!")
-            load_main_df.clear(); st.rerun()
+            try:
+                with BufferEscrita(st, spreadsheet) as buf:
+                    buf.anexar(aba, registro)
+            except FalhaEscrita as e:
+                st.error(str(e))
+            else:
+                st.success("Registro salvo!"); st.rerun()
 
 # Sidebar saldo manual
 st.sidebar.markdown("---")
@@ -113,40 +128,30 @@ with st.sidebar.form("form_saldo", clear_on_submit=True):
     btn_saldo = st.form_submit_button("Salvar saldo")
 
     if btn_saldo and nome_cta:
-        spreadsheet.sheet1.append_row(
-            [dt_saldo.strftime("%d/%m/%Y"), "Sistema", "Saldo",
-             nome_cta, "Saldo", nome_cta, f"{val_saldo:.2f}"],
-            value_input_option="USER_ENTERED"
-        )
-        st.success("Saldo registrado!"); load_main_df.clear(); st.rerun()
+        try:
+            with BufferEscrita(st, spreadsheet) as buf:
+                buf.anexar("Lancamentos", [dt_saldo.strftime("%d/%m/%Y"), "Sistema", "Saldo",
+                                           nome_cta, "Saldo", nome_cta, f"{val_saldo:.2f}"])
+        except FalhaEscrita as e:
+            st.error(str(e))
+        else:
+            st.success("Saldo registrado!"); st.rerun()
     elif btn_saldo:
         st.error("Informe o nome da conta.")
 
-# Tabs rendering
-with tab_visao:
-    visao.render(st, df_mes, df_rec, df_desp, df_saldo,
-                 label_periodo, saldo_inicial, saldo_final, saldo_periodo,
-                 out_cc, variacao_caixa, saldo_final_caixa)
-
-with tab_rec:
-    receitas.render(st, df_rec)
-
-with tab_det:
-    detalhamento.render(st, df, df_mes, label_periodo, spreadsheet)
-
-with tab_fat:
-    fatura.render(st, df, label_periodo)
-
-with tab_parc:
-    import pandas as pd
-    st.session_state["__today__"] = pd.to_datetime("today")
-    parcelas.render(st, df)
-
-with tab_pag:
-    from sheets import ws_pm, load_pm_df
-    dfpm = load_pm_df(st, spreadsheet)()
-    pagamentos.render(st, df_mes, spreadsheet, dfpm)
-
-with tab_plan:
-    from tabs import planejamento as plan
-    plan.render(st, spreadsheet, df_desp, sel_ano, sel_mes)
+# Abas: só a selecionada é calculada; Pagamentos e Planejamento só leem
+# a planilha quando abertas
+ctx = tabs.Contexto(
+    st, df.attrs.get("versao"),
+    fontes={"dfpm":   lambda: load_pm_df(st, spreadsheet),
+            "dfplan": lambda: load_plan_df(st, spreadsheet),
+            "dfmetas": lambda: load_metas_df(st, spreadsheet)},
+    spreadsheet=spreadsheet, df=df, parcelamentos=plano, df_mes=df_mes, df_rec=df_rec, df_desp=df_desp,
+    df_saldo=df_saldo, sel_mes=sel_mes, sel_ano=sel_ano, label_periodo=label_periodo,
+    saldos=dict(saldo_inicial=saldo_inicial, saldo_final=saldo_final, saldo_periodo=saldo_periodo,
+                out_cc=out_cc, variacao_caixa=variacao_caixa, saldo_final_caixa=saldo_final_caixa),
+)
+painel_local(st, spreadsheet)
+tabs.renderizar(st, ctx)
+transport.painel(st)
+perfil.painel(st)
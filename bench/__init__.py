@@ -0,0 +1 @@
+# bench — benchmarks do caminho de dados com um livro sintético (python -m bench)
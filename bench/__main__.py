@@ -0,0 +1,349 @@
+# bench/__main__.py — tempos e pico de memória do caminho de dados, por tamanho do livro
+#
+#   python -m bench                               # 10k, 100k e 1M linhas
+#   python -m bench --tamanhos 10000 --etapas ledger periodo_rerun
+#   python -m bench --latencia 0 --sem-salvar
+#
+# Cada execução grava bench/resultados/<data>-<commit>.json e compara com a
+# anterior (ou com --comparar ARQ): etapas que ficaram mais de --limite mais
+# lentas aparecem marcadas.
+from __future__ import annotations
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import sheets
+from billing import Faturas
+from bench.backend import planilha_local
+from bench.gerador import gerar_lancamentos
+from bench.st_falso import StreamlitFalso
+from ledger import Ledger
+from period import _montar_indice, obter_df_periodo
+from search import IndiceBusca
+from trends import Cubo, indicadores
+from utils import _montar_secao, agrupar
+
+pd.set_option("mode.copy_on_write", True)  # como no app.py
+
+RAIZ = Path(__file__).resolve().parent.parent
+_TAMANHOS = [10_000, 100_000, 1_000_000]
+_PASTA = Path(__file__).resolve().parent / "resultados"
+_CONSULTAS = ["super", "pao de acucar", "uber 1", "farmacia drogasil", "zzz"]
+_RUIDO = 0.005   # s; diferenças menores que isso não contam como regressão
+_SECRETS = {
+    "cache": {"snapshot": False, "observar": 0},
+    "local": {"ativo": False},
+    "journal": {"ativo": False},
+}
+
+Preparar = Callable[[Dict[str, Any]], Callable[[], Any]]
+
+
+# ------------------------- Insumos (fora da medição) ------------------------- #
+def _df(ctx: Dict[str, Any]) -> pd.DataFrame:
+    if "df" not in ctx:
+        h = sheets._HEADERS_MAIN
+        df = sheets._tipar(sheets._linhas_to_df(h, ctx["linhas"], h), sheets._ESQUEMAS["Lancamentos"])
+        df.attrs["versao"] = f"bench-{len(ctx['linhas'])}"
+        ctx["df"] = df
+    return ctx["df"]
+
+
+def _livro(ctx: Dict[str, Any]) -> Ledger:
+    if "livro" not in ctx:
+        ctx["livro"] = Ledger(_df(ctx))
+    return ctx["livro"]
+
+
+def _planilha(ctx: Dict[str, Any]):
+    if "ss" not in ctx:
+        arq = Path(ctx["tmp"]) / f"planilha-{len(ctx['linhas'])}.sqlite3"
+        ctx["ss"] = planilha_local(arq, "Lancamentos", sheets._HEADERS_MAIN, ctx["linhas"],
+                                   ctx["latencia"])
+    return ctx["ss"]
+
+
+def _rerun(st, ss) -> None:
+    """O caminho de dados do topo do app.py até o período selecionado."""
+    sheets.pre_carregar(st, ss, ["Lancamentos"])
+    obter_df_periodo(st, sheets.load_main_df(st, ss))
+
+
+# ------------------------- Etapas ------------------------- #
+def _parse(ctx):
+    h, linhas = sheets._HEADERS_MAIN, ctx["linhas"]
+    return lambda: sheets._tipar(sheets._linhas_to_df(h, linhas, h), sheets._ESQUEMAS["Lancamentos"])
+
+
+def _ledger(ctx):
+    df = _df(ctx)
+    return lambda: Ledger(df)
+
+
+def _indice_mensal(ctx):
+    livro = _livro(ctx)
+    return lambda: _montar_indice(livro)
+
+
+def _periodo_frio(ctx):
+    st, df = StreamlitFalso(_SECRETS), _df(ctx)
+    return lambda: obter_df_periodo(st, df)
+
+
+def _periodo_rerun(ctx):
+    st, df = StreamlitFalso(_SECRETS), _df(ctx)
+    obter_df_periodo(st, df)
+    return lambda: obter_df_periodo(st, df)
+
+
+def _fatura_motor(ctx):
+    livro = _livro(ctx)
+    return lambda: Faturas(livro)
+
+
+def _fatura_ciclo(ctx):
+    livro = _livro(ctx)
+    df, fat = livro.visao(), Faturas(livro)
+    ciclo = fat.ciclos().index[-1]
+
+    def _run():
+        pos_desp, pos_cred = fat.fatura(None, ciclo)
+        return df.iloc[pos_desp], df.iloc[pos_cred]
+    return _run
+
+
+def _tendencias_cubo(ctx):
+    livro = _livro(ctx)
+    return lambda: Cubo(livro)
+
+
+def _tendencias_fatia(ctx):
+    cubo = Cubo(_livro(ctx))
+    cat = cubo.opcoes("Categoria")[:3]
+
+    def _run():  # o que a aba refaz a cada mudança de filtro
+        ind = indicadores(cubo.serie("Despesas", {"Categoria": cat}))
+        return ind, cubo.por("Categoria", "Despesas", cubo.meses[-12], cubo.meses[-1])
+    return _run
+
+
+def _busca_indice(ctx):
+    norm = _livro(ctx).norm
+
+    def _run():
+        IndiceBusca().adicionar(norm)
+    return _run
+
+
+def _busca_consulta(ctx):
+    idx = IndiceBusca()
+    idx.adicionar(_livro(ctx).norm)
+    return lambda: [idx.buscar(q) for q in _CONSULTAS]
+
+
+def _desp(ctx) -> pd.DataFrame:
+    df = _livro(ctx).visao()
+    return df[df["Tipo"] == "Despesa"]  # o livro inteiro: pior caso de um período longo
+
+
+def _secao_agrupar(ctx):
+    desp = _desp(ctx)
+    return lambda: agrupar(desp, "Categoria")
+
+
+def _secao(ctx):
+    desp = _desp(ctx)
+    return lambda: _montar_secao(desp, "Categoria", "Valor", "Lançamentos", None)
+
+
+def _rerun_frio(ctx):
+    ss = _planilha(ctx)
+    st = StreamlitFalso(_SECRETS)  # processo novo: nada em cache
+    return lambda: _rerun(st, ss)
+
+
+def _rerun_cache(ctx):
+    ss = _planilha(ctx)
+    st = StreamlitFalso(_SECRETS)
+    _rerun(st, ss)
+    return lambda: _rerun(st, ss)
+
+
+def _rerun_linha_nova(ctx):
+    ss = _planilha(ctx)
+    st = StreamlitFalso(_SECRETS)
+    _rerun(st, ss)
+    # o que BufferEscrita faz depois de anexar: revisão nova e cache vencido
+    ss.base.anexar("Lancamentos", [ctx["linhas"][-1]])
+    sheets.invalidar(st, ss, "Lancamentos", completo=False)
+    return lambda: _rerun(st, ss)
+
+
+ETAPAS: List[Tuple[str, Preparar]] = [
+    ("parse", _parse),
+    ("ledger", _ledger),
+    ("indice_mensal", _indice_mensal),
+    ("periodo_frio", _periodo_frio),
+    ("periodo_rerun", _periodo_rerun),
+    ("fatura_motor", _fatura_motor),
+    ("fatura_ciclo", _fatura_ciclo),
+    ("tendencias_cubo", _tendencias_cubo),
+    ("tendencias_fatia", _tendencias_fatia),
+    ("busca_indice", _busca_indice),
+    ("busca_consulta", _busca_consulta),
+    ("secao_agrupar", _secao_agrupar),
+    ("secao", _secao),
+    ("rerun_frio", _rerun_frio),
+    ("rerun_cache", _rerun_cache),
+    ("rerun_linha_nova", _rerun_linha_nova),
+]
+
+
+# ------------------------- Medição ------------------------- #
+def _medir(preparar: Preparar, ctx: Dict[str, Any], repeticoes: int) -> Dict[str, Any]:
+    """Mediana do tempo em `repeticoes` execuções e pico de memória numa execução à parte
+    (tracemalloc deixa o código mais lento; não entra na conta do tempo)."""
+    tempos, chamadas = [], {}
+    for _ in range(repeticoes):
+        fn = preparar(ctx)
+        ss = ctx.get("ss")
+        antes = dict(ss.chamadas) if ss is not None else {}
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t0)
+        if ss is not None:
+            chamadas = {k: v - antes.get(k, 0) for k, v in ss.chamadas.items() if v - antes.get(k, 0)}
+    fn = preparar(ctx)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    out = {"s": statistics.median(tempos), "s_min": min(tempos), "pico_mb": round(pico / 2 ** 20, 2)}
+    if chamadas:
+        out["chamadas"] = chamadas
+    return out
+
+
+def executar(tamanhos: List[int], etapas: List[str], repeticoes: int, anos: int,
+             semente: int, latencia: float) -> Dict[str, Dict[str, Any]]:
+    resultados: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        for n in tamanhos:
+            t0 = time.perf_counter()
+            ctx = {"linhas": gerar_lancamentos(n, anos, semente), "tmp": tmp, "latencia": latencia}
+            print(f"\n== {n:,} linhas (geradas em {time.perf_counter() - t0:.1f} s)")
+            rep = repeticoes if n < 1_000_000 else 1  # 1M: uma rodada já leva minutos
+            por_etapa = resultados[str(n)] = {}
+            for nome, preparar in ETAPAS:
+                if etapas and nome not in etapas:
+                    continue
+                try:
+                    por_etapa[nome] = r = _medir(preparar, ctx, rep)
+                except Exception as e:  # uma etapa quebrada não derruba as outras
+                    por_etapa[nome] = {"erro": f"{type(e).__name__}: {e}"}
+                    print(f"  {nome:<18} ERRO {e}")
+                    continue
+                print(f"  {nome:<18} {r['s'] * 1000:>10.1f} ms {r['pico_mb']:>9.1f} MB")
+    return resultados
+
+
+# ------------------------- Histórico ------------------------- #
+def _commit() -> Tuple[str, bool]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        sujo = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ,
+                                   capture_output=True, text=True).stdout.strip())
+        return rev, sujo
+    except Exception:
+        return "desconhecido", False
+
+
+def salvar(pasta: Path, corpo: Dict[str, Any]) -> Path:
+    pasta.mkdir(parents=True, exist_ok=True)
+    arq = pasta / f"{time.strftime('%Y%m%d-%H%M%S')}-{corpo['commit']}.json"
+    arq.write_text(json.dumps(corpo, ensure_ascii=False, indent=1), encoding="utf-8")
+    return arq
+
+
+def _anterior(pasta: Path, exceto: Optional[Path]) -> Optional[Path]:
+    arqs = sorted(p for p in pasta.glob("*.json") if p != exceto)
+    return arqs[-1] if arqs else None
+
+
+def comparar(atual: Dict[str, Any], base: Dict[str, Any], limite: float) -> List[str]:
+    """Imprime atual x base; devolve as etapas que ficaram mais lentas que o limite."""
+    print(f"\n== comparação com {base['commit']} ({base['quando']})")
+    regressoes = []
+    for n, etapas in atual["resultados"].items():
+        for nome, r in etapas.items():
+            b = base["resultados"].get(n, {}).get(nome)
+            if b is None or "s" not in b or "s" not in r:
+                continue
+            dt = r["s"] / b["s"] - 1 if b["s"] else 0.0
+            dm = r["pico_mb"] / b["pico_mb"] - 1 if b["pico_mb"] else 0.0
+            pior = dt > limite and r["s"] - b["s"] > _RUIDO
+            marca = "▲" if pior else ("▼" if dt < -limite else " ")
+            print(f"{marca} {int(n):>9,} {nome:<18} {b['s'] * 1000:>9.1f} → {r['s'] * 1000:>9.1f} ms "
+                  f"({dt:+.0%})   {b['pico_mb']:>8.1f} → {r['pico_mb']:>8.1f} MB ({dm:+.0%})")
+            if pior:
+                regressoes.append(f"{nome} @ {n}")
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench", description="Benchmark do caminho de dados (rode da raiz do repositório).")
+    p.add_argument("--tamanhos", type=int, nargs="+", default=_TAMANHOS)
+    p.add_argument("--etapas", nargs="+", default=[], choices=[e for e, _ in ETAPAS])
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.add_argument("--anos", type=int, default=5)
+    p.add_argument("--semente", type=int, default=0)
+    p.add_argument("--latencia", type=float, default=0.15,
+                   help="s por chamada ao armazenamento simulado (etapas rerun_*)")
+    p.add_argument("--pasta", type=Path, default=_PASTA)
+    p.add_argument("--comparar", type=Path, help="resultado base (padrão: o último da pasta)")
+    p.add_argument("--limite", type=float, default=0.2, help="piora relativa que conta como regressão")
+    p.add_argument("--sem-salvar", action="store_true")
+    p.add_argument("--falhar-se-regredir", action="store_true")
+    a = p.parse_args(argv)
+
+    commit, sujo = _commit()
+    corpo = {
+        "quando": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "sujo": sujo,
+        "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+        "plataforma": platform.platform(), "anos": a.anos, "semente": a.semente,
+        "latencia": a.latencia, "repeticoes": a.repeticoes,
+        "resultados": executar(a.tamanhos, a.etapas, a.repeticoes, a.anos, a.semente, a.latencia),
+    }
+    arq = None if a.sem_salvar else salvar(a.pasta, corpo)
+    if arq is not None:
+        print(f"\nresultado gravado em {arq}")
+
+    base_arq = a.comparar or _anterior(a.pasta, arq)
+    if base_arq is None:
+        return 0
+    base = json.loads(Path(base_arq).read_text(encoding="utf-8"))
+    regressoes = comparar(corpo, base, a.limite)
+    if regressoes:
+        print(f"\n{len(regressoes)} etapa(s) mais lenta(s) que o limite: {', '.join(regressoes)}")
+    return 1 if regressoes and a.falhar_se_regredir else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# bench/backend.py — "Google Sheets" offline para medir reruns de ponta a ponta
+#
+# Um storage.ArmazenamentoLocal com a latência de ida e volta da API somada a
+# cada chamada, e a contagem de chamadas por método.
+from __future__ import annotations
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import storage
+
+_LATENCIA_PADRAO = 0.15   # s por chamada; um values:batchGet pequeno costuma ficar nisso
+_LOTE = 50_000            # linhas por INSERT ao popular
+
+
+class ArmazenamentoSimulado(storage.Armazenamento):
+    """Encaminha para `base` depois de `latencia` segundos (0 = só o custo local)."""
+
+    def __init__(self, base: storage.Armazenamento, latencia: float = _LATENCIA_PADRAO):
+        self.base = base
+        self.id = base.id
+        self.latencia = float(latencia)
+        self.chamadas: Counter = Counter()
+
+    def _ida(self, metodo: str) -> None:
+        self.chamadas[metodo] += 1
+        if self.latencia > 0:
+            time.sleep(self.latencia)
+
+    def revisao(self) -> Optional[str]:
+        self._ida("revisao")
+        return self.base.revisao()
+
+    def existe(self, title: str) -> bool:
+        existe = self.base.existe(title)
+        if not existe:  # o Sheets relê a lista de abas quando não acha a aba
+            self._ida("existe")
+        return existe
+
+    def garantir(self, title: str, headers: List[str]) -> None:
+        # o ArmazenamentoSheets guarda a lista de abas: só custa na primeira vez
+        self.base.garantir(title, headers)
+
+    def ler(self, titles: List[str]) -> Dict[str, storage.Linhas]:
+        self._ida("ler")
+        return self.base.ler(titles)
+
+    def ler_linhas(self, title: str, faixas: List[Tuple[int, Optional[int]]],
+                   largura: int) -> List[storage.Linhas]:
+        self._ida("ler_linhas")
+        return self.base.ler_linhas(title, faixas, largura)
+
+    def anexar(self, title: str, linhas: storage.Linhas) -> Optional[int]:
+        self._ida("anexar")
+        return self.base.anexar(title, linhas)
+
+    def atualizar(self, edicoes: Dict[str, Dict[int, List[Any]]]) -> None:
+        self._ida("atualizar")
+        self.base.atualizar(edicoes)
+
+    def apagar(self, title: str, linhas: List[int]) -> None:
+        self._ida("apagar")
+        self.base.apagar(title, linhas)
+
+    def substituir(self, title: str, inicio: int, linhas: storage.Linhas) -> None:
+        self._ida("substituir")
+        self.base.substituir(title, inicio, linhas)
+
+
+def planilha_local(arq: Path, title: str, headers: List[str], linhas: storage.Linhas,
+                   latencia: float = _LATENCIA_PADRAO) -> ArmazenamentoSimulado:
+    """Arquivo SQLite novo com a aba `title` preenchida, atrás da latência simulada."""
+    arq = Path(arq)
+    if arq.exists():
+        arq.unlink()
+    base = storage.ArmazenamentoLocal(arq)
+    base.garantir(title, headers)
+    for i in range(0, len(linhas), _LOTE):
+        base.anexar(title, linhas[i:i + _LOTE])
+    return ArmazenamentoSimulado(base, latencia)
@@ -0,0 +1,148 @@
+# bench/gerador.py — aba "Lancamentos" sintética, no formato gravado pelo app
+#
+# Mesmas colunas e textos que app.py grava (data dd/mm/aaaa, valor "-12.34"):
+# saldos mensais por conta, pagamentos de fatura, receitas e despesas com as
+# categorias de constants.py e compras parceladas "Descrição (i/n)".
+from __future__ import annotations
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from constants import ACCOUNTS, DESP_CATS, METS, REC_CATS
+
+_RESPONSAVEIS = ["Família", "Helena", "Ricardo"]
+_LOJAS = [
+    "Pão de Açúcar", "Carrefour", "Atacadão", "Big Box", "Dona de Casa", "Outback", "Madero",
+    "Coco Bambu", "iFood", "Shell", "Ipiranga", "Petrobras", "Leroy Merlin", "Drogasil",
+    "Pague Menos", "Renner", "Riachuelo", "C&A", "Netflix", "Spotify", "Amazon", "Mercado Livre",
+    "Magazine Luiza", "Decathlon", "Cobasi", "Petz", "Smart Fit", "Livraria Cultura", "Estapar",
+    "Detran", "Receita Federal", "Oficina do Zé", "Lavanderia", "Salão Bela", "Escola Vila Verde",
+    "Condomínio Jardins das Acácias", "Internet Corumbá", "Luz Neoenergia Mangueiral",
+    "Cinemark", "Uber",
+]
+# peso de cada categoria de despesa (as do dia a dia dominam)
+_PESO_DESP = {"Supermercado": 8, "Restaurante": 6, "Uber": 4, "Gasolina": 3, "Farmácia": 2,
+              "Assinaturas": 2, "Lazer": 2, "Moradia": 1.5, "Estornos": 0.3, "Ressarcimentos": 0.3}
+_PESO_REC = {"Salário": 6, "Vendas": 2, "Estorno": 1.5, "Ressarcimento": 1}
+_METODOS_DESP = {"Cartão de Crédito": 35, "Pix": 25, "Cartão de Débito": 20, "Dinheiro": 5,
+                 "Transferência Bancária": 10, "Vale-Presente": 3, "Outra": 2}
+_METODOS_REC = {"Crédito em Conta": 5, "Pix": 3, "Transferência Bancária": 2}
+_FRACAO_RECEITAS = 0.08
+_FRACAO_PARCELADAS = 0.25   # das despesas: linhas que pertencem a compras parceladas
+
+
+def _pesos(opcoes: List[str], pesos: dict) -> np.ndarray:
+    p = np.array([float(pesos.get(o, 1.0)) for o in opcoes])
+    return p / p.sum()
+
+
+def _escolher(rng: np.random.Generator, opcoes: List[str], pesos: dict, n: int) -> np.ndarray:
+    return np.asarray(opcoes, dtype=object)[rng.choice(len(opcoes), size=n, p=_pesos(opcoes, pesos))]
+
+
+def _datas(dias: np.ndarray) -> np.ndarray:
+    return pd.to_datetime(dias.astype("datetime64[D]")).strftime("%d/%m/%Y").to_numpy(dtype=object)
+
+
+def _valores(v: np.ndarray) -> np.ndarray:
+    return np.char.mod("%.2f", np.round(v, 2)).astype(object)
+
+
+def gerar_lancamentos(n: int, anos: int = 5, semente: int = 0,
+                      fim: Optional[pd.Timestamp] = None) -> List[List[Any]]:
+    """`n` linhas de lançamentos (sem cabeçalho) cobrindo os últimos `anos` anos.
+
+    A mesma `semente` gera sempre as mesmas linhas (para comparar versões).
+    As linhas saem em ordem de registro: cada compra parcelada fica junta,
+    com as parcelas nos meses seguintes, como o formulário do app grava.
+    """
+    rng = np.random.default_rng(semente)
+    fim = pd.Timestamp(fim if fim is not None else pd.Timestamp.today()).normalize()
+    ini = fim - pd.DateOffset(years=anos)
+    d0, d1 = np.datetime64(ini.date(), "D"), np.datetime64(fim.date(), "D")
+    span = int((d1 - d0).astype(int))
+    meses = np.arange(d0.astype("datetime64[M]"), d1.astype("datetime64[M]") + 1)
+    contas = [c for c in ACCOUNTS if c != "Outro"]
+
+    blocos = []  # (dia de registro, colunas...)
+
+    # saldo declarado no último dia de cada mês, por conta
+    n_saldo = min(n, len(meses) * len(contas))
+    k = np.arange(n_saldo)
+    dia = np.minimum((meses[k // len(contas)] + 1).astype("datetime64[D]") - 1, d1)
+    conta = np.asarray(contas, dtype=object)[k % len(contas)]
+    blocos.append((dia, np.full(n_saldo, "Sistema", dtype=object), np.full(n_saldo, "Saldo", dtype=object),
+                   conta, np.full(n_saldo, "Saldo", dtype=object), conta,
+                   _valores(rng.lognormal(8.5, 1.0, n_saldo))))
+
+    # pagamento das faturas (Itaú e BRB), dia 10
+    n_pag = min(n - n_saldo, 2 * len(meses))
+    k = np.arange(n_pag)
+    dia = meses[k // 2].astype("datetime64[D]") + 9
+    blocos.append((dia, np.full(n_pag, "Família", dtype=object), np.full(n_pag, "Transferência", dtype=object),
+                   np.where(k % 2 == 0, "Fatura Itaú", "Fatura BRB").astype(object),
+                   np.full(n_pag, "Pagamento Cartão", dtype=object),
+                   np.full(n_pag, "Transferência Bancária", dtype=object),
+                   _valores(-rng.lognormal(8.0, 0.4, n_pag))))
+
+    resto = n - n_saldo - n_pag
+    n_rec = int(resto * _FRACAO_RECEITAS)
+    n_desp = resto - n_rec
+
+    # receitas
+    cat = _escolher(rng, REC_CATS, _PESO_REC, n_rec)
+    resp = np.asarray(_RESPONSAVEIS[1:], dtype=object)[rng.integers(0, 2, n_rec)]
+    desc = np.where(cat == "Salário", np.char.add("Salário ", resp.astype(str)),
+                    np.char.add(cat.astype(str), np.char.add(" ", rng.integers(1, 50, n_rec).astype(str))))
+    desc = desc.astype(object)
+    blocos.append((d0 + rng.integers(0, span + 1, n_rec), resp, np.full(n_rec, "Receita", dtype=object),
+                   desc, cat, _escolher(rng, list(_METODOS_REC), _METODOS_REC, n_rec),
+                   _valores(rng.lognormal(7.5, 1.0, n_rec))))
+
+    # despesas parceladas: grupos de 2 a 12 parcelas mensais, no cartão de crédito
+    alvo = int(n_desp * _FRACAO_PARCELADAS)
+    tam = rng.integers(2, 13, max(1, alvo // 6))
+    tam = tam[np.cumsum(tam) <= alvo]
+    n_parc = int(tam.sum())
+    grupos = np.repeat(np.arange(len(tam)), tam)
+    i = np.arange(n_parc) - np.repeat(np.cumsum(tam) - tam, tam)
+    base = d0 + rng.integers(0, span + 1, len(tam))
+    dia_mes = np.minimum((base - base.astype("datetime64[M]")).astype(int), 27)
+    dia = (base.astype("datetime64[M]")[grupos] + i).astype("datetime64[D]") + dia_mes[grupos]
+    loja = np.asarray(_LOJAS, dtype=object)[rng.integers(0, len(_LOJAS), len(tam))]
+    desc = np.char.add(np.char.add(loja[grupos].astype(str), " ("),
+                       np.char.add(np.char.add((i + 1).astype(str), "/"),
+                                   np.char.add(tam[grupos].astype(str), ")"))).astype(object)
+    total = rng.lognormal(6.5, 0.8, len(tam))
+    blocos.append((base[grupos], _escolher(rng, _RESPONSAVEIS, {}, len(tam))[grupos],
+                   np.full(n_parc, "Despesa", dtype=object), desc,
+                   _escolher(rng, DESP_CATS, _PESO_DESP, len(tam))[grupos],
+                   np.full(n_parc, "Cartão de Crédito", dtype=object),
+                   _valores(-(total / tam)[grupos]), dia))
+
+    # despesas avulsas
+    n_av = n_desp - n_parc
+    desc = np.char.add(np.asarray(_LOJAS)[rng.integers(0, len(_LOJAS), n_av)],
+                       np.char.add(" ", rng.integers(1, 60, n_av).astype(str))).astype(object)
+    blocos.append((d0 + rng.integers(0, span + 1, n_av), _escolher(rng, _RESPONSAVEIS, {}, n_av),
+                   np.full(n_av, "Despesa", dtype=object), desc,
+                   _escolher(rng, DESP_CATS, _PESO_DESP, n_av),
+                   _escolher(rng, [m for m in METS if m != "Crédito em Conta"], _METODOS_DESP, n_av),
+                   _valores(-rng.lognormal(4.0, 1.0, n_av))))
+
+    registro = np.concatenate([b[0] for b in blocos])
+    # parcelas saem com a data da parcela; as demais linhas, com a do registro
+    data = np.concatenate([b[7] if len(b) > 7 else b[0] for b in blocos])
+    colunas = [np.concatenate([b[c] for b in blocos]) for c in range(1, 7)]
+    ordem = np.argsort(registro, kind="stable")
+    tabela = np.column_stack([_datas(data)] + colunas)[ordem]
+    return tabela.tolist()
+
+
+def gerar_df(n: int, anos: int = 5, semente: int = 0,
+             fim: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """gerar_lancamentos já tipado como o load_main_df devolve (índice = linha da planilha)."""
+    from sheets import _ESQUEMAS, _HEADERS_MAIN, _linhas_to_df, _tipar
+    linhas = gerar_lancamentos(n, anos, semente, fim)
+    return _tipar(_linhas_to_df(_HEADERS_MAIN, linhas, _HEADERS_MAIN), _ESQUEMAS["Lancamentos"])
@@ -0,0 +1,71 @@
+# bench/st_falso.py — o mínimo do streamlit que sheets/period/search usam, fora do servidor
+#
+# cache_resource memoriza como o streamlit (argumentos com "_" na frente não
+# entram na chave; max_entries respeitado), secrets é um dict comum e os
+# widgets devolvem o valor padrão. Basta para rodar o caminho de dados de um
+# rerun sem navegador.
+from __future__ import annotations
+import inspect
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class _CacheRecursos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_funcao: Dict[tuple, OrderedDict] = {}
+
+    def __call__(self, fn: Optional[Callable] = None, *, max_entries: Optional[int] = None, **_):
+        if fn is None:
+            return lambda f: self(f, max_entries=max_entries)
+        assinatura = inspect.signature(fn)
+        # o streamlit identifica a função pelo código, não pelo objeto (redefinida a cada chamada)
+        id_fn = (fn.__module__, fn.__qualname__)
+
+        def _memorizada(*args, **kwargs):
+            argumentos = assinatura.bind(*args, **kwargs).arguments
+            chave = tuple((k, v) for k, v in argumentos.items() if not k.startswith("_"))
+            with self._lock:
+                memo = self._por_funcao.setdefault(id_fn, OrderedDict())
+                if chave in memo:
+                    memo.move_to_end(chave)
+                    return memo[chave]
+            valor = fn(*args, **kwargs)
+            with self._lock:
+                memo[chave] = valor
+                while max_entries is not None and len(memo) > max_entries:
+                    memo.popitem(last=False)
+            return valor
+
+        return _memorizada
+
+    def clear(self) -> None:
+        with self._lock:
+            self._por_funcao.clear()
+
+
+class StreamlitFalso:
+    """Substituto do módulo `st` para benchmarks: estado em memória, sem UI."""
+
+    def __init__(self, secrets: Optional[Dict[str, Any]] = None):
+        self.secrets = secrets or {}
+        self.session_state: Dict[str, Any] = {}
+        self.query_params: Dict[str, str] = {}
+        self.cache_resource = _CacheRecursos()
+        self.sidebar = self
+
+    @contextmanager
+    def expander(self, *_, **__):
+        yield self
+
+    def selectbox(self, _rotulo, opcoes, index=0, **_):
+        opcoes = list(opcoes)
+        return opcoes[index] if opcoes else None
+
+    def nova_sessao(self) -> "StreamlitFalso":
+        """Outra sessão do mesmo processo: session_state novo, caches compartilhados."""
+        outra = StreamlitFalso(self.secrets)
+        outra.cache_resource = self.cache_resource
+        return outra
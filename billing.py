@@ -0,0 +1,198 @@
+# billing.py — ciclos de fatura dos cartões de crédito
+#
+# Cada cartão (valor da coluna Método que contém "cartão de crédito") tem dia
+# de fechamento e de vencimento, configuráveis no secrets.toml:
+#
+#   [cartoes."Cartão de Crédito Itaú"]
+#   fechamento = 3
+#   vencimento = 10
+#
+# Sem configuração, a fatura é o mês civil (fecha no último dia) e vence no dia
+# 10 do mês seguinte. A compra feita depois do fechamento cai na fatura do mês
+# seguinte; as parcelas, uma por mês, seguem a mesma regra.
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ledger import Ledger, ledger_de
+
+_FECHAMENTO_PADRAO = 31   # dia além do fim do mês = último dia
+_VENCIMENTO_PADRAO = 10
+_CARTAO = r"\bcartao\s*de\s*credito\b"
+ESTORNOS = ["estorno", "estornos"]   # Categoria (normalizada) das receitas que abatem a fatura
+
+Config = Dict[str, Tuple[int, int]]
+
+
+def configuracao(st) -> Config:
+    """{método: (dia de fechamento, dia de vencimento)} lido de [cartoes] no secrets."""
+    try:
+        secao = dict(st.secrets.get("cartoes", {}))
+    except Exception:
+        return {}
+    out = {}
+    for nome, v in secao.items():
+        try:
+            out[str(nome).strip()] = (int(v.get("fechamento", _FECHAMENTO_PADRAO)),
+                                      int(v.get("vencimento", _VENCIMENTO_PADRAO)))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return out
+
+
+# ---- datas dos ciclos (ciclo = mês do fechamento, como ordinal de datetime64[M]) ---- #
+def _dias_no_mes(meses: np.ndarray) -> np.ndarray:
+    m = meses.astype("datetime64[M]")
+    return ((m + 1).astype("datetime64[D]") - m.astype("datetime64[D]")).astype(np.int64)
+
+
+def _no_mes(meses: np.ndarray, dia: int) -> np.ndarray:
+    """Dia `dia` de cada mês (limitado ao último dia), em datetime64[D]."""
+    m = np.asarray(meses, dtype=np.int64).astype("datetime64[M]")
+    return m.astype("datetime64[D]") + (np.minimum(dia, _dias_no_mes(m)) - 1)
+
+
+def _ciclo(datas: np.ndarray, fechamento: int) -> np.ndarray:
+    """Ciclo de cada data: o mês dela, ou o seguinte se passou do fechamento."""
+    m = datas.astype("datetime64[M]")
+    dia = (datas.astype("datetime64[D]") - m.astype("datetime64[D]")).astype(np.int64) + 1
+    return m.astype(np.int64) + (dia > np.minimum(fechamento, _dias_no_mes(m)))
+
+
+def _periodos(ciclos: np.ndarray) -> pd.PeriodIndex:
+    return pd.DatetimeIndex(np.asarray(ciclos, dtype=np.int64).astype("datetime64[M]")).to_period("M")
+
+
+class _Cartao:
+    """Lançamentos de um cartão ordenados por data, com os totais de cada ciclo."""
+
+    def __init__(self, nome: str, fechamento: int, vencimento: int,
+                 datas: np.ndarray, pos: np.ndarray, despesa: np.ndarray, valor: np.ndarray):
+        self.nome = nome
+        self.fechamento = fechamento
+        self.vencimento = vencimento
+        self.datas = datas        # datetime64[ns], crescente
+        self.pos = pos            # posição (iloc) no livro
+        self.despesa = despesa    # False = crédito (estorno)
+
+        ciclo = _ciclo(datas, fechamento)
+        g = pd.DataFrame({
+            "ciclo": ciclo,
+            "gastos": np.where(despesa, np.abs(valor), 0.0),
+            "creditos": np.where(despesa, 0.0, valor),
+            "lancamentos": np.ones(len(ciclo), dtype=np.int64),
+        }).groupby("ciclo", sort=True).sum()
+        c = g.index.to_numpy()
+        mes_venc = c + (0 if vencimento > fechamento else 1)
+        self.ciclos = pd.DataFrame({
+            "abertura": _no_mes(c - 1, fechamento) + 1,
+            "fechamento": _no_mes(c, fechamento),
+            "vencimento": _no_mes(mes_venc, vencimento),
+            "gastos": g["gastos"].to_numpy(),
+            "creditos": g["creditos"].to_numpy(),
+            "total": (g["gastos"] - g["creditos"]).clip(lower=0.0).to_numpy(),
+            "lancamentos": g["lancamentos"].to_numpy(),
+        }, index=_periodos(c))
+
+    def fatia(self, ini, fim) -> slice:
+        """Lançamentos com data em [ini, fim] (busca binária nas datas ordenadas)."""
+        a = np.searchsorted(self.datas, np.datetime64(pd.Timestamp(ini).normalize(), "ns"), side="left")
+        b = np.searchsorted(self.datas, np.datetime64(pd.Timestamp(fim).normalize(), "ns"), side="right")
+        return slice(int(a), int(b))
+
+    def fatia_ciclo(self, ciclo: pd.Period) -> slice:
+        o = ciclo.ordinal
+        ini = _no_mes(np.array([o - 1]), self.fechamento)[0] + 1
+        fim = _no_mes(np.array([o]), self.fechamento)[0]
+        return self.fatia(ini, fim)
+
+
+class Faturas:
+    """Faturas de todos os cartões do livro, montadas uma vez por versão dos dados.
+
+    Guarda só despesas e estornos no cartão, separados por cartão e ordenados
+    por data: qualquer fatura ou intervalo vira uma fatia por busca binária, e
+    o total de cada ciclo (gastos - estornos) já vem calculado.
+    """
+
+    def __init__(self, livro: Ledger, config: Optional[Config] = None):
+        config = config or {}
+        df, norm = livro.df, livro.norm
+        met = norm["Método de Pagamento/Recebimento"]
+        if isinstance(met.dtype, pd.CategoricalDtype):  # regex só nas categorias distintas
+            eh = pd.Series(met.cat.categories, dtype="string").str.contains(_CARTAO, regex=True).to_numpy(bool)
+            codes = met.cat.codes.to_numpy()
+            cartao = np.where(codes >= 0, eh[np.maximum(codes, 0)] if len(eh) else False, False)
+        else:
+            cartao = met.str.contains(_CARTAO, regex=True, na=False).to_numpy(bool)
+        tipo = df["Tipo"].astype("string")
+        despesa = (tipo == "Despesa").fillna(False).to_numpy()
+        credito = ((tipo == "Receita").fillna(False).to_numpy()
+                   & norm["Categoria"].isin(ESTORNOS).to_numpy())
+        datas = df["Data"].to_numpy(dtype="datetime64[ns]")
+        pos = np.flatnonzero(cartao & (despesa | credito) & ~np.isnat(datas))
+
+        nomes = df["Método de Pagamento/Recebimento"].astype("string").to_numpy(dtype=object)[pos]
+        chave, uniq = pd.factorize(nomes, sort=True)
+        ordem = np.lexsort((datas[pos].view("i8"), chave))  # por cartão e, dentro dele, por data
+        pos, chave = pos[ordem], chave[ordem]
+        limites = np.searchsorted(chave, np.arange(len(uniq) + 1))
+        valor = df["Valor"].to_numpy(dtype="float64")
+
+        self._cartoes: Dict[str, _Cartao] = {}
+        for i, nome in enumerate(uniq):
+            p = pos[limites[i]:limites[i + 1]]
+            fech, venc = config.get(str(nome), (_FECHAMENTO_PADRAO, _VENCIMENTO_PADRAO))
+            self._cartoes[str(nome)] = _Cartao(str(nome), fech, venc, datas[p], p, despesa[p], valor[p])
+
+    @property
+    def cartoes(self) -> List[str]:
+        return list(self._cartoes)
+
+    def _selecao(self, cartao: Optional[str]) -> List[_Cartao]:
+        if cartao is None:
+            return list(self._cartoes.values())
+        return [self._cartoes[cartao]] if cartao in self._cartoes else []
+
+    def ciclos(self, cartao: Optional[str] = None) -> pd.DataFrame:
+        """Totais por ciclo (índice: mês do fechamento). Sem cartão, soma os cartões."""
+        sel = self._selecao(cartao)
+        if not sel:
+            return pd.DataFrame(columns=["gastos", "creditos", "total", "lancamentos"],
+                                index=pd.PeriodIndex([], freq="M"))
+        if cartao is not None:
+            return sel[0].ciclos
+        todos = pd.concat([c.ciclos[["gastos", "creditos", "total", "lancamentos"]] for c in sel])
+        return todos.groupby(level=0).sum().sort_index()
+
+    def _juntar(self, partes: List[Tuple[_Cartao, slice]]) -> Tuple[np.ndarray, np.ndarray]:
+        pos = np.concatenate([c.pos[f] for c, f in partes]) if partes else np.array([], dtype=np.int64)
+        desp = np.concatenate([c.despesa[f] for c, f in partes]) if partes else np.array([], dtype=bool)
+        ordem = np.argsort(pos, kind="stable")  # de volta à ordem do livro
+        return pos[ordem], desp[ordem]
+
+    def fatura(self, cartao: Optional[str], ciclo: pd.Period) -> Tuple[np.ndarray, np.ndarray]:
+        """(posições das despesas, posições dos estornos) da fatura `ciclo`."""
+        pos, desp = self._juntar([(c, c.fatia_ciclo(ciclo)) for c in self._selecao(cartao)])
+        return pos[desp], pos[~desp]
+
+    def intervalo(self, cartao: Optional[str], ini, fim) -> Tuple[np.ndarray, np.ndarray]:
+        """Como `fatura`, para datas de `ini` a `fim` (inclusive)."""
+        pos, desp = self._juntar([(c, c.fatia(ini, fim)) for c in self._selecao(cartao)])
+        return pos[desp], pos[~desp]
+
+
+def faturas_de(st, df) -> Faturas:
+    """Faturas do livro, reaproveitadas enquanto a versão dos dados e a configuração não mudarem."""
+    livro = ledger_de(st, df)
+    config = configuracao(st)
+    if livro.versao is None:
+        return Faturas(livro, config)
+
+    @st.cache_resource(show_spinner=False, max_entries=4)
+    def _faturas(_livro, versao, cfg):
+        return Faturas(_livro, dict(cfg))
+
+    return _faturas(livro, livro.versao, tuple(sorted(config.items())))
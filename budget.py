@@ -0,0 +1,133 @@
+# budget.py — metas do planejamento em formato longo e Planejado × Realizado do ano
+#
+# A aba "Metas" tem uma linha por (Ano, Mês, Categoria) com a Meta do mês. As
+# receitas previstas entram como categorias também (RECEITAS_PLANO). Cada
+# gravação mexe só nas células que mudaram (uma linha atualizada ou
+# acrescentada por meta), em vez de regravar o mês inteiro.
+#
+# A aba larga antiga (Planejamento: uma linha por mês, uma coluna por
+# categoria) continua sendo lida: vale para o que ainda não existe em Metas,
+# e a primeira gravação de um mês copia as metas dele para Metas.
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from trends import Cubo
+
+RECEITAS_PLANO = ["Salário Ricardo", "Salário Helena", "Extras", "Investimentos"]
+
+Chave = Tuple[int, int, str]
+
+
+def _longo(df: pd.DataFrame, valor: str) -> pd.DataFrame:
+    out = pd.DataFrame({
+        "Ano": pd.to_numeric(df["Ano"], errors="coerce"),
+        "Mês": pd.to_numeric(df["Mês"], errors="coerce"),
+        "Categoria": df["Categoria"].astype("string").str.strip(),
+        "Meta": pd.to_numeric(df[valor], errors="coerce").fillna(0.0),
+        "linha": df["linha"] if "linha" in df.columns else pd.array([pd.NA] * len(df), dtype="Int64"),
+    })
+    out = out.dropna(subset=["Ano", "Mês", "Categoria"])
+    return out.astype({"Ano": "int64", "Mês": "int64"})
+
+
+def de_planejamento(df_plan: pd.DataFrame) -> pd.DataFrame:
+    """Aba larga antiga -> linhas (Ano, Mês, Categoria, Meta), sem linha em Metas."""
+    if df_plan is None or df_plan.empty:
+        return _longo(pd.DataFrame(columns=["Ano", "Mês", "Categoria", "Meta"]), "Meta")
+    cats = [c for c in df_plan.columns if c not in ("Ano", "Mês")]
+    longo = df_plan.melt(id_vars=["Ano", "Mês"], value_vars=cats, var_name="Categoria", value_name="Meta")
+    return _longo(longo, "Meta")
+
+
+class Metas:
+    """Metas de todos os meses, indexadas por (ano, mês, categoria).
+
+    `linha` é a linha da aba Metas (vazia para o que veio só da aba antiga);
+    é o que permite gravar uma meta alterada como atualização de uma linha.
+    """
+
+    def __init__(self, df_metas: pd.DataFrame, df_plan: Optional[pd.DataFrame] = None):
+        novas = _longo(df_metas.assign(linha=pd.array(df_metas.index, dtype="Int64")), "Meta")
+        novas = novas.drop_duplicates(["Ano", "Mês", "Categoria"], keep="last")
+        antigas = de_planejamento(df_plan)
+        # Metas vence a aba antiga na mesma chave
+        tudo = pd.concat([antigas, novas]).drop_duplicates(["Ano", "Mês", "Categoria"], keep="last")
+        self.dados = tudo.set_index(["Ano", "Mês", "Categoria"]).sort_index()
+        self.versao: Optional[str] = df_metas.attrs.get("versao")
+
+    def mes(self, ano: int, mes: int) -> Dict[str, float]:
+        """{categoria: meta} do mês (vazio se não houver plano)."""
+        try:
+            sel = self.dados.loc[(int(ano), int(mes))]
+        except KeyError:
+            return {}
+        return sel["Meta"].astype(float).to_dict()
+
+    def alteracoes(self, ano: int, mes: int, valores: Dict[str, float]
+                   ) -> Tuple[List[List[Any]], Dict[int, Tuple[List[Any], List[Any]]]]:
+        """(linhas a acrescentar, {linha: (valores novos, valores antigos)}) para gravar `valores`.
+
+        Só entram metas diferentes das atuais; meta zerada sem linha em Metas
+        (nem na aba antiga) não gera linha.
+        """
+        novas, edicoes = [], {}
+        for cat, v in valores.items():
+            v = round(float(v or 0.0), 2)
+            chave = (int(ano), int(mes), cat)
+            atual = self.dados.loc[chave] if chave in self.dados.index else None
+            linha_nova = [int(ano), int(mes), cat, f"{v:.2f}"]
+            if atual is None:
+                if v != 0:
+                    novas.append(linha_nova)
+            elif pd.isna(atual["linha"]):
+                novas.append(linha_nova)  # vinha da aba antiga: passa a existir em Metas
+            elif round(float(atual["Meta"]), 2) != v:
+                edicoes[int(atual["linha"])] = (linha_nova,
+                                                [int(ano), int(mes), cat, f"{float(atual['Meta']):.2f}"])
+        return novas, edicoes
+
+    def ano(self, ano: int) -> pd.DataFrame:
+        """Metas do ano em formato longo: Mês, Categoria, Meta."""
+        try:
+            sel = self.dados.loc[int(ano)]
+        except KeyError:
+            return pd.DataFrame(columns=["Mês", "Categoria", "Meta"])
+        return sel.reset_index()[["Mês", "Categoria", "Meta"]]
+
+
+def comparativo_ano(metas: Metas, cubo: Cubo, ano: int) -> pd.DataFrame:
+    """Planejado × Realizado de todos os meses de `ano`, por categoria de despesa.
+
+    Um groupby no cubo (despesas do ano por mês e categoria) e um merge com as
+    metas do ano; `Diferença` = Planejado - Realizado (negativa = estourou).
+    """
+    d = cubo.dados
+    ini = pd.Period(year=int(ano), month=1, freq="M").ordinal
+    d = d[(d["Tipo"] == "Despesa") & (d["mes"] >= ini) & (d["mes"] < ini + 12)]
+    real = (d.assign(**{"Mês": d["mes"] - ini + 1, "Categoria": d["Categoria"].astype("string").str.strip()})
+             .groupby(["Mês", "Categoria"])["valor"].sum().rename("Realizado").reset_index())
+    plano = metas.ano(ano)
+    plano = plano[~plano["Categoria"].isin(RECEITAS_PLANO)].rename(columns={"Meta": "Planejado"})
+    comp = plano.merge(real, on=["Mês", "Categoria"], how="outer")
+    comp[["Planejado", "Realizado"]] = comp[["Planejado", "Realizado"]].fillna(0.0)
+    comp["Diferença"] = comp["Planejado"] - comp["Realizado"]
+    comp["Uso %"] = comp["Realizado"] / comp["Planejado"].where(comp["Planejado"] > 0) * 100
+    comp = comp[(comp["Planejado"] != 0) | (comp["Realizado"] != 0)]
+    return comp.astype({"Mês": np.int64}).sort_values(["Mês", "Categoria"]).reset_index(drop=True)
+
+
+def metas_de(st, df_metas: pd.DataFrame, df_plan: Optional[pd.DataFrame] = None) -> Metas:
+    """Metas reaproveitadas enquanto as versões das duas abas não mudarem."""
+    v_metas = df_metas.attrs.get("versao")
+    v_plan = None if df_plan is None else df_plan.attrs.get("versao")
+    if v_metas is None or (df_plan is not None and v_plan is None):
+        return Metas(df_metas, df_plan)
+
+    @st.cache_resource(show_spinner=False, max_entries=4)
+    def _metas(_df_metas, _df_plan, versoes):
+        return Metas(_df_metas, _df_plan)
+
+    return _metas(df_metas, df_plan, (v_metas, v_plan))
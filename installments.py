@@ -0,0 +1,139 @@
+# installments.py — compras parceladas guardadas como plano (uma linha por compra)
+#
+# A aba "Parcelamentos" tem uma linha por compra: data da 1ª parcela, número
+# de parcelas, valor de cada uma e o resto do arredondamento (somado à 1ª).
+# As parcelas viram linhas do livro só em memória ("virtuais", com índice
+# negativo para não se confundir com linhas da planilha), e só para os meses
+# pedidos quando a visão não precisa do plano inteiro.
+from __future__ import annotations
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import _TEXTO
+
+COLUNAS_LIVRO = ["Data", "Responsável", "Tipo", "Descrição", "Categoria",
+                 "Método de Pagamento/Recebimento", "Valor"]
+_CATEGORICAS = ["Responsável", "Tipo", "Categoria", "Método de Pagamento/Recebimento"]
+MAX_PARCELAS = 99   # o id virtual reserva dois dígitos para o número da parcela
+
+
+def dividir(valor: float, parcelas: int) -> Tuple[float, float]:
+    """(valor de cada parcela, resto) com parcela * n + resto == valor, em centavos."""
+    n = max(1, int(parcelas))
+    centavos = int(round(valor * 100))
+    parcela = int(centavos / n)  # trunca em direção ao zero: o resto tem o sinal do valor
+    return parcela / 100, (centavos - parcela * n) / 100
+
+
+def _somar_meses(datas: np.ndarray, meses: np.ndarray) -> np.ndarray:
+    """datas + meses, com o dia limitado ao fim do mês (como relativedelta)."""
+    m = datas.astype("datetime64[M]")
+    dia = (datas - m.astype("datetime64[D]")).astype(np.int64)
+    alvo = m + meses
+    ultimo = ((alvo + 1).astype("datetime64[D]") - alvo.astype("datetime64[D]")).astype(np.int64) - 1
+    return alvo.astype("datetime64[D]") + np.minimum(dia, ultimo)
+
+
+class Parcelamentos:
+    """Planos de parcelamento de uma versão da aba, em arrays.
+
+    `expandir` gera as parcelas como linhas do livro; `futuras` e `projecao`
+    respondem direto do plano, sem olhar o livro.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df  # a aba como carregada (inclusive linhas inválidas), para edição
+        ok = df["Data"].notna() & df["Parcelas"].fillna(0).gt(0) & df["Valor Parcela"].notna()
+        df = df[ok]
+        self.versao: Optional[str] = df.attrs.get("versao")
+        self.linha = df.index.to_numpy(dtype=np.int64)
+        self.inicio = df["Data"].to_numpy(dtype="datetime64[D]")
+        self.n = np.minimum(df["Parcelas"].astype("int64").to_numpy(), MAX_PARCELAS)
+        self.parcela = df["Valor Parcela"].to_numpy(dtype="float64")
+        self.resto = df["Resto"].fillna(0.0).to_numpy(dtype="float64")
+        self.texto = {c: df[c].astype("string").to_numpy(dtype=object) for c in _CATEGORICAS}
+        self.texto["Descrição"] = df["Descrição"].astype("string").fillna("").to_numpy(dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.linha)
+
+    def _grade(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(plano, número da parcela a partir de 0, data) de todas as parcelas."""
+        plano = np.repeat(np.arange(len(self.n)), self.n)
+        i = np.arange(len(plano)) - np.repeat(np.cumsum(self.n) - self.n, self.n)
+        return plano, i, _somar_meses(self.inicio[plano], i)
+
+    def _valores(self, plano: np.ndarray, i: np.ndarray) -> np.ndarray:
+        return self.parcela[plano] + np.where(i == 0, self.resto[plano], 0.0)
+
+    def expandir(self, meses: Optional[Iterable[pd.Period]] = None) -> pd.DataFrame:
+        """Parcelas como linhas do livro (todas, ou só as dos `meses` pedidos)."""
+        plano, i, datas = self._grade()
+        if meses is not None:
+            alvo = np.array(sorted({p.ordinal for p in meses}), dtype=np.int64)
+            sel = np.isin(datas.astype("datetime64[M]").astype(np.int64), alvo)
+            plano, i, datas = plano[sel], i[sel], datas[sel]
+        desc = np.char.add(np.char.add(self.texto["Descrição"][plano].astype(str), " ("),
+                           np.char.add(np.char.add((i + 1).astype(str), "/"),
+                                       np.char.add(self.n[plano].astype(str), ")")))
+        out = pd.DataFrame({
+            "Data": pd.DatetimeIndex(datas.astype("datetime64[ns]")),
+            "Descrição": pd.array(desc.astype(object), dtype=_TEXTO),
+            **{c: pd.Categorical(self.texto[c][plano]) for c in _CATEGORICAS},
+            "Valor": self._valores(plano, i),
+        }, index=pd.Index(-(self.linha[plano] * 100 + i + 1), dtype=np.int64))
+        return out[COLUNAS_LIVRO]
+
+    def futuras(self, hoje: pd.Timestamp) -> pd.DataFrame:
+        """Um resumo por plano com parcelas depois de `hoje`."""
+        plano, i, datas = self._grade()
+        fut = datas > np.datetime64(pd.Timestamp(hoje).date(), "D")
+        if not fut.any():
+            return pd.DataFrame(columns=["Próxima", "Descrição", "Responsável", "Método de Pagamento/Recebimento",
+                                         "Parcela", "Restantes", "Valor restante"])
+        plano, i, datas = plano[fut], i[fut], datas[fut]
+        g = pd.DataFrame({"plano": plano, "i": i, "data": datas,
+                          "valor": self._valores(plano, i)}).groupby("plano", sort=False)
+        r = pd.DataFrame({"Próxima": g["data"].min(), "primeira": g["i"].min(),
+                          "Restantes": g.size(), "Valor restante": g["valor"].sum()})
+        p = r.index.to_numpy()
+        r["Descrição"] = self.texto["Descrição"][p]
+        r["Responsável"] = self.texto["Responsável"][p]
+        r["Método de Pagamento/Recebimento"] = self.texto["Método de Pagamento/Recebimento"][p]
+        r["Parcela"] = [f"{a + 1}/{n}" for a, n in zip(r["primeira"], self.n[p])]
+        return (r.drop(columns="primeira").sort_values("Próxima")
+                 [["Próxima", "Descrição", "Responsável", "Método de Pagamento/Recebimento",
+                   "Parcela", "Restantes", "Valor restante"]])
+
+    def projecao(self, hoje: pd.Timestamp, meses: int = 12) -> pd.Series:
+        """Total das parcelas por mês, do mês seguinte a `hoje` até `meses` à frente."""
+        plano, i, datas = self._grade()
+        ym = datas.astype("datetime64[M]").astype(np.int64)
+        atual = pd.Period(hoje, freq="M").ordinal
+        faixa = pd.period_range(pd.Period(hoje, freq="M") + 1, periods=meses, freq="M")
+        sel = (ym > atual) & (ym <= atual + meses)
+        tot = pd.Series(self._valores(plano[sel], i[sel]), index=ym[sel]).groupby(level=0).sum()
+        return pd.Series(tot.reindex([p.ordinal for p in faixa], fill_value=0.0).to_numpy(), index=faixa)
+
+
+def plano_de(st, df: pd.DataFrame) -> Parcelamentos:
+    """Parcelamentos da aba carregada, reaproveitados enquanto df.attrs["versao"] não mudar."""
+    versao = df.attrs.get("versao")
+    if versao is None:
+        return Parcelamentos(df)
+
+    @st.cache_resource(show_spinner=False, max_entries=4)
+    def _plano(_df, versao):
+        return Parcelamentos(_df)
+
+    return _plano(df, versao)
+
+
+def linha_plano(data, resp: str, tipo: str, desc: str, categoria: str, metodo: str,
+                valor: float, parcelas: int) -> List[str]:
+    """Linha da aba Parcelamentos para uma compra de `valor` total em `parcelas` vezes."""
+    parcela, resto = dividir(valor, parcelas)
+    return [data.strftime("%d/%m/%Y"), resp, tipo, desc, categoria, metodo,
+            f"{parcela:.2f}", str(int(parcelas)), f"{resto:.2f}"]
@@ -0,0 +1,122 @@
+# journal.py — diário local das alterações gravadas nas abas (Parquet zstd)
+#
+# Cada gravação do BufferEscrita vira um segmento pequeno com uma linha por
+# operação (update/delete/insert), com valores antes/depois. Substitui a cópia
+# integral em _backup_auto: o custo é proporcional ao que mudou.
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+_COLUNAS = ["ts", "seq", "autor", "aba", "op", "linha", "antes", "depois"]
+_BASE = "base.parquet"
+_MAX_SEGMENTOS = 200  # acima disso, registrar() compacta os segmentos
+_lock = threading.Lock()
+
+
+def _pasta(pasta: Path, ss_id: str) -> Path:
+    return Path(pasta) / re.sub(r"[^\w.-]", "_", ss_id)
+
+
+def _segmentos(dirp: Path) -> List[Path]:
+    return sorted(p for p in dirp.glob("*.parquet") if p.name != _BASE)
+
+
+def _gravar(arq: Path, df: pd.DataFrame) -> None:
+    tmp = arq.with_suffix(".tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, arq)
+
+
+def registrar(pasta: Path, ss_id: str, autor: str, ops: List[Dict[str, Any]],
+              reter_dias: Optional[float] = None) -> None:
+    """Acrescenta as operações de uma gravação, na ordem em que foram aplicadas.
+
+    Cada op: {"aba", "op": "update"|"delete"|"insert", "linha", "antes", "depois"}.
+    """
+    if not ops:
+        return
+    ts = pd.Timestamp.now(tz="UTC")
+    df = pd.DataFrame([
+        {"ts": ts, "seq": i, "autor": autor, "aba": o["aba"], "op": o["op"],
+         "linha": o.get("linha"),
+         "antes": None if o.get("antes") is None else json.dumps(o["antes"], ensure_ascii=False),
+         "depois": None if o.get("depois") is None else json.dumps(o["depois"], ensure_ascii=False)}
+        for i, o in enumerate(ops)
+    ], columns=_COLUNAS).astype({"linha": "Int64"})
+
+    dirp = _pasta(pasta, ss_id)
+    dirp.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        _gravar(dirp / f"{ts.strftime('%Y%m%dT%H%M%S%f')}_{uuid.uuid4().hex[:8]}.parquet", df)
+    if len(_segmentos(dirp)) > _MAX_SEGMENTOS:
+        compactar(pasta, ss_id, reter_dias)
+
+
+def ler(pasta: Path, ss_id: str, aba: Optional[str] = None) -> pd.DataFrame:
+    """Todas as operações registradas, em ordem de aplicação."""
+    dirp = _pasta(pasta, ss_id)
+    arqs = _segmentos(dirp)
+    if (dirp / _BASE).exists():
+        arqs.insert(0, dirp / _BASE)
+    if not arqs:
+        return pd.DataFrame(columns=_COLUNAS)
+    df = pd.concat([pq.read_table(a).to_pandas() for a in arqs], ignore_index=True)
+    if aba is not None:
+        df = df[df["aba"] == aba]
+    return df.sort_values(["ts", "seq"], kind="stable").reset_index(drop=True)
+
+
+def compactar(pasta: Path, ss_id: str, reter_dias: Optional[float] = None) -> None:
+    """Junta os segmentos num único arquivo e descarta o que passou da retenção."""
+    dirp = _pasta(pasta, ss_id)
+    with _lock:
+        segs = _segmentos(dirp)
+        df = ler(pasta, ss_id)
+        if reter_dias is not None:
+            df = df[df["ts"] >= pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=reter_dias)]
+        _gravar(dirp / _BASE, df)
+        for s in segs:
+            s.unlink(missing_ok=True)
+
+
+def reconstruir(atual: pd.DataFrame, ops: pd.DataFrame, instante: pd.Timestamp) -> pd.DataFrame:
+    """Estado da aba em `instante`, desfazendo as operações posteriores sobre `atual`.
+
+    `atual` está em texto (uma coluna por cabeçalho) e indexado pela linha da
+    planilha. Só é exato se todas as gravações passaram pelo diário — edições
+    feitas direto no Google Sheets não são conhecidas.
+    """
+    instante = pd.Timestamp(instante)
+    if instante.tzinfo is None:
+        instante = instante.tz_localize("UTC")
+    largura = len(atual.columns)
+    vazia = [""] * largura
+    n = int(atual.index.max()) - 1 if len(atual) else 0
+    linhas: List[List[Any]] = [list(vazia) for _ in range(n)]
+    for l, valores in zip(atual.index, atual.values.tolist()):
+        linhas[int(l) - 2] = valores
+
+    desfazer = ops[ops["ts"] > instante].iloc[::-1]
+    for op in desfazer.itertuples(index=False):
+        if pd.isna(op.linha):
+            continue
+        pos = int(op.linha) - 2
+        antes = json.loads(op.antes) if op.antes is not None else None
+        if op.op == "insert" and 0 <= pos < len(linhas):
+            del linhas[pos]
+        elif op.op == "delete" and antes is not None:
+            linhas.insert(pos, antes)
+        elif op.op == "update" and antes is not None and 0 <= pos < len(linhas):
+            linhas[pos] = antes
+
+    df = pd.DataFrame(linhas, columns=atual.columns, index=pd.RangeIndex(2, 2 + len(linhas)))
+    return df[df.ne("").any(axis=1)]
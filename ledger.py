@@ -0,0 +1,95 @@
+# ledger.py — modelo tipado do livro de lançamentos, montado uma vez por versão dos dados
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import _TEXTO, _ajusta_sinal, _money_to_float_series, _norm_txt, parse_data_col
+
+if TYPE_CHECKING:
+    from installments import Parcelamentos
+
+CATEGORICAS = ["Responsável", "Tipo", "Categoria", "Método de Pagamento/Recebimento"]
+TEXTO_NORMALIZADO = ["Descrição", "Categoria", "Responsável", "Método de Pagamento/Recebimento"]
+
+
+def _norm_categorias(s: pd.Series) -> pd.Series:
+    """_norm_txt aplicado só às categorias distintas e espalhado pelos códigos."""
+    cats = _norm_txt(pd.Series(s.cat.categories, dtype="string")).to_numpy(dtype=object)
+    codes = s.cat.codes.to_numpy()
+    vals = np.where(codes >= 0, cats[codes] if len(cats) else "", "")
+    return pd.Series(vals, index=s.index, dtype="category")
+
+
+def _juntar(df: pd.DataFrame, virtuais: pd.DataFrame) -> pd.DataFrame:
+    """Linhas da planilha + parcelas virtuais, unindo as categorias das colunas categóricas."""
+    out = pd.concat([df, virtuais[df.columns.intersection(virtuais.columns)]])
+    for col in CATEGORICAS:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            out[col] = pd.api.types.union_categoricals([df[col], virtuais[col]], ignore_order=True)
+    return out
+
+
+class Ledger:
+    """Lançamentos com Data em datetime, Valor com o sinal do Tipo, colunas de
+    texto categóricas e as versões normalizadas (sem acento, minúsculas) já
+    calculadas em `norm`, alinhadas pelo índice (linha da planilha).
+
+    As abas recebem `visao()`: com copy-on-write ligado, é uma cópia rasa —
+    filtros não copiam dados e nenhuma alteração chega ao livro compartilhado.
+
+    Com `plano`, as parcelas dos parcelamentos entram como linhas virtuais
+    (índice negativo) e a versão passa a ser "<versão dos dados>+<versão do plano>".
+    """
+
+    def __init__(self, df: pd.DataFrame, plano: Optional["Parcelamentos"] = None):
+        attrs = dict(df.attrs)
+        if plano is not None and len(plano):
+            df = _juntar(df, plano.expandir())
+            attrs = {k: f"{attrs[k]}+{plano.versao}" for k in ("versao", "versao_base")
+                     if attrs.get(k) is not None and plano.versao is not None}
+        df = df.copy(deep=False)  # copy-on-write: as colunas trocadas abaixo não tocam o original
+        df.attrs = attrs
+        if not pd.api.types.is_datetime64_any_dtype(df["Data"]):
+            df["Data"] = parse_data_col(df["Data"])
+        if not pd.api.types.is_float_dtype(df["Valor"]):
+            df["Valor"] = _money_to_float_series(df["Valor"])
+        for col in CATEGORICAS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("string").str.strip().astype("category")
+        df["Valor"] = _ajusta_sinal(df)
+
+        norm = pd.DataFrame(index=df.index)
+        for col in TEXTO_NORMALIZADO:
+            s = df[col]
+            norm[col] = (_norm_categorias(s) if isinstance(s.dtype, pd.CategoricalDtype)
+                         else _norm_txt(s).astype(_TEXTO))
+
+        self.versao: Optional[str] = df.attrs.get("versao")
+        self.versao_base: Optional[str] = df.attrs.get("versao_base")  # versão anterior, se veio de delta
+        self.df = df
+        self.norm = norm
+
+    def visao(self) -> pd.DataFrame:
+        return self.df.copy(deep=False)
+
+
+def ledger_de(st, df, plano: Optional["Parcelamentos"] = None) -> Ledger:
+    """Ledger do DataFrame carregado, reaproveitado enquanto df.attrs["versao"]
+    (e a versão do `plano` de parcelamentos, se houver) não mudar."""
+    if isinstance(df, Ledger):
+        return df
+    versao = df.attrs.get("versao")
+    if plano is not None and len(plano):
+        versao = None if versao is None or plano.versao is None else f"{versao}+{plano.versao}"
+    else:
+        plano = None
+    if versao is None:
+        return Ledger(df, plano)
+
+    @st.cache_resource(show_spinner=False, max_entries=4)
+    def _ledger(_df, versao, _plano=None):
+        return Ledger(_df, _plano)
+
+    return _ledger(df, versao, plano)
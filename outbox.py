@@ -0,0 +1,167 @@
+# outbox.py — fila local (SQLite) das gravações, enviada à planilha em segundo plano
+#
+# Cada BufferEscrita.gravar() vira um lote na fila e volta na hora; um
+# sincronizador por planilha envia os lotes em ordem, com retentativa quando a
+# rede cai. Lotes cujas linhas mudaram na planilha desde a leitura ficam como
+# "conflito" até alguém descartá-los ou reenviá-los.
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PENDENTE, CONFLITO = "pendente", "conflito"
+_INTERVALO = 15.0      # s entre rodadas do sincronizador sem novidade
+_ESPERA_MAX = 300.0    # s; teto do backoff quando a planilha não responde
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS lotes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ss_id TEXT NOT NULL, ts REAL NOT NULL, autor TEXT,
+    estado TEXT NOT NULL, tentativas INTEGER NOT NULL DEFAULT 0,
+    forcar INTEGER NOT NULL DEFAULT 0, erro TEXT, corpo TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lotes_ss ON lotes (ss_id, estado, id);
+CREATE TABLE IF NOT EXISTS geracoes (ss_id TEXT PRIMARY KEY, geracao INTEGER NOT NULL);
+"""
+
+
+class Fila:
+    """Lotes de gravação por planilha. `geracao` sobe a cada lote enviado."""
+
+    def __init__(self, arq: Path):
+        Path(arq).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(str(arq), check_same_thread=False, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_ESQUEMA)
+
+    def _sql(self, sql: str, args: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._con.execute(sql, args).fetchall()
+
+    def enfileirar(self, ss_id: str, autor: str, corpo: Dict[str, Any]) -> int:
+        with self._lock:
+            cur = self._con.execute(
+                "INSERT INTO lotes (ss_id, ts, autor, estado, corpo) VALUES (?, ?, ?, ?, ?)",
+                (ss_id, time.time(), autor, PENDENTE, json.dumps(corpo, ensure_ascii=False)))
+            return int(cur.lastrowid)
+
+    def lotes(self, ss_id: str, estado: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Lotes em ordem de gravação; sem `estado`, pendentes e em conflito."""
+        filtro, args = ("AND estado = ?", (ss_id, estado)) if estado else ("", (ss_id,))
+        linhas = self._sql("SELECT id, ts, autor, estado, tentativas, forcar, erro, corpo "
+                           f"FROM lotes WHERE ss_id = ? {filtro} ORDER BY id", args)
+        return [{"id": i, "ts": ts, "autor": a, "estado": e, "tentativas": t,
+                 "forcar": bool(f), "erro": err, "corpo": json.loads(c)}
+                for i, ts, a, e, t, f, err, c in linhas]
+
+    def adiar(self, lote_id: int, corpo: Dict[str, Any], erro: str) -> None:
+        """Falha temporária: guarda o que ainda falta enviar e conta a tentativa."""
+        self._sql("UPDATE lotes SET corpo = ?, erro = ?, tentativas = tentativas + 1 WHERE id = ?",
+                  (json.dumps(corpo, ensure_ascii=False), erro, lote_id))
+
+    def marcar_conflito(self, lote_id: int, erro: str) -> None:
+        self._sql("UPDATE lotes SET estado = ?, erro = ? WHERE id = ?", (CONFLITO, erro, lote_id))
+
+    def reenviar(self, lote_id: int) -> None:
+        """Devolve um lote em conflito à fila, gravando por cima do que está na planilha."""
+        self._sql("UPDATE lotes SET estado = ?, forcar = 1, erro = NULL WHERE id = ?",
+                  (PENDENTE, lote_id))
+
+    def descartar(self, lote_id: int) -> None:
+        self._sql("DELETE FROM lotes WHERE id = ?", (lote_id,))
+
+    def concluir(self, ss_id: str, lote_id: int) -> None:
+        with self._lock:
+            self._con.execute("BEGIN")
+            self._con.execute("DELETE FROM lotes WHERE id = ?", (lote_id,))
+            self._con.execute("INSERT INTO geracoes (ss_id, geracao) VALUES (?, 1) "
+                              "ON CONFLICT(ss_id) DO UPDATE SET geracao = geracao + 1", (ss_id,))
+            self._con.execute("COMMIT")
+
+    def geracao(self, ss_id: str) -> int:
+        r = self._sql("SELECT geracao FROM geracoes WHERE ss_id = ?", (ss_id,))
+        return int(r[0][0]) if r else 0
+
+
+class Sincronizador:
+    """Thread que esvazia a fila de uma planilha, um lote por vez, em ordem.
+
+    `aplicar(lote)` envia o lote e devolve (estado, corpo_restante, erro):
+    "ok", "conflito" ou "parcial" (parte falhou; o restante fica na fila).
+    Exceções contam como planilha fora do ar: espera com backoff e tenta de novo.
+    """
+
+    def __init__(self, fila: Fila, ss_id: str,
+                 aplicar: Callable[[Dict[str, Any]], Tuple[str, Dict[str, Any], str]],
+                 intervalo: float = _INTERVALO,
+                 ao_enviar: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.fila = fila
+        self._ao_enviar = ao_enviar
+        self.ss_id = ss_id
+        self._aplicar = aplicar
+        self._intervalo = intervalo
+        self._acordar = threading.Event()
+        self.online = True
+        self.ultimo_erro: Optional[str] = None
+        self._acordar.set()  # lotes deixados por um processo anterior saem logo
+        self._thread = threading.Thread(target=self._rodar, daemon=True, name=f"sync-{ss_id[:8]}")
+        self._thread.start()
+
+    def acordar(self) -> None:
+        self._acordar.set()
+
+    def _rodar(self) -> None:
+        espera = self._intervalo
+        while True:
+            self._acordar.wait(espera)
+            self._acordar.clear()
+            try:
+                for lote in self.fila.lotes(self.ss_id, PENDENTE):
+                    estado, resto, erro = self._aplicar(lote)
+                    if estado == "ok":
+                        self.fila.concluir(self.ss_id, lote["id"])
+                        if self._ao_enviar is not None:
+                            self._ao_enviar(lote)
+                    elif estado == "conflito":
+                        self.fila.marcar_conflito(lote["id"], erro)
+                    else:
+                        self.fila.adiar(lote["id"], resto, erro)
+                        raise RuntimeError(erro)  # mantém a ordem: não passa à frente
+                self.online, self.ultimo_erro = True, None
+                espera = self._intervalo
+            except Exception as e:
+                self.online, self.ultimo_erro = False, str(e)
+                espera = min(_ESPERA_MAX, max(self._intervalo, espera * 2))
+
+
+def painel(st, fila: Fila, sinc: Optional[Sincronizador], ss_id: str) -> None:
+    """Situação da fila na barra lateral: pendências, conflitos e ações sobre eles."""
+    lotes = fila.lotes(ss_id)
+    if not lotes and (sinc is None or sinc.online):
+        return
+    pend = [l for l in lotes if l["estado"] == PENDENTE]
+    conf = [l for l in lotes if l["estado"] == CONFLITO]
+    if sinc is not None and not sinc.online:
+        st.sidebar.warning("📴 Planilha inacessível: usando a cópia local. "
+                           "As alterações serão enviadas quando a conexão voltar.")
+    if pend:
+        st.sidebar.caption(f"⏳ {len(pend)} gravação(ões) aguardando envio à planilha.")
+    if conf:
+        with st.sidebar.expander(f"⚠️ {len(conf)} gravação(ões) em conflito", expanded=True):
+            for l in conf:
+                quando = time.strftime("%d/%m %H:%M", time.localtime(l["ts"]))
+                st.write(f"**#{l['id']}** — {quando} — {l['autor'] or ''}")
+                st.caption(l["erro"] or "")
+                c1, c2 = st.columns(2)
+                if c1.button("Reenviar assim mesmo", key=f"outbox_reenviar_{l['id']}"):
+                    fila.reenviar(l["id"])
+                    if sinc is not None:
+                        sinc.acordar()
+                    st.rerun()
+                if c2.button("Descartar", key=f"outbox_descartar_{l['id']}"):
+                    fila.descartar(l["id"])
+                    st.rerun()
@@ -0,0 +1,198 @@
+# perfil.py — tempos e alocações de cada rerun, para achar o que deixa o app lento
+#
+# Desligado por padrão. Liga com [debug] perfil = true no secrets.toml ou com a
+# variável de ambiente DESPESAS_PERFIL=1. Ligado, cada rerun registra:
+#   - as seções marcadas com `medir` (carga, período, cada aba, fontes do Contexto),
+#     com tempo, memória alocada e pico (tracemalloc);
+#   - cada chamada ao armazenamento (ver `armazenamento`), com a seção em que caiu;
+#   - as chamadas HTTP à API do Google (transport.ESTATISTICAS).
+# O painel na barra lateral mostra o rerun e pode gravar um cProfile (.pstats)
+# da próxima interação.
+from __future__ import annotations
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import pandas as pd
+
+import transport
+
+_ENV = "DESPESAS_PERFIL"
+_METODOS = {"revisao", "existe", "garantir", "ler", "ler_linhas", "anexar", "atualizar", "apagar",
+            "substituir"}
+_TOP_PSTATS = 30
+_MB = 2 ** 20
+
+_tracemalloc_nosso = False  # só desliga o tracemalloc se foi este módulo que ligou
+
+
+def ligado(st) -> bool:
+    if os.environ.get(_ENV, "").strip().lower() in ("1", "true", "sim"):
+        return True
+    try:
+        return bool(st.secrets.get("debug", {}).get("perfil", False))
+    except Exception:
+        return False
+
+
+def _registro(st) -> Optional[Dict[str, Any]]:
+    return st.session_state.get("__perfil__")
+
+
+def iniciar_rerun(st) -> None:
+    """Abre o registro do rerun (chamar logo no topo do app)."""
+    global _tracemalloc_nosso
+    if not ligado(st):
+        st.session_state.pop("__perfil__", None)
+        if _tracemalloc_nosso and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            _tracemalloc_nosso = False
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracemalloc_nosso = True
+    reg = {"inicio": time.perf_counter(), "ts": time.time(), "thread": threading.get_ident(),
+           "secoes": [], "chamadas": [], "pilha": [], "lock": threading.Lock(), "cprofile": None}
+    if st.session_state.pop("__perfil_cprofile__", False):
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+            reg["cprofile"] = prof
+        except ValueError:  # outro profiler já ativo nesta thread
+            pass
+    st.session_state["__perfil__"] = reg
+
+
+@contextmanager
+def medir(st, nome: str) -> Iterator[None]:
+    """Seção do rerun: tempo, memória alocada e pico (seções podem se aninhar)."""
+    reg = _registro(st)
+    if reg is None or threading.get_ident() != reg["thread"]:
+        yield
+        return
+    pilha = reg["pilha"]
+    atual, pico = tracemalloc.get_traced_memory()
+    if pilha:  # o pico da seção de fora vai até aqui; a de dentro recomeça a contagem
+        pilha[-1]["pico"] = max(pilha[-1]["pico"], pico)
+    tracemalloc.reset_peak()
+    quadro = {"nome": nome, "ini": atual, "pico": atual}
+    linha = {"seção": nome, "nível": len(pilha)}
+    reg["secoes"].append(linha)  # entra já, na ordem de abertura
+    pilha.append(quadro)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        fim, pico = tracemalloc.get_traced_memory()
+        pilha.pop()
+        quadro["pico"] = max(quadro["pico"], pico)
+        if pilha:
+            pilha[-1]["pico"] = max(pilha[-1]["pico"], quadro["pico"])
+        tracemalloc.reset_peak()
+        linha.update({"ms": ms, "alocado MB": (fim - quadro["ini"]) / _MB,
+                      "pico MB": (quadro["pico"] - quadro["ini"]) / _MB})
+
+
+class _ArmazenamentoMedido:
+    """Repassa tudo para o armazenamento de verdade, cronometrando as operações de dados."""
+
+    def __init__(self, ss, reg: Dict[str, Any]):
+        self._ss = ss
+        self._reg = reg
+
+    def __getattr__(self, nome: str) -> Any:
+        alvo = getattr(self._ss, nome)
+        if nome not in _METODOS:
+            return alvo
+        reg = self._reg
+
+        def _medido(*args, **kwargs):
+            em = "segundo plano"
+            if threading.get_ident() == reg["thread"]:
+                em = reg["pilha"][-1]["nome"] if reg["pilha"] else "(fora de seção)"
+            t0 = time.perf_counter()
+            try:
+                return alvo(*args, **kwargs)
+            finally:
+                with reg["lock"]:
+                    reg["chamadas"].append({"seção": em, "método": nome,
+                                            "ms": (time.perf_counter() - t0) * 1000})
+        return _medido
+
+
+def armazenamento(st, ss):
+    """`ss` cronometrado quando o perfil está ligado; senão, o próprio `ss`."""
+    reg = _registro(st)
+    return ss if reg is None else _ArmazenamentoMedido(ss, reg)
+
+
+# ------------------------- Painel ------------------------- #
+def _pasta(st) -> Path:
+    try:
+        pasta = st.secrets.get("debug", {}).get("perfil_dir")
+    except Exception:
+        pasta = None
+    return Path(pasta or Path(__file__).parent / ".perfil")
+
+
+def _gravar_cprofile(st, prof: cProfile.Profile) -> None:
+    prof.disable()
+    pasta = _pasta(st)
+    pasta.mkdir(parents=True, exist_ok=True)
+    arq = pasta / f"rerun-{time.strftime('%Y%m%d-%H%M%S')}.pstats"
+    prof.dump_stats(str(arq))
+    saida = io.StringIO()
+    pstats.Stats(prof, stream=saida).sort_stats("cumulative").print_stats(_TOP_PSTATS)
+    st.caption(f"cProfile deste rerun gravado em {arq}")
+    st.download_button("Baixar .pstats", arq.read_bytes(), file_name=arq.name,
+                       key="perfil_baixar")
+    st.code(saida.getvalue(), language=None)
+
+
+def _chamadas(reg: Dict[str, Any]) -> pd.DataFrame:
+    with reg["lock"]:
+        df = pd.DataFrame(reg["chamadas"], columns=["seção", "método", "ms"])
+    if df.empty:
+        return df
+    g = df.groupby(["seção", "método"], sort=False)["ms"]
+    return pd.DataFrame({"chamadas": g.size(), "ms total": g.sum().round(1)}).reset_index()
+
+
+def painel(st) -> None:
+    """Quebra do rerun na barra lateral (chamar por último no app)."""
+    reg = _registro(st)
+    if reg is None:
+        return
+    total = (time.perf_counter() - reg["inicio"]) * 1000
+    prof = reg.pop("cprofile", None)
+    atual, pico = tracemalloc.get_traced_memory()
+    with st.sidebar.expander("⏱️ Perfil do rerun", expanded=prof is not None):
+        st.caption(f"Rerun: {total:.0f} ms · memória rastreada {atual / _MB:.1f} MB")
+        secoes = pd.DataFrame(reg["secoes"], columns=["seção", "nível", "ms", "alocado MB", "pico MB"])
+        if not secoes.empty:
+            secoes["seção"] = [("· " * n) + s for s, n in zip(secoes["seção"], secoes["nível"])]
+            medido = secoes.loc[secoes["nível"] == 0, "ms"].sum()
+            st.dataframe(secoes.drop(columns="nível").round(1), hide_index=True,
+                         use_container_width=True)
+            st.caption(f"Fora das seções medidas: {max(0.0, total - medido):.0f} ms")
+        chamadas = _chamadas(reg)
+        if not chamadas.empty:
+            st.markdown("**Armazenamento**")
+            st.dataframe(chamadas, hide_index=True, use_container_width=True)
+        api = transport.ESTATISTICAS.tabela(reg["ts"], transport._sessao_atual())
+        if not api.empty:
+            st.caption(f"API do Google neste rerun: {len(api)} chamada(s), "
+                       f"{api['ms'].sum():.0f} ms, {api['espera_ms'].sum():.0f} ms no limitador")
+        if prof is not None:
+            _gravar_cprofile(st, prof)
+        elif st.button("🔬 Gravar cProfile da próxima interação", key="perfil_armar"):
+            st.session_state["__perfil_cprofile__"] = True
+            st.caption("Ligado: a próxima interação com o app será perfilada.")
@@ -1,35 +1,96 @@
-
+import numpy as np
 import pandas as pd
 
-def _ultimo_mes_existente(dframe: pd.DataFrame):
+from ledger import Ledger, ledger_de
+
+MESES = [(i+1, n) for i, n in enumerate(
+    ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
+     "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
+)]
+
+def _montar_indice(livro: Ledger) -> dict:
+    """Agregados por mês, calculados numa passada só sobre o livro inteiro.
+
+    - receitas / despesas / out_cc: totais do mês (despesas e saídas em módulo);
+    - saldo_inicial: soma, por conta normalizada, do último saldo declarado
+      antes do 1º dia do mês (já acumulado e com forward-fill);
+    - posicoes: posições (iloc) das linhas de cada mês;
+    - datas: datas válidas ordenadas, para achar o último mês com lançamentos.
+    """
+    dframe = livro.df
+    datas = dframe["Data"]
+    valida = datas.notna().to_numpy()
+    per = datas.dt.to_period("M")
+    tipo = dframe["Tipo"].astype("string")
+    valor = dframe["Valor"].fillna(0.0)
+
+    def _eh(t):
+        return (tipo == t).fillna(False).to_numpy()
+
+    receitas = valor.where(_eh("Receita")).groupby(per).sum()
+    despesas = valor.where(_eh("Despesa")).abs().groupby(per).sum()
+    eh_cc = _eh("Transferência") & (dframe["Categoria"].astype("string").str.strip() == "Pagamento Cartão").fillna(False).to_numpy()
+    out_cc = valor.where(eh_cc).abs().groupby(per).sum()
+
+    # último saldo declarado de cada conta em cada mês -> acumulado mês a mês
+    sal = dframe.loc[_eh("Saldo") & valida, ["Valor"]]
+    saldo_inicial = pd.Series(dtype="float64")
+    saldo_total = 0.0
+    if not sal.empty:
+        sal = sal.assign(__cta=livro.norm.loc[sal.index, "Descrição"], __data=datas[sal.index],
+                         __per=per[sal.index], Valor=valor[sal.index])
+        sal = sal.sort_values("__data", kind="mergesort")
+        ult = sal.groupby(["__per", "__cta"]).tail(1).pivot(index="__per", columns="__cta", values="Valor")
+        faixa = pd.period_range(ult.index.min(), ult.index.max() + 1, freq="M")
+        acum = ult.reindex(faixa).ffill()
+        saldo_inicial = acum.shift(1).sum(axis=1)
+        saldo_total = float(acum.iloc[-1].sum())
+
+    return {
+        "receitas": receitas, "despesas": despesas, "out_cc": out_cc,
+        "saldo_inicial": saldo_inicial, "saldo_total": saldo_total,
+        "posicoes": dict(per.groupby(per).indices),
+        "datas": np.sort(datas[valida].to_numpy()),
+    }
+
+def indice_mensal(st, dframe) -> dict:
+    """_montar_indice memorizado pela versão dos dados (df.attrs["versao"])."""
+    livro = ledger_de(st, dframe)
+    if livro.versao is None:
+        return _montar_indice(livro)
+
+    @st.cache_resource(show_spinner=False, max_entries=4)
+    def _indice(_livro, versao):
+        return _montar_indice(_livro)
+
+    return _indice(livro, livro.versao)
+
+def _saldo_inicial(idx: dict, per: pd.Period) -> float:
+    s = idx["saldo_inicial"]
+    if s.empty or per < s.index[0]:
+        return 0.0
+    if per > s.index[-1]:
+        return idx["saldo_total"]
+    return float(s[per])
+
+def _ultimo_mes_existente(idx: dict):
     hoje = pd.Timestamp.today().normalize()
-    d = dframe.copy()
-    d["Data"] = pd.to_datetime(d["Data"], errors="coerce")
-    valid_hoje = d[d["Data"].notna() & (d["Data"] <= hoje)]
-    if not valid_hoje.empty:
-        ult = valid_hoje["Data"].max()
-        return int(ult.year), int(ult.month)
-    if d["Data"].notna().any():
-        ult = d.loc[d["Data"].notna(), "Data"].max()
+    datas = idx["datas"]
+    if len(datas):
+        k = np.searchsorted(datas, hoje.to_datetime64(), side="right")
+        ult = pd.Timestamp(datas[k-1] if k > 0 else datas[-1])
         return int(ult.year), int(ult.month)
     return int(hoje.year), int(hoje.month)
 
-def obter_df_periodo(st, dframe: pd.DataFrame):
-    import pandas as pd
-    from utils import _norm_txt
-    dframe = dframe.copy()
-    dframe["Data"] = pd.to_datetime(dframe["Data"], errors="coerce")
+def obter_df_periodo(st, dframe):
+    livro = ledger_de(st, dframe)
+    dframe = livro.visao()
+    idx = indice_mensal(st, livro)
 
-    ano_padrao, mes_padrao = _ultimo_mes_existente(dframe)
+    ano_padrao, mes_padrao = _ultimo_mes_existente(idx)
 
-    anos_existentes = sorted(dframe.loc[dframe["Data"].notna(), "Data"].dt.year.unique(), reverse=True)
+    anos_existentes = sorted({int(p.year) for p in idx["posicoes"]}, reverse=True)
     if ano_padrao not in anos_existentes: anos_existentes.insert(0, ano_padrao)
-    if not anos_existentes: anos_existentes = [ano_padrao]
-
-    MESES = [(i+1, n) for i, n in enumerate(
-        ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
-         "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
-    )]
 
     with st.sidebar.expander("📅 Escolher período"):
         sel_ano  = st.selectbox("Ano", anos_existentes,
@@ -39,32 +100,19 @@ def obter_df_periodo(st, dframe: pd.DataFrame):
                                 key="periodo_mes_selector")
 
     sel_mes = next(m for m, n in MESES if n == sel_nome)
+    per = pd.Period(year=sel_ano, month=sel_mes, freq="M")
 
-    mask_mes = (dframe["Data"].dt.year == sel_ano) & (dframe["Data"].dt.month == sel_mes)
-    dfm = dframe.loc[mask_mes].copy()
-
-    primeiro_dia = pd.Timestamp(sel_ano, sel_mes, 1)
-    prev = dframe[(dframe["Tipo"] == "Saldo") & (dframe["Data"] < primeiro_dia)].copy()
-    if prev.empty:
-        saldo_inicial = 0.0
-    else:
-        prev["__cta"] = _norm_txt(prev["Descrição"])
-        ultimos = (prev.sort_values(["__cta","Data"]).groupby("__cta", as_index=False).tail(1))
-        saldo_inicial = float(ultimos["Valor"].sum())
+    dfm = dframe.iloc[idx["posicoes"].get(per, [])]
+    saldo_inicial = _saldo_inicial(idx, per)
 
-    df_rec   = dfm[dfm["Tipo"] == "Receita"].copy()
-    df_desp  = dfm[dfm["Tipo"] == "Despesa"].copy()
-    df_saldo = dfm[dfm["Tipo"] == "Saldo"].copy()
+    df_rec   = dfm[dfm["Tipo"] == "Receita"]
+    df_desp  = dfm[dfm["Tipo"] == "Despesa"]
+    df_saldo = dfm[dfm["Tipo"] == "Saldo"]
 
-    saldo_periodo = df_rec["Valor"].sum() - df_desp["Valor"].abs().sum()
+    saldo_periodo = float(idx["receitas"].get(per, 0.0)) - float(idx["despesas"].get(per, 0.0))
     saldo_final   = saldo_inicial + saldo_periodo
 
-    out_cc = dframe[
-        (dframe["Tipo"] == "Transferência") &
-        (dframe["Categoria"].str.strip() == "Pagamento Cartão") &
-        (dframe["Data"].dt.year == sel_ano) &
-        (dframe["Data"].dt.month == sel_mes)
-    ]["Valor"].abs().sum()
+    out_cc = float(idx["out_cc"].get(per, 0.0))
 
     variacao_caixa = saldo_periodo - out_cc
     saldo_final_caixa = saldo_inicial + variacao_caixa
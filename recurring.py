@@ -0,0 +1,171 @@
+# recurring.py — contas recorrentes (aba PagamentosMensais) cruzadas com o livro
+#
+# Cada conta e cada despesa do livro viram uma chave de hash da tripla
+# normalizada (Descrição, Categoria, Responsável). As despesas ficam num dict
+# (chave, mês) -> linha, montado uma vez por versão dos dados: saber se a conta
+# foi paga num mês é uma consulta no dict, não uma varredura do mês.
+#
+# Quando a descrição do lançamento não bate exatamente (ex.: "Luz Neoenergia"
+# x "luz neoenergia mangueiral jan"), vale um casamento tolerante entre as
+# despesas do mês com a mesma Categoria e Responsável: descrição parecida, ou
+# valor perto do de referência com data perto do vencimento.
+from __future__ import annotations
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ledger import Ledger, ledger_de
+from utils import _norm_txt
+
+DIA_MAX = 28            # vencimentos depois do dia 28 caem no 28 (como no cadastro)
+TOLERANCIA_VALOR = 0.15  # fração do valor de referência
+TOLERANCIA_DIAS = 10     # dias em torno do vencimento
+_TOKEN = r"\w+"
+
+
+def _chaves(desc: pd.Series, cat: pd.Series, resp: pd.Series) -> np.ndarray:
+    """Hash (uint64) da tripla normalizada. As colunas viram category antes de
+    hashear: o hash roda nos valores distintos, e os dois lados (contas e
+    livro) saem com o mesmo hash para o mesmo texto."""
+    tripla = pd.DataFrame({"d": desc.astype("string").astype("category"),
+                           "c": cat.astype("string").astype("category"),
+                           "r": resp.astype("string").astype("category")})
+    return pd.util.hash_pandas_object(tripla, index=False).to_numpy()
+
+
+def _parecido(a: str, b: str) -> bool:
+    if not a or not b:
+        return False
+    if a in b or b in a:
+        return True
+    ta, tb = set(re.findall(_TOKEN, a)), set(re.findall(_TOKEN, b))
+    return bool(ta and tb) and len(ta & tb) / len(ta | tb) >= 0.5
+
+
+class Recorrentes:
+    """Contas recorrentes e os pagamentos delas no livro.
+
+    `situacao(ano, mes)` diz, para cada conta, se foi paga no mês e por qual
+    lançamento; `projecao` estima as contas dos próximos meses pelo valor de
+    referência (o da planilha ou, sem ele, o último pago).
+    """
+
+    def __init__(self, dfpm: pd.DataFrame, livro: Ledger):
+        contas = dfpm[dfpm["Descrição"].astype("string").str.strip().fillna("") != ""]
+        self.contas = contas
+        self.desc = _norm_txt(contas["Descrição"]).to_numpy(dtype=object)
+        cat = _norm_txt(contas["Categoria"])
+        resp = _norm_txt(contas["Responsável"])
+        self.chave = _chaves(pd.Series(self.desc), cat.reset_index(drop=True), resp.reset_index(drop=True))
+        self.grupo = _chaves(pd.Series([""] * len(contas)), cat.reset_index(drop=True),
+                             resp.reset_index(drop=True))
+        self.dia = np.clip(pd.to_numeric(contas["Dia"], errors="coerce").fillna(DIA_MAX)
+                           .astype(np.int64).to_numpy(), 1, DIA_MAX)
+
+        df, norm = livro.df, livro.norm
+        desp = (df["Tipo"].astype("string") == "Despesa").fillna(False).to_numpy() & df["Data"].notna().to_numpy()
+        self._df = df
+        self._pos = np.flatnonzero(desp)
+        n = norm.iloc[self._pos]
+        self._desc = n["Descrição"].astype("string").fillna("").to_numpy(dtype=object)
+        self._datas = df["Data"].to_numpy(dtype="datetime64[D]")[self._pos]
+        self._valor = df["Valor"].abs().to_numpy(dtype="float64")[self._pos]
+        mes = self._datas.astype("datetime64[M]").astype(np.int64)
+        vazio = pd.Series([""] * len(self._pos))
+        k = _chaves(n["Descrição"].reset_index(drop=True), n["Categoria"].reset_index(drop=True),
+                    n["Responsável"].reset_index(drop=True))
+        g = _chaves(vazio, n["Categoria"].reset_index(drop=True), n["Responsável"].reset_index(drop=True))
+
+        # (chave, mês) -> posição do 1º pagamento (em self._pos); (grupo, mês) -> candidatas
+        pares = pd.DataFrame({"k": k, "m": mes, "i": np.arange(len(k))})
+        primeiro = pares.drop_duplicates(["k", "m"])
+        self._pagos: Dict[Tuple[int, int], int] = dict(zip(zip(primeiro["k"].tolist(), primeiro["m"].tolist()),
+                                                           primeiro["i"].tolist()))
+        self._grupos = pd.DataFrame({"g": g, "m": mes}).groupby(["g", "m"], sort=False).indices
+
+        # referência: Valor cadastrado ou, sem ele, o último pagamento com a chave exata
+        ult = pd.DataFrame({"k": k, "d": self._datas, "v": self._valor}).sort_values("d").drop_duplicates("k", keep="last")
+        ultimo = pd.Series(ult["v"].to_numpy(), index=ult["k"].to_numpy())
+        cadastrado = pd.to_numeric(contas["Valor"], errors="coerce").abs().to_numpy(dtype="float64")
+        self.referencia = np.where(np.isnan(cadastrado) | (cadastrado == 0),
+                                   ultimo.reindex(self.chave).to_numpy(dtype="float64"), cadastrado)
+
+    def __len__(self) -> int:
+        return len(self.contas)
+
+    def vencimentos(self, ano: int, mes: int) -> np.ndarray:
+        return (np.datetime64(f"{int(ano):04d}-{int(mes):02d}", "M").astype("datetime64[D]")
+                + (self.dia - 1))
+
+    def _tolerante(self, j: int, mes: int, venc: np.datetime64, usadas: set) -> Optional[int]:
+        cand = self._grupos.get((self.grupo[j], mes))
+        if cand is None:
+            return None
+        ref = self.referencia[j]
+        for i in cand:
+            if i in usadas:
+                continue
+            if _parecido(self.desc[j], self._desc[i]):
+                return int(i)
+            perto = abs((self._datas[i] - venc).astype(np.int64)) <= TOLERANCIA_DIAS
+            if perto and not np.isnan(ref) and abs(self._valor[i] - ref) <= TOLERANCIA_VALOR * ref:
+                return int(i)
+        return None
+
+    def situacao(self, ano: int, mes: int) -> pd.DataFrame:
+        """Uma linha por conta: vencimento, paga?, como casou, lançamento, valor pago e de referência."""
+        m = pd.Period(year=int(ano), month=int(mes), freq="M").ordinal
+        venc = self.vencimentos(ano, mes)
+        achado = np.array([self._pagos.get((int(c), m), -1) for c in self.chave], dtype=np.int64)
+        como = np.where(achado >= 0, "exato", "").astype(object)
+        usadas = set(achado[achado >= 0].tolist())  # um lançamento paga uma conta só
+        for j in np.flatnonzero(achado < 0):
+            i = self._tolerante(j, m, venc[j], usadas)
+            if i is not None:
+                achado[j], como[j] = i, "aproximado"
+                usadas.add(i)
+        pago = achado >= 0
+        linha = np.where(pago, self._df.index.to_numpy()[self._pos[np.maximum(achado, 0)]]
+                         if len(self._pos) else -1, -1)
+        return pd.DataFrame({
+            "Descrição": self.contas["Descrição"].astype("string").to_numpy(),
+            "Categoria": self.contas["Categoria"].astype("string").to_numpy(),
+            "Responsável": self.contas["Responsável"].astype("string").to_numpy(),
+            "Vencimento": pd.DatetimeIndex(venc.astype("datetime64[ns]")),
+            "Paga": pago,
+            "Casamento": como,
+            "Linha": linha,
+            "Valor pago": np.where(pago, self._valor[np.maximum(achado, 0)] if len(self._pos) else np.nan, np.nan),
+            "Referência": self.referencia,
+        }, index=self.contas.index)
+
+    def projecao(self, ano: int, mes: int, meses: int = 6) -> pd.DataFrame:
+        """Contas × meses seguintes a (ano, mes), com o valor de referência de cada uma."""
+        faixa = pd.period_range(pd.Period(year=int(ano), month=int(mes), freq="M") + 1, periods=meses, freq="M")
+        ref = np.nan_to_num(self.referencia)
+        return pd.DataFrame(np.broadcast_to(ref[:, None], (len(ref), meses)),
+                            index=self.contas["Descrição"].astype("string").to_numpy(), columns=faixa)
+
+
+def recorrentes_de(st, dfpm: pd.DataFrame, df) -> Recorrentes:
+    """Recorrentes reaproveitado enquanto as versões do livro e da aba de contas não mudarem."""
+    livro = ledger_de(st, df)
+    v_pm = dfpm.attrs.get("versao")
+    if livro.versao is None or v_pm is None:
+        return Recorrentes(dfpm, livro)
+
+    @st.cache_resource(show_spinner=False, max_entries=4)
+    def _recorrentes(_dfpm, _livro, versoes):
+        return Recorrentes(_dfpm, _livro)
+
+    return _recorrentes(dfpm, livro, (livro.versao, v_pm))
+
+
+def lancamentos(contas: pd.DataFrame, valores: List[float], metodos: List[str], data) -> List[List[str]]:
+    """Linhas de Lancamentos para pagar `contas` (uma por conta), na ordem recebida."""
+    dia = pd.Timestamp(data).strftime("%d/%m/%Y")
+    return [[dia, r, "Despesa", d, c, m, f"{-abs(float(v)):.2f}"]
+            for d, c, r, v, m in zip(contas["Descrição"], contas["Categoria"], contas["Responsável"],
+                                     valores, metodos)]
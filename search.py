@@ -0,0 +1,112 @@
+# search.py — índice invertido para as buscas de Detalhamento e Fatura
+from __future__ import annotations
+import bisect
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from ledger import Ledger
+from utils import _norm_txt
+
+COLUNAS = ["Descrição", "Categoria", "Responsável"]
+_TOKEN = r"\w+"
+_MAX_INDICES = 4
+
+
+class IndiceBusca:
+    """token normalizado -> linhas (índice do Ledger) onde ele aparece.
+
+    A consulta é quebrada em termos; cada termo casa por prefixo (busca
+    binária na lista ordenada de tokens) e os termos se combinam com E.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, List[int]] = {}
+        self._tokens: List[str] = []
+        self._lock = threading.RLock()  # o mesmo índice serve várias sessões
+        self.max_id = -1
+
+    def adicionar(self, norm: pd.DataFrame) -> None:
+        """Indexa as linhas de `norm` (textos já normalizados, ver Ledger.norm)."""
+        if norm.empty:
+            return
+        partes = [norm[c].astype("string").str.findall(_TOKEN).explode().dropna() for c in COLUNAS]
+        pares = pd.concat(partes)
+        pares = pd.DataFrame({"tok": pares.to_numpy(dtype=object), "id": pares.index}).drop_duplicates()
+        with self._lock:
+            novos = []
+            for tok, ids in pares.groupby("tok", sort=False)["id"]:
+                lst = self._postings.get(tok)
+                if lst is None:
+                    self._postings[tok] = lst = []
+                    novos.append(tok)
+                lst.extend(int(i) for i in ids)
+            if len(novos) > 64:
+                self._tokens = sorted(self._postings)
+            else:
+                for tok in novos:
+                    bisect.insort(self._tokens, tok)
+            self.max_id = max(self.max_id, int(norm.index.max()))
+
+    def _prefixo(self, termo: str) -> set:
+        ids: set = set()
+        i = bisect.bisect_left(self._tokens, termo)
+        while i < len(self._tokens) and self._tokens[i].startswith(termo):
+            ids.update(self._postings[self._tokens[i]])
+            i += 1
+        return ids
+
+    def buscar(self, consulta: str) -> np.ndarray:
+        termos = re.findall(_TOKEN, _norm_txt(consulta))
+        if not termos:
+            return np.array([], dtype=np.int64)
+        achados = None
+        with self._lock:
+            for t in sorted(termos, key=len, reverse=True):  # termos longos filtram mais
+                ids = self._prefixo(t)
+                achados = ids if achados is None else achados & ids
+                if not achados:
+                    break
+        return np.fromiter(achados, dtype=np.int64)
+
+
+def _store(st):
+    @st.cache_resource(show_spinner=False)
+    def _indices():
+        return {"lock": threading.Lock(), "por_versao": OrderedDict()}
+    return _indices()
+
+
+def indice_de(st, livro: Ledger) -> IndiceBusca:
+    """Índice do `livro`, reaproveitado entre sessões pela versão dos dados.
+
+    Quando o livro veio de um delta (só linhas novas no fim, ver sheets.py), o
+    índice da versão anterior é estendido com as linhas novas em vez de
+    refeito. Quem busca sempre cruza o resultado com as linhas que tem, então
+    uma sessão ainda na versão anterior não enxerga linhas a mais.
+    """
+    if livro.versao is None:
+        idx = IndiceBusca()
+        idx.adicionar(livro.norm)
+        return idx
+
+    store = _store(st)
+    with store["lock"]:
+        cache = store["por_versao"]
+        idx = cache.get(livro.versao)
+        if idx is None:
+            idx = cache.get(livro.versao_base) if livro.versao_base else None
+            if idx is not None:
+                idx.adicionar(livro.norm[livro.norm.index > idx.max_id])
+            else:
+                idx = IndiceBusca()
+                idx.adicionar(livro.norm)
+            cache[livro.versao] = idx
+        cache.move_to_end(livro.versao)
+        while len(cache) > _MAX_INDICES:
+            cache.popitem(last=False)
+        return idx
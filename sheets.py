@@ -1,37 +1,101 @@
 # sheets.py — versão estável p/ gspread>=6 e Streamlit
 from __future__ import annotations
+import hashlib
 import json
-from typing import Any, Dict, List
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import gspread
+import numpy as np
 import pandas as pd
+import requests
 from google.oauth2.service_account import Credentials
-from google.auth.transport.requests import AuthorizedSession
+
+import journal
+import outbox
+import snapshot
+import storage
+import transport
+from constants import DESP_CATS
+from utils import _TEXTO, _ajusta_sinal, _money_to_float_series, parse_data_col
 
 _SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive",
 ]
 
+# Mesma ordem das linhas gravadas por app.py / tabs
 _HEADERS_MAIN: List[str] = [
-    "Titular",
-    "Cartao (Final)",
     "Data",
-    "Estabelecimento",
-    "Parcela",
-    "Valor (R$)",
+    "Responsável",
+    "Tipo",
+    "Descrição",
     "Categoria",
+    "Método de Pagamento/Recebimento",
+    "Valor",
 ]
 
 _HEADERS_PM: List[str] = [
-    "AnoMes",
-    "FaturaCartao",
-    "DataVencimento",
-    "ValorFatura",
-    "StatusPagamento",
-    "Obs",
+    "Descrição",
+    "Valor",
+    "Dia",
+    "Categoria",
+    "Responsável",
 ]
 
+_HEADERS_PLAN: List[str] = (
+    ["Ano", "Mês", "Salário Ricardo", "Salário Helena", "Extras", "Investimentos"]
+    + DESP_CATS
+)
+
+# Metas do planejamento em formato longo: uma linha por (ano, mês, categoria)
+_HEADERS_METAS: List[str] = ["Ano", "Mês", "Categoria", "Meta"]
+
+# Compras parceladas: uma linha por compra (ver installments.py)
+_HEADERS_PARC: List[str] = _HEADERS_MAIN[:-1] + ["Valor Parcela", "Parcelas", "Resto"]
+
+_HEADERS: Dict[str, List[str]] = {
+    "Lancamentos": _HEADERS_MAIN,
+    "PagamentosMensais": _HEADERS_PM,
+    "Planejamento": _HEADERS_PLAN,
+    "Parcelamentos": _HEADERS_PARC,
+    "Metas": _HEADERS_METAS,
+}
+
+# Tipos aplicados na carga (e preservados no snapshot Parquet)
+_CATEGORICAS = ["Responsável", "Tipo", "Categoria", "Método de Pagamento/Recebimento"]
+_ESQUEMAS: Dict[str, Dict[str, str]] = {
+    "Lancamentos": {"Data": "data", "Valor": "valor", "Descrição": "texto",
+                    **{c: "cat" for c in _CATEGORICAS}},
+    "PagamentosMensais": {"Valor": "valor", "Dia": "int", "Descrição": "texto",
+                          "Categoria": "cat", "Responsável": "cat"},
+    "Planejamento": {"Ano": "int", "Mês": "int",
+                     **{c: "valor" for c in _HEADERS_PLAN[2:]}},
+    "Parcelamentos": {"Data": "data", "Valor Parcela": "valor", "Resto": "valor", "Parcelas": "int",
+                      "Descrição": "texto", **{c: "cat" for c in _CATEGORICAS}},
+    "Metas": {"Ano": "int", "Mês": "int", "Categoria": "cat", "Meta": "valor"},
+}
+
+# Abas criadas só pela primeira gravação: até lá, a leitura devolve a aba vazia
+# sem tocar na planilha do usuário
+_SOB_DEMANDA = {"Parcelamentos", "Metas"}
+
+_TTL_PADRAO = 300          # segundos; sobrescreva com [cache] ttl no secrets.toml
+_RECARGA_COMPLETA = 1800   # s; releitura integral periódica ([cache] recarga_completa)
+_CAUDA = 3                 # linhas finais conferidas antes de aplicar um delta
+_TENTATIVAS = 5            # gravações: tentativas em 429/5xx, com backoff exponencial
+_STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+_SEM_REV = object()        # _atualizar: revisão ainda não consultada
+_RETENTAR_OFFLINE = 30     # s até tentar a planilha de novo quando ela não respondeu
+_OBSERVAR_PADRAO = 15      # s entre conferências de alterações de outras sessões
+_MAX_EVENTOS = 256
+
 # ------------------------- Credenciais ------------------------- #
 def _load_google_secrets(st) -> Dict[str, Any]:
     if "google" not in st.secrets:
@@ -80,7 +144,43 @@ def _build_google_credentials(st) -> Credentials:
         raise RuntimeError(f"Falha ao criar Credentials: {e}")
 
 # ------------------------- Spreadsheet ------------------------- #
-def get_sheet(st):
+def _tipo_armazenamento(st) -> str:
+    return str(_cfg(st, "armazenamento", "tipo", "sheets")).strip().lower()
+
+
+class _PlanilhaAdiada:
+    """Representa a planilha sem abri-la: credenciais e open_by_key só no primeiro uso real.
+
+    Com google.sheet_key configurado, `id` sai direto do secrets, o que basta
+    para servir o snapshot local antes de qualquer chamada de rede.
+    """
+
+    def __init__(self, st):
+        self._st = st
+
+    @property
+    def id(self) -> str:
+        key = (self._st.secrets.get("google", {}).get("sheet_key") or "").strip()
+        return key or get_sheet(self._st).id
+
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(get_sheet(self._st), nome)
+
+
+def get_sheet(st, adiada: bool = False) -> storage.Armazenamento:
+    """Armazenamento das abas: Google Sheets (padrão) ou, com [armazenamento]
+    tipo = "local", um arquivo SQLite ([armazenamento] arquivo)."""
+    if _tipo_armazenamento(st) == "local":
+        arq = _cfg(st, "armazenamento", "arquivo", Path(__file__).parent / ".local" / "planilha.sqlite3")
+
+        @st.cache_resource(show_spinner=False)
+        def _get_local(arq: str):
+            return storage.ArmazenamentoLocal(Path(arq))
+
+        return _get_local(str(arq))
+    if adiada:
+        return _PlanilhaAdiada(st)
+
     @st.cache_resource(show_spinner=False)
     def _get_sheet():
         g = st.secrets.get("google", {})
@@ -89,7 +189,11 @@ def get_sheet(st):
 
         creds = _build_google_credentials(st)
         try:
-            authed_session = AuthorizedSession(creds)
+            authed_session = transport.SessaoInstrumentada(
+                creds,
+                por_minuto=int(_cfg(st, "api", "limite_por_minuto", transport._LIMITE_PADRAO)),
+                pool=int(_cfg(st, "api", "pool", transport._POOL_PADRAO)),
+            )
             client = gspread.Client(auth=creds, session=authed_session)
         except Exception as e:
             raise RuntimeError(f"Falha ao iniciar gspread: {e}")
@@ -110,61 +214,984 @@ def get_sheet(st):
                 f"• Verifique se o arquivo está compartilhado como Editor com: {client_email}\n"
                 f"• Erro do gspread: {e}"
             )
-        return ss
+        return storage.ArmazenamentoSheets(ss)
 
     return _get_sheet()
 
 # ------------------------- Worksheets / DataFrames ------------------------- #
-def ensure_worksheet(ss: gspread.Spreadsheet, title: str, headers: List[str]) -> gspread.Worksheet:
-    try:
-        ws = ss.worksheet(title)
-    except gspread.WorksheetNotFound:
-        ws = ss.add_worksheet(title=title, rows=1000, cols=max(10, len(headers)))
-        ws.append_row(headers, value_input_option="RAW")
-        return ws
+def _hash_linhas(linhas: List[List[Any]], largura: int) -> str:
+    h = hashlib.sha1()
+    for l in linhas:
+        cel = [str(c) for c in list(l)[:largura]]
+        cel += [""] * (largura - len(cel))
+        h.update("\x1f".join(cel).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
 
-    values = ws.get_all_values()
-    if not values:
-        ws.append_row(headers, value_input_option="RAW")
-    return ws
 
+def _linhas_to_df(cab: List[str], linhas: List[List[Any]], headers: List[str],
+                  inicio: int = 2) -> pd.DataFrame:
+    """Monta o DataFrame a partir de valores crus; o índice é o número da linha na planilha.
 
-def _ws_to_df(ws: gspread.Worksheet, headers: List[str]) -> pd.DataFrame:
-    records = ws.get_all_records(numericise_ignore=["all"])
-    if not records:
+    Coluna a coluna (transpõe as linhas uma vez), sem um dict por linha.
+    Células que faltam no fim da linha viram None, como células vazias.
+    """
+    if not linhas:
         return pd.DataFrame(columns=headers)
-    df = pd.DataFrame.from_records(records)
+    largura = len(cab)
+    preenchidas = np.fromiter((any(str(c).strip() for c in l) for l in linhas), bool, len(linhas))
+    colunas = list(zip(*(l[:largura] if len(l) >= largura else list(l) + [None] * (largura - len(l))
+                         for l in linhas))) if largura else []
+    pos = {c: i for i, c in enumerate(cab)}  # cabeçalho repetido: vale a última coluna
+    dados = {}
     for col in headers:
+        if col in pos:
+            arr = np.empty(len(linhas), dtype=object)
+            arr[:] = colunas[pos[col]]
+            dados[col] = arr
+        else:
+            dados[col] = pd.NA
+    df = pd.DataFrame(dados, index=pd.RangeIndex(inicio, inicio + len(linhas)), columns=headers)
+    return df if preenchidas.all() else df[preenchidas]
+
+
+def _categorica(s: pd.Series) -> pd.Series:
+    """Texto cru -> category com as categorias sem espaços nas pontas.
+
+    Fatoriza antes de limpar: o strip roda só nos valores distintos (poucos
+    em Tipo, Categoria, Responsável, Método), não em cada linha.
+    """
+    cat = s.astype("category")
+    limpas = pd.Index(cat.cat.categories.astype(str)).str.strip()
+    novos, uniq = pd.factorize(limpas)
+    codes = cat.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, novos[np.maximum(codes, 0)] if len(novos) else -1, -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=uniq), index=s.index, name=s.name)
+
+
+def _tipar(df: pd.DataFrame, esquema: Optional[Dict[str, str]]) -> pd.DataFrame:
+    """Converte as colunas de texto cru para os tipos do `esquema`."""
+    for col, tipo in (esquema or {}).items():
         if col not in df.columns:
-            df[col] = pd.NA
-    return df[headers]
+            continue
+        if tipo == "data":
+            df[col] = parse_data_col(df[col])
+        elif tipo == "valor":
+            df[col] = _money_to_float_series(df[col])
+        elif tipo == "int":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif tipo == "cat":
+            df[col] = _categorica(df[col])
+        elif tipo == "texto":
+            df[col] = df[col].astype(_TEXTO)
+    return df
+
+
+def _concat_tipado(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """pd.concat que mantém as colunas categóricas (unindo as categorias)."""
+    if b.empty or a.empty:  # concat com lado vazio: FutureWarning e nada a unir
+        return (a if b.empty else b).copy(deep=False)
+    df = pd.concat([a, b])
+    for col in a.columns:
+        if isinstance(a[col].dtype, pd.CategoricalDtype) and isinstance(b[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.api.types.union_categoricals([a[col], b[col]], ignore_order=True)
+        elif b[col].dtype == _TEXTO and a[col].dtype != _TEXTO:  # ex.: snapshot de versão anterior
+            df[col] = df[col].astype(_TEXTO)
+    return df
+
+
+def _entrada(ss: storage.Armazenamento, title: str, valores: List[List[Any]], headers: List[str],
+             esquema: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Entrada de cache a partir dos valores da aba inteira (cabeçalho incluso)."""
+    if not valores:  # aba vazia: grava o cabeçalho
+        ss.anexar(title, [list(headers)])
+    cab = list(valores[0]) if valores else list(headers)
+    linhas = [list(l) for l in valores[1:]]
+    return {
+        "cab": cab, "n": len(linhas),
+        "cauda": _hash_linhas(linhas[-_CAUDA:], len(cab)),
+        "df": _tipar(_linhas_to_df(cab, linhas, headers), esquema),
+    }
+
+
+def _ausente(ss: storage.Armazenamento, title: str) -> bool:
+    return title in _SOB_DEMANDA and not ss.existe(title)
+
+
+def _entrada_ausente(title: str, headers: List[str],
+                     esquema: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Entrada de cache de uma aba _SOB_DEMANDA que ainda não existe (df vazio)."""
+    return {"cab": list(headers), "n": 0, "cauda": _hash_linhas([], len(headers)),
+            "ausente": True, "df": _tipar(_linhas_to_df(list(headers), [], headers), esquema)}
+
+
+def _ler_completo(ss: storage.Armazenamento, title: str, headers: List[str],
+                  esquema: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    if _ausente(ss, title):
+        return _entrada_ausente(title, headers, esquema)
+    ss.garantir(title, headers)
+    return _entrada(ss, title, ss.ler([title])[title], headers, esquema)
+
+
+def _ler_varias(ss: storage.Armazenamento, titles: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Leitura completa de várias abas numa só chamada (values:batchGet no Sheets)."""
+    ausentes = [t for t in titles if _ausente(ss, t)]
+    titles = [t for t in titles if t not in ausentes]
+    for t in titles:
+        ss.garantir(t, _HEADERS[t])
+    valores = ss.ler(titles) if titles else {}
+    out = {t: _entrada(ss, t, valores[t], _HEADERS[t], _ESQUEMAS.get(t)) for t in titles}
+    out.update({t: _entrada_ausente(t, _HEADERS[t], _ESQUEMAS.get(t)) for t in ausentes})
+    return out
+
+
+def _ler_delta(ss: storage.Armazenamento, title: str, ent: Dict[str, Any], headers: List[str],
+               esquema: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+    """Busca só as linhas abaixo da marca d'água `n`.
+
+    Relê junto o cabeçalho e as últimas linhas já conhecidas; se algo acima da
+    marca mudou (linhas apagadas, mês regravado pelo Detalhamento...), devolve
+    None e quem chamou faz a leitura completa.
+    """
+    cab, n = ent["cab"], ent["n"]
+    k = min(n, _CAUDA)
+    cab_atual, bloco = ss.ler_linhas(title, [(1, 1), (n + 2 - k, None)], len(cab))
+    cab_atual = list(cab_atual[0]) if cab_atual else []
+    bloco = [list(l) for l in bloco]
+    if _hash_linhas([cab_atual], len(cab)) != _hash_linhas([cab], len(cab)):
+        return None
+    if len(bloco) < k or _hash_linhas(bloco[:k], len(cab)) != ent["cauda"]:
+        return None
+
+    novas = bloco[k:]
+    if not novas:
+        return dict(ent)
+    df_novas = _tipar(_linhas_to_df(cab, novas, headers, inicio=n + 2), esquema)
+    return {
+        **ent, "n": n + len(novas),
+        "cauda": _hash_linhas(bloco[-_CAUDA:], len(cab)),
+        "df": _concat_tipado(ent["df"], df_novas),
+    }
+
+
+# ------------------------- Cache ------------------------- #
+def _cfg(st, secao: str, chave: str, padrao: Any) -> Any:
+    try:
+        return st.secrets.get(secao, {}).get(chave, padrao)
+    except Exception:
+        return padrao
+
+
+def _cfg_cache(st, chave: str, padrao: Any) -> Any:
+    return _cfg(st, "cache", chave, padrao)
+
+
+def _ttl(st) -> float:
+    return float(_cfg_cache(st, "ttl", _TTL_PADRAO))
+
+
+def _compartilhado(st) -> Dict[str, Any]:
+    """Estado comum a todas as sessões do processo: cache das abas, travas e eventos."""
+    @st.cache_resource(show_spinner=False)
+    def _estado():
+        return {"cache": {}, "travas": {}, "lock": threading.Lock(),
+                "eventos": deque(maxlen=_MAX_EVENTOS), "seq": 0}
+    return _estado()
+
+
+def _cache_sessao(st) -> Dict[tuple, Dict[str, Any]]:
+    """Cache das abas. Com [cache] compartilhado = true (padrão) é um só para o
+    processo: N sessões abertas custam uma leitura da planilha, não N."""
+    if _cfg_cache(st, "compartilhado", True):
+        return _compartilhado(st)["cache"]
+    return st.session_state.setdefault("__sheets_cache__", {})
+
+
+def _trava(st, chave: tuple) -> threading.Lock:
+    """Trava por aba: sessões que chegam juntas esperam a mesma leitura."""
+    comp = _compartilhado(st)
+    with comp["lock"]:
+        return comp["travas"].setdefault(chave, threading.Lock())
+
+
+def _publicar(st, ss_id: Optional[str], title: Optional[str], tipo: str) -> None:
+    """Avisa as outras sessões que os dados de `title` mudaram (ver observar_alteracoes)."""
+    comp = _compartilhado(st)
+    with comp["lock"]:
+        comp["seq"] += 1
+        comp["eventos"].append({"seq": comp["seq"], "ss_id": ss_id, "aba": title,
+                                "tipo": tipo, "sessao": transport._sessao_atual()})
+
+
+def observar_alteracoes(st) -> None:
+    """Reroda a sessão quando outra sessão (ou o sincronizador) mudou os dados.
+
+    Chamada no topo do app: marca os eventos já vistos por este rerun e
+    registra um fragmento que confere o barramento a cada [cache] observar
+    segundos (0 desliga). A conferência é só memória; nada vai à rede.
+    """
+    comp = _compartilhado(st)
+    st.session_state["__eventos_vistos__"] = comp["seq"]
+    intervalo = float(_cfg_cache(st, "observar", _OBSERVAR_PADRAO))
+    fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if intervalo <= 0 or fragmento is None:
+        return
+
+    @fragmento(run_every=intervalo)
+    def _observar():
+        visto = st.session_state.get("__eventos_vistos__", 0)
+        if comp["seq"] <= visto:
+            return
+        eu = transport._sessao_atual()
+        with comp["lock"]:
+            novos = [e for e in comp["eventos"] if e["seq"] > visto and e["sessao"] != eu]
+            st.session_state["__eventos_vistos__"] = comp["seq"]
+        if novos:
+            st.rerun()
+
+    _observar()
+
+
+def _pasta_snapshot(st) -> Optional[Path]:
+    if not _cfg_cache(st, "snapshot", True):
+        return None
+    return Path(_cfg_cache(st, "snapshot_dir", Path(__file__).parent / ".snapshots"))
+
+
+def _versao(ss_id: str, title: str, ent: Dict[str, Any]) -> str:
+    """Identifica o conteúdo de um DataFrame carregado (vai em df.attrs["versao"])."""
+    return hashlib.sha1(f"{ss_id}|{title}|{ent['rev']}|{ent['n']}|{ent['cauda']}".encode()).hexdigest()[:16]
+
+
+def _atualizar(st, ss: storage.Armazenamento, title: str, headers: List[str],
+               ent: Optional[Dict[str, Any]], agora: float, rev: Any = _SEM_REV) -> Dict[str, Any]:
+    """Nova entrada de cache para `title`: mantém, aplica delta ou relê tudo."""
+    if rev is _SEM_REV:
+        rev = ss.revisao()
+    if ent is not None and rev is not None and rev == ent["rev"]:
+        return {**ent, "ts": agora}
+
+    esquema = _ESQUEMAS.get(title)
+    novo = None
+    incremental = _cfg_cache(st, "modo", "incremental") == "incremental"
+    recarga = float(_cfg_cache(st, "recarga_completa", _RECARGA_COMPLETA))
+    if (ent is not None and incremental and not ent.get("ausente")
+            and agora - ent["ts_completo"] < recarga):
+        novo = _ler_delta(ss, title, ent, headers, esquema)
+    if novo is None:
+        novo = _ler_completo(ss, title, headers, esquema)
+        novo["ts_completo"] = agora
+    return _finalizar(st, ss, title, ent, novo, rev, agora)
+
+
+def _finalizar(st, ss: storage.Armazenamento, title: str, ent: Optional[Dict[str, Any]],
+               novo: Dict[str, Any], rev: Optional[str], agora: float) -> Dict[str, Any]:
+    """Carimba revisão/versão na entrada nova e grava o snapshot se o df mudou."""
+    novo.update(rev=rev, ts=agora)
+    if ent is None or novo["df"] is not ent["df"]:
+        if novo["ts_completo"] != agora:  # veio de _ler_delta: mesmas linhas + novas no fim
+            novo["df"].attrs["versao_base"] = ent["df"].attrs.get("versao")
+        novo["df"].attrs["versao"] = _versao(ss.id, title, novo)
+
+    pasta = _pasta_snapshot(st)
+    if (pasta is not None and not novo.get("ausente")
+            and (ent is None or novo["df"] is not ent["df"])):
+        snapshot.gravar_em_segundo_plano(
+            pasta, ss.id, title, novo["df"],
+            {k: novo[k] for k in ("rev", "n", "cab", "cauda")},
+        )
+    return novo
+
+
+def _reconciliar_em_segundo_plano(st, ss, title: str, headers: List[str],
+                                  cache: Dict[tuple, Dict[str, Any]], chave: tuple,
+                                  ent: Dict[str, Any]) -> None:
+    def _run():
+        try:
+            novo = _atualizar(st, ss, title, headers, ent, time.monotonic())
+        except Exception:
+            return  # segue com o snapshot; a próxima leitura após o TTL tenta de novo
+        if cache.get(chave) is ent:  # ninguém invalidou/recarregou enquanto isso
+            cache[chave] = novo
+            if novo["df"] is not ent["df"]:
+                _publicar(st, ss.id, title, "atualizado")
+
+    t = threading.Thread(target=_run, daemon=True)
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx
+        add_script_run_ctx(t)
+    except Exception:
+        pass
+    t.start()
+
+
+def _carregar_cacheado(st, ss: storage.Armazenamento, title: str, headers: List[str]) -> pd.DataFrame:
+    """DataFrame da aba `title`, reaproveitado enquanto o TTL valer ou a revisão não mudar.
+
+    Com [cache] modo = "incremental" (padrão), uma revisão nova só traz as
+    linhas acrescentadas depois da última leitura; a leitura integral fica
+    para o primeiro acesso, para edições acima da marca d'água e para a
+    recarga periódica de segurança.
+
+    Na partida a frio do processo, se houver snapshot local, ele é devolvido
+    na hora e a conferência com o Google Sheets roda em segundo plano. Aba
+    invalidada (Atualizar dados, edição) nunca volta pelo snapshot: relê já.
+
+    Com a fila local ligada, as gravações ainda não enviadas aparecem por cima
+    (_com_fila) e, se a planilha não responder, segue valendo a última cópia.
+    """
+    cache = _cache_sessao(st)
+    chave = (ss.id, title)
+    geracao = _geracao(st, ss)
+
+    def _valida(ent):
+        return (ent is not None and time.monotonic() - ent["ts"] < _ttl(st)
+                and ent.get("geracao", geracao) == geracao)
+
+    ent = cache.get(chave)
+    if _valida(ent):
+        return _com_fila(st, ss, title, ent)
+    with _trava(st, chave):
+        ent = cache.get(chave)
+        if _valida(ent):  # outra sessão acabou de carregar
+            return _com_fila(st, ss, title, ent)
+        return _carregar_travado(st, ss, title, headers, cache, chave, ent, geracao)
+
+
+def _carregar_travado(st, ss: storage.Armazenamento, title: str, headers: List[str],
+                      cache: Dict[tuple, Dict[str, Any]], chave: tuple,
+                      ent: Optional[Dict[str, Any]], geracao: int) -> pd.DataFrame:
+    agora = time.monotonic()
+    pasta = _pasta_snapshot(st)
+    invalidada = ent is not None and ent.get("invalidada", False)
+    if invalidada:
+        ent = None  # leitura integral síncrona
+    if ent is None and not invalidada and pasta is not None:
+        snap = snapshot.ler(pasta, ss.id, title)
+        if snap is not None and {"rev", "n", "cab", "cauda"} <= snap[1].keys():
+            df, meta = snap
+            df.attrs["versao"] = _versao(ss.id, title, meta)
+            ent = {**meta, "df": df, "ts": agora, "ts_completo": float("-inf"),
+                   "geracao": geracao}
+            cache[chave] = ent
+            _reconciliar_em_segundo_plano(st, ss, title, headers, cache, chave, ent)
+            return _com_fila(st, ss, title, ent)
+
+    # o sincronizador gravou na planilha desde a leitura: relê inteira, já que o
+    # lote pode ter editado/apagado linhas acima da marca d'água
+    sincronizou = ent is not None and ent.get("geracao", geracao) != geracao
+    try:
+        novo = _atualizar(st, ss, title, headers, None if sincronizou else ent, agora)
+    except Exception:
+        if ent is None or _fila(st) is None:
+            raise
+        # planilha fora do alcance: fica com o que já temos e tenta de novo em pouco tempo
+        novo = {**ent, "ts": agora - _ttl(st) + _RETENTAR_OFFLINE}
+    novo["geracao"] = geracao
+    cache[chave] = novo
+    if ent is not None and novo["df"] is not ent["df"]:
+        _publicar(st, ss.id, title, "atualizado")
+    return _com_fila(st, ss, title, novo)
+
+
+def pre_carregar(st, ss: storage.Armazenamento, titles: List[str]) -> None:
+    """Aquece o cache de várias abas de uma vez, antes do primeiro render.
+
+    As abas sem cache nem snapshot vêm juntas num único values:batchGet; as
+    com TTL vencido são conferidas (revisão + delta) em paralelo, com uma
+    consulta de revisão só para todas. O tempo fica o da aba mais lenta, não
+    a soma. Depois disso, load_*_df acha tudo no cache.
+    """
+    cache = _cache_sessao(st)
+    with ExitStack() as travas:
+        for title in sorted(set(titles)):  # ordem fixa: sem impasse entre sessões
+            travas.enter_context(_trava(st, (ss.id, title)))
+        _pre_carregar_travado(st, ss, list(dict.fromkeys(titles)), cache)
+
+
+def _pre_carregar_travado(st, ss: storage.Armazenamento, titles: List[str],
+                          cache: Dict[tuple, Dict[str, Any]]) -> None:
+    agora = time.monotonic()
+    ttl = _ttl(st)
+    pasta = _pasta_snapshot(st)
+    frias, vencidas = [], []
+    for title in titles:
+        ent = cache.get((ss.id, title))
+        if ent is None or ent.get("invalidada", False):
+            if ent is not None or pasta is None or not snapshot.caminho(pasta, ss.id, title).exists():
+                frias.append(title)  # snapshot só a frio: _carregar_cacheado serve na hora
+        elif agora - ent["ts"] >= ttl:
+            vencidas.append(title)
+    if not frias and not vencidas:
+        return
+
+    geracao = _geracao(st, ss)
+    try:
+        rev = ss.revisao()  # antes das leituras: revisão nunca mais nova que os dados
+        with ThreadPoolExecutor(max_workers=len(vencidas) + 1) as ex:
+            f_frias = ex.submit(_ler_varias, ss, frias) if frias else None
+            f_vencidas = {t: ex.submit(_atualizar, st, ss, t, _HEADERS[t], cache[(ss.id, t)], agora, rev)
+                          for t in vencidas}
+            novos = {}
+            if f_frias is not None:
+                for title, novo in f_frias.result().items():
+                    novo["ts_completo"] = agora
+                    novos[title] = _finalizar(st, ss, title, None, novo, rev, agora)
+            for title, fut in f_vencidas.items():
+                novos[title] = fut.result()
+    except Exception:
+        if _fila(st) is None:
+            raise
+        return  # sem rede: cada load_*_df decide (cópia local ou erro)
+    for title, novo in novos.items():
+        novo["geracao"] = geracao
+        cache[(ss.id, title)] = novo
+
+
+def invalidar(st, ss: Optional[storage.Armazenamento] = None, title: Optional[str] = None,
+              completo: bool = True) -> None:
+    """Invalida o cache da aba `title` (ou de todas). Chamado pelos caminhos de escrita.
+
+    completo=False serve para quem só acrescentou linhas no fim: mantém a marca
+    d'água e a próxima leitura busca apenas o delta. completo=True deixa uma
+    lápide no lugar da entrada: a próxima leitura é integral e síncrona (o
+    snapshot, anterior à escrita, fica só para a partida a frio).
+    """
+    cache = _cache_sessao(st)
+    for chave in list(cache):
+        if (ss is None or chave[0] == ss.id) and (title is None or chave[1] == title):
+            if completo:
+                cache[chave] = {"invalidada": True, "ts": float("-inf")}
+            elif chave in cache:
+                cache[chave] = {**cache[chave], "ts": float("-inf")}
+    _publicar(st, None if ss is None else ss.id, title, "invalidado")
+
+
+def _limpador(title: str):
+    def clear(ss: Optional[storage.Armazenamento] = None, completo: bool = True) -> None:
+        import streamlit as st
+        invalidar(st, ss, title, completo)
+    return clear
 
 
 def load_main_df(st, ss=None) -> pd.DataFrame:
     """Compatível com load_main_df(st) e load_main_df(st, spreadsheet)."""
     if ss is None:
         ss = get_sheet(st)
-    ws = ensure_worksheet(ss, "Lancamentos", _HEADERS_MAIN)
-    return _ws_to_df(ws, _HEADERS_MAIN)
+    return _carregar_cacheado(st, ss, "Lancamentos", _HEADERS_MAIN)
 
 
 def load_pm_df(st, ss=None) -> pd.DataFrame:
     """Compatível com load_pm_df(st) e load_pm_df(st, spreadsheet)."""
     if ss is None:
         ss = get_sheet(st)
-    ws = ensure_worksheet(ss, "PagamentosMensais", _HEADERS_PM)
-    return _ws_to_df(ws, _HEADERS_PM)
-
-# ---- Funções usadas pela aba de Planejamento (compat) ---- #
-def ws_plan(st):
-    ss = get_sheet(st)
-    return ensure_worksheet(ss, "Planejamento", ["Categoria", "Meta (R$)", "Observações"])
-
-def load_plan_df(st):
-    ws = ws_plan(st)
-    return _ws_to_df(ws, ["Categoria", "Meta (R$)", "Observações"])
-
-def salvar_plan(st, df: pd.DataFrame):
-    ws = ws_plan(st)
-    ws.clear()
-    ws.update([df.columns.values.tolist()] + df.values.tolist(), value_input_option="USER_ENTERED")
+    return _carregar_cacheado(st, ss, "PagamentosMensais", _HEADERS_PM)
+
+
+def load_parc_df(st, ss=None) -> pd.DataFrame:
+    """Planos de parcelamento (aba Parcelamentos), uma linha por compra."""
+    if ss is None:
+        ss = get_sheet(st)
+    return _carregar_cacheado(st, ss, "Parcelamentos", _HEADERS_PARC)
+
+# ---- Funções usadas pela aba de Planejamento ---- #
+def load_plan_df(st, ss=None) -> pd.DataFrame:
+    if ss is None:
+        ss = get_sheet(st)
+    return _carregar_cacheado(st, ss, "Planejamento", _HEADERS_PLAN)
+
+def load_metas_df(st, ss=None) -> pd.DataFrame:
+    """Metas do planejamento (aba Metas), uma linha por (Ano, Mês, Categoria)."""
+    if ss is None:
+        ss = get_sheet(st)
+    return _carregar_cacheado(st, ss, "Metas", _HEADERS_METAS)
+
+def salvar_metas(st, ss: storage.Armazenamento, novas: List[List[Any]],
+                 edicoes: Dict[int, Tuple[List[Any], List[Any]]]) -> None:
+    """Grava só as metas alteradas num lote: {linha: (novos, antigos)} e linhas novas no fim."""
+    with BufferEscrita(st, ss) as buf:
+        for linha, (valores, antes) in edicoes.items():
+            buf.atualizar_linha("Metas", int(linha), valores, antes=antes)
+        buf.anexar_linhas("Metas", novas)
+
+
+# ------------------------- Escrita em lote ------------------------- #
+def _com_retentativa(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Chama `fn` repetindo em 429/5xx e falhas de conexão (backoff exponencial + jitter)."""
+    for i in range(_TENTATIVAS):
+        try:
+            return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status not in _STATUS_RETENTAVEIS or i == _TENTATIVAS - 1:
+                raise
+        except (requests.ConnectionError, requests.Timeout):
+            if i == _TENTATIVAS - 1:
+                raise
+        time.sleep(min(30.0, 2 ** i) + random.uniform(0, 1))
+
+
+def _autor(st) -> str:
+    for nome in ("user", "experimental_user"):
+        try:
+            email = getattr(st, nome).get("email")
+        except Exception:
+            continue
+        if email:
+            return str(email)
+    return "desconhecido"
+
+
+def _pasta_journal(st) -> Optional[Path]:
+    if not _cfg(st, "journal", "ativo", True):
+        return None
+    return Path(_cfg(st, "journal", "dir", Path(__file__).parent / ".journal"))
+
+
+def _registrar_journal(st, ss: storage.Armazenamento, ops: List[Dict[str, Any]]) -> None:
+    pasta = _pasta_journal(st)
+    if pasta is None or not ops:
+        return
+    try:
+        journal.registrar(pasta, ss.id, _autor(st), ops, _cfg(st, "journal", "reter_dias", None))
+    except Exception:
+        pass  # o diário não pode impedir uma gravação que já foi feita
+
+
+class FalhaEscrita(RuntimeError):
+    """Parte das gravações de um BufferEscrita falhou.
+
+    Cada aba é gravada numa única chamada (tudo ou nada); `gravadas` lista as
+    abas que foram, `pendentes` as que continuam no buffer para nova tentativa.
+    """
+
+    def __init__(self, gravadas: List[str], pendentes: Dict[str, Exception]):
+        self.gravadas = gravadas
+        self.pendentes = pendentes
+        detalhe = "; ".join(f"{t}: {e}" for t, e in pendentes.items())
+        super().__init__(f"Falha ao gravar na planilha ({detalhe}).")
+
+
+class BufferEscrita:
+    """Junta linhas e grava cada aba com um só append_rows (e as edições num batch_update).
+
+        with BufferEscrita(st, spreadsheet) as buf:
+            buf.anexar_linhas("Lancamentos", registros)
+
+    A saída do `with` sem exceção chama gravar(); o cache das abas gravadas é
+    invalidado em seguida e cada operação gravada vai para o diário local
+    (journal.py), com o valor anterior quando quem chamou o informou.
+    """
+
+    def __init__(self, st, ss: storage.Armazenamento):
+        self._st = st
+        self._ss = ss
+        self._novas: Dict[str, List[List[Any]]] = {}
+        self._edicoes: Dict[str, Dict[int, List[Any]]] = {}
+        self._remocoes: Dict[str, set] = {}
+        self._antes: Dict[Tuple[str, int], List[Any]] = {}
+
+    def anexar(self, title: str, linha: List[Any]) -> None:
+        self._novas.setdefault(title, []).append(list(linha))
+
+    def anexar_linhas(self, title: str, linhas: List[List[Any]]) -> None:
+        for linha in linhas:
+            self.anexar(title, linha)
+
+    def atualizar_linha(self, title: str, linha: int, valores: List[Any],
+                        antes: Optional[List[Any]] = None) -> None:
+        """Sobrescreve a linha `linha` (numeração da planilha, 1 = cabeçalho)."""
+        self._edicoes.setdefault(title, {})[linha] = list(valores)
+        if antes is not None:
+            self._antes[(title, linha)] = list(antes)
+
+    def apagar_linhas(self, title: str, linhas: List[int],
+                      antes: Optional[Dict[int, List[Any]]] = None) -> None:
+        """Remove linhas da planilha; aplicado depois das edições, de baixo para cima."""
+        if len(linhas):
+            self._remocoes.setdefault(title, set()).update(int(l) for l in linhas)
+        for l, valores in (antes or {}).items():
+            self._antes[(title, int(l))] = list(valores)
+
+    def __len__(self) -> int:
+        return (sum(len(v) for v in self._novas.values())
+                + sum(len(v) for v in self._edicoes.values())
+                + sum(len(v) for v in self._remocoes.values()))
+
+    def _invalidar(self, title: str, completo: bool = True) -> None:
+        invalidar(self._st, self._ss, title, completo)
+
+    def _registrar(self, ops: List[Dict[str, Any]]) -> None:
+        _registrar_journal(self._st, self._ss, ops)
+
+    def _fila(self) -> Optional[outbox.Fila]:
+        return _fila(self._st)
+
+    def _lote(self) -> Dict[str, Any]:
+        """Conteúdo do buffer em JSON (o que vai para a fila local)."""
+        return {
+            "novas": self._novas,
+            "edicoes": {t: {str(l): v for l, v in ls.items()} for t, ls in self._edicoes.items()},
+            "remocoes": {t: sorted(ls) for t, ls in self._remocoes.items()},
+            "antes": [[t, l, v] for (t, l), v in self._antes.items()],
+        }
+
+    def _restaurar(self, corpo: Dict[str, Any]) -> None:
+        self._novas = {t: [list(l) for l in ls] for t, ls in corpo.get("novas", {}).items()}
+        self._edicoes = {t: {int(l): list(v) for l, v in ls.items()}
+                         for t, ls in corpo.get("edicoes", {}).items()}
+        self._remocoes = {t: set(ls) for t, ls in corpo.get("remocoes", {}).items()}
+        self._antes = {(t, int(l)): list(v) for t, l, v in corpo.get("antes", [])}
+
+    def gravar(self) -> List[str]:
+        """Grava o buffer. Com a fila local ligada ([local] ativo = true), só
+        enfileira e volta na hora; o envio fica com o sincronizador."""
+        fila = self._fila()
+        if fila is not None:
+            titles = list(dict.fromkeys([*self._edicoes, *self._remocoes, *self._novas]))
+            if titles:
+                fila.enfileirar(self._ss.id, _autor(self._st), self._lote())
+                self._restaurar({})
+                _sincronizador(self._st, self._ss).acordar()
+            return titles
+
+        gravadas: List[str] = []
+        pendentes: Dict[str, Exception] = {}
+        ops: List[Dict[str, Any]] = []
+        try:
+            self._gravar(gravadas, pendentes, ops)
+        finally:
+            self._registrar(ops)
+        if pendentes:
+            raise FalhaEscrita(gravadas, pendentes)
+        return gravadas
+
+    def _gravar(self, gravadas: List[str], pendentes: Dict[str, Exception],
+                ops: List[Dict[str, Any]]) -> None:
+
+        if self._edicoes:
+            try:
+                _com_retentativa(self._ss.atualizar, self._edicoes)
+            except Exception as e:
+                pendentes.update({title: e for title in self._edicoes})
+            else:
+                for title, linhas in self._edicoes.items():
+                    ops.extend({"aba": title, "op": "update", "linha": l, "depois": v,
+                                "antes": self._antes.pop((title, l), None)}
+                               for l, v in sorted(linhas.items()))
+                    self._invalidar(title)
+                    gravadas.append(title)
+                self._edicoes = {}
+
+        # Remover desloca as linhas de baixo: só depois que as edições entraram.
+        for title in list(self._remocoes):
+            if title in pendentes:
+                continue
+            try:
+                _com_retentativa(self._ss.apagar, title, sorted(self._remocoes[title], reverse=True))
+            except Exception as e:
+                pendentes[title] = e
+                continue
+            ops.extend({"aba": title, "op": "delete", "linha": l,
+                        "antes": self._antes.pop((title, l), None)}
+                       for l in sorted(self._remocoes[title], reverse=True))
+            del self._remocoes[title]
+            self._invalidar(title)
+            if title not in gravadas:
+                gravadas.append(title)
+
+        for title in list(self._novas):
+            try:
+                self._ss.garantir(title, _HEADERS.get(title, []))
+                ini = _com_retentativa(self._ss.anexar, title, self._novas[title])
+            except Exception as e:
+                pendentes[title] = e
+                continue
+            ops.extend({"aba": title, "op": "insert", "depois": v,
+                        "linha": None if ini is None else ini + i}
+                       for i, v in enumerate(self._novas.pop(title)))
+            self._invalidar(title, completo=False)
+            if title not in gravadas:
+                gravadas.append(title)
+
+    def __enter__(self) -> "BufferEscrita":
+        return self
+
+    def __exit__(self, tipo, valor, tb) -> bool:
+        if tipo is None:
+            self.gravar()
+        return False
+
+
+# ------------------------- Fila local (offline) ------------------------- #
+def _local(st) -> Dict[str, Any]:
+    arq = Path(_cfg(st, "local", "dir", Path(__file__).parent / ".local")) / "fila.sqlite3"
+
+    @st.cache_resource(show_spinner=False)
+    def _recursos(arq: str):
+        return {"fila": outbox.Fila(Path(arq)), "sinc": {}, "lock": threading.Lock()}
+
+    return _recursos(str(arq))
+
+
+def _fila(st) -> Optional[outbox.Fila]:
+    """Fila local de gravações, ou None (grava direto) sem [local] ativo = true.
+
+    Desligada por padrão: em hospedagem com disco efêmero (ex.: Streamlit
+    Cloud) um lote ainda não enviado some quando o contêiner reinicia.
+    """
+    if not _cfg(st, "local", "ativo", False):
+        return None
+    return _local(st)["fila"]
+
+
+def _geracao(st, ss: storage.Armazenamento) -> int:
+    fila = _fila(st)
+    return fila.geracao(ss.id) if fila is not None else 0
+
+
+def _sincronizador(st, ss: storage.Armazenamento) -> outbox.Sincronizador:
+    """Sincronizador da planilha (um por processo), criado no primeiro uso."""
+    rec = _local(st)
+    with rec["lock"]:
+        sinc = rec["sinc"].get(ss.id)
+        if sinc is None:
+            pasta = _pasta_journal(st)
+            reter = _cfg(st, "journal", "reter_dias", None)
+            sinc = outbox.Sincronizador(
+                rec["fila"], ss.id,
+                lambda lote: _aplicar_lote(get_sheet(st), lote, pasta, reter),
+                float(_cfg(st, "local", "intervalo", outbox._INTERVALO)),
+                ao_enviar=lambda lote: _publicar(st, ss.id, None, "sincronizado"),
+            )
+            rec["sinc"][ss.id] = sinc
+        return sinc
+
+
+class _BufferSincronizacao(BufferEscrita):
+    """BufferEscrita usado pelo sincronizador: fora de sessão, grava direto na planilha."""
+
+    def __init__(self, ss: storage.Armazenamento, corpo: Dict[str, Any], autor: str,
+                 pasta_journal: Optional[Path], reter_dias: Optional[float]):
+        super().__init__(None, ss)
+        self._restaurar(corpo)
+        self._autor = autor
+        self._pasta = pasta_journal
+        self._reter = reter_dias
+
+    def _invalidar(self, title: str, completo: bool = True) -> None:
+        pass  # as sessões percebem pela geração da fila
+
+    def _registrar(self, ops: List[Dict[str, Any]]) -> None:
+        if self._pasta is not None and ops:
+            try:
+                journal.registrar(self._pasta, self._ss.id, self._autor, ops, self._reter)
+            except Exception:
+                pass
+
+    def _fila(self) -> Optional[outbox.Fila]:
+        return None
+
+    def divergentes(self) -> Dict[str, List[int]]:
+        """Linhas com valor anterior conhecido que mudaram na planilha desde a leitura."""
+        por_aba: Dict[str, Dict[int, List[Any]]] = {}
+        for (title, linha), antes in self._antes.items():
+            if linha in self._edicoes.get(title, {}) or linha in self._remocoes.get(title, set()):
+                por_aba.setdefault(title, {})[linha] = antes
+        out = {}
+        for title, antes in por_aba.items():
+            esperado = pd.DataFrame.from_dict(antes, orient="index", columns=_HEADERS[title])
+            linhas = _linhas_divergentes(self._ss, title, esperado)
+            if linhas:
+                out[title] = linhas
+        return out
+
+
+def _aplicar_lote(ss: storage.Armazenamento, lote: Dict[str, Any], pasta_journal: Optional[Path],
+                  reter_dias: Optional[float]) -> Tuple[str, Dict[str, Any], str]:
+    """Envia um lote da fila (ver outbox.Sincronizador)."""
+    buf = _BufferSincronizacao(ss, lote["corpo"], lote["autor"] or "desconhecido",
+                               pasta_journal, reter_dias)
+    if not lote["forcar"]:
+        divergentes = buf.divergentes()
+        if divergentes:
+            detalhe = "; ".join(f"{t}: linhas {', '.join(map(str, ls))}" for t, ls in divergentes.items())
+            return "conflito", lote["corpo"], f"Alteradas na planilha desde a leitura ({detalhe})."
+    try:
+        buf.gravar()
+    except FalhaEscrita as e:
+        return "parcial", buf._lote(), str(e)
+    return "ok", {}, ""
+
+
+def _sobrepor(df: pd.DataFrame, title: str, corpos: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Aplica ao df carregado os lotes ainda não enviados, na ordem da fila."""
+    headers = _HEADERS[title]
+    esquema = _ESQUEMAS.get(title)
+
+    def _tipadas(linhas: List[List[Any]], inicio: int) -> pd.DataFrame:
+        return _tipar(_linhas_to_df(headers, linhas, headers, inicio=inicio), esquema)
+
+    for corpo in corpos:
+        ed = corpo.get("edicoes", {}).get(title, {})
+        if ed:
+            nums = sorted(int(l) for l in ed)
+            novas = _tipadas([ed[str(l)] for l in nums], 0)
+            novas.index = [nums[i] for i in novas.index]
+            df = _concat_tipado(df.drop(index=nums, errors="ignore"), novas).sort_index()
+        for l in sorted(corpo.get("remocoes", {}).get(title, []), reverse=True):
+            df = df.drop(index=l, errors="ignore")
+            idx = df.index.to_numpy()
+            df.index = idx - (idx > l)  # como na planilha: as linhas de baixo sobem
+        anexos = corpo.get("novas", {}).get(title, [])
+        if anexos:
+            ini = int(df.index.max()) + 1 if len(df) else 2
+            df = _concat_tipado(df, _tipadas(anexos, ini))
+    return df
+
+
+def _com_fila(st, ss: storage.Armazenamento, title: str, ent: Dict[str, Any]) -> pd.DataFrame:
+    """df da entrada de cache com as gravações pendentes da fila por cima."""
+    fila = _fila(st)
+    if fila is None:
+        return ent["df"]
+    lotes = [l for l in fila.lotes(ss.id, outbox.PENDENTE)
+             if any(title in l["corpo"].get(k, {}) for k in ("novas", "edicoes", "remocoes"))]
+    if not lotes:
+        return ent["df"]
+    base = ent["df"].attrs.get("versao")
+    chave = (base, tuple((l["id"], l["tentativas"]) for l in lotes))
+    memo = ent.get("sobreposto")
+    if memo is not None and memo[0] == chave:
+        return memo[1]
+    df = _sobrepor(ent["df"], title, [l["corpo"] for l in lotes])
+    df.attrs = {"versao": hashlib.sha1(repr(chave).encode()).hexdigest()[:16]}
+    ent["sobreposto"] = (chave, df)
+    return df
+
+
+def painel_local(st, ss: storage.Armazenamento) -> None:
+    """Pendências e conflitos da fila local na barra lateral."""
+    fila = _fila(st)
+    if fila is None:
+        return
+    sinc = _sincronizador(st, ss) if fila.lotes(ss.id) else _local(st)["sinc"].get(ss.id)
+    outbox.painel(st, fila, sinc, ss.id)
+
+
+# ------------------------- Edição por diff ------------------------- #
+class ConflitoEdicao(RuntimeError):
+    """Linhas editadas mudaram na planilha depois da leitura (outra sessão, edição manual)."""
+
+    def __init__(self, linhas: List[int]):
+        self.linhas = linhas
+        super().__init__(
+            "A planilha mudou desde a última leitura nas linhas "
+            + ", ".join(map(str, linhas)) + ". Atualize os dados e refaça a edição."
+        )
+
+
+def _para_planilha(df: pd.DataFrame, title: str) -> pd.DataFrame:
+    """Representação em texto, como as linhas são gravadas (dd/mm/aaaa, valores com ponto)."""
+    esquema = _ESQUEMAS.get(title, {})
+    out = pd.DataFrame(index=df.index)
+    for col in _HEADERS[title]:
+        s = df[col] if col in df.columns else pd.Series(pd.NA, index=df.index)
+        tipo = esquema.get(col)
+        if tipo == "data":
+            s = pd.to_datetime(s, errors="coerce").dt.strftime("%d/%m/%Y")
+        elif tipo == "valor":
+            s = pd.to_numeric(s, errors="coerce").map(lambda v: f"{v:.2f}", na_action="ignore")
+        out[col] = s.astype("string").fillna("").str.strip()
+    return out
+
+
+def diff_linhas(original: pd.DataFrame, editado: pd.DataFrame
+                ) -> Tuple[Dict[int, List[str]], List[int], List[List[str]]]:
+    """Compara duas tabelas em texto (ver _para_planilha) indexadas pela linha da planilha.
+
+    Linhas de `editado` com índice nulo são novas. Devolve (edições, remoções,
+    inserções) — só o que mudou.
+    """
+    novas = editado.index.isna()
+    inser = editado[novas].values.tolist()
+    ed = editado[~novas]
+    ed.index = ed.index.astype(int)
+
+    remocoes = sorted(set(original.index) - set(ed.index))
+    comuns = original.index.intersection(ed.index)
+    a, b = original.loc[comuns], ed.loc[comuns, original.columns]
+    mudou = (a != b).any(axis=1)
+    edicoes = {int(l): b.loc[l].tolist() for l in comuns[mudou.to_numpy()]}
+    return edicoes, remocoes, inser
+
+
+def _linhas_divergentes(ss: storage.Armazenamento, title: str, esperado: pd.DataFrame,
+                        cab: Optional[List[str]] = None) -> List[int]:
+    """Linhas (índice de `esperado`, em texto) cujo conteúdo atual na planilha difere."""
+    tocadas = [int(l) for l in esperado.index]
+    headers = _HEADERS[title]
+    cab = cab or headers
+    blocos = ss.ler_linhas(title, [(l, l) for l in tocadas], len(cab))
+    atual = _tipar(_linhas_to_df(cab, [list(b[0]) if b else [] for b in blocos], headers, inicio=0),
+                   _ESQUEMAS.get(title))
+    atual.index = [tocadas[i] for i in atual.index]
+    if title == "Lancamentos":  # mesma regra de sinal do Ledger, que gerou `esperado`
+        atual["Valor"] = _ajusta_sinal(atual)
+    atual = _para_planilha(atual, title).reindex(tocadas).fillna("")
+    difere = (atual != esperado.reindex(tocadas).fillna("")).any(axis=1)
+    return [int(l) for l in difere[difere].index]
+
+
+def salvar_edicoes(st, ss: storage.Armazenamento, title: str,
+                   original: pd.DataFrame, editado: pd.DataFrame) -> int:
+    """Grava na aba só a diferença entre `original` (como carregado) e `editado`.
+
+    Antes de escrever, relê apenas as linhas que serão alteradas/removidas e
+    recusa (ConflitoEdicao) se alguma não bate mais com o original. Devolve o
+    número de operações gravadas.
+    """
+    orig = _para_planilha(original, title)
+    edicoes, remocoes, inser = diff_linhas(orig, _para_planilha(editado, title))
+    tocadas = sorted(set(edicoes) | set(remocoes))
+
+    if tocadas:
+        ent = _cache_sessao(st).get((ss.id, title)) or {}
+        try:
+            divergentes = _linhas_divergentes(ss, title,
+                                              orig.reindex(tocadas).fillna(""), ent.get("cab"))
+        except Exception:
+            if _fila(st) is None:
+                raise
+            divergentes = []  # sem rede: o sincronizador confere antes de enviar
+        if divergentes:
+            raise ConflitoEdicao(divergentes)
+
+    with BufferEscrita(st, ss) as buf:
+        for linha, valores in edicoes.items():
+            buf.atualizar_linha(title, linha, valores, antes=orig.loc[linha].tolist())
+        buf.apagar_linhas(title, remocoes, antes={l: orig.loc[l].tolist() for l in remocoes})
+        buf.anexar_linhas(title, inser)
+    return len(edicoes) + len(remocoes) + len(inser)
+
+
+# ------------------------- Diário ------------------------- #
+def historico(st, ss: storage.Armazenamento, title: str = "Lancamentos") -> pd.DataFrame:
+    """Operações gravadas em `title`, em ordem (vazio se o diário estiver desligado)."""
+    pasta = _pasta_journal(st)
+    if pasta is None:
+        return pd.DataFrame()
+    return journal.ler(pasta, ss.id, title)
+
+
+def reconstruir_em(st, ss: storage.Armazenamento, title: str, df_atual: pd.DataFrame,
+                   instante: pd.Timestamp) -> pd.DataFrame:
+    """Conteúdo da aba `title` (em texto) como estava em `instante`."""
+    return journal.reconstruir(_para_planilha(df_atual, title), historico(st, ss, title), instante)
+
+
+load_main_df.clear = _limpador("Lancamentos")
+load_pm_df.clear = _limpador("PagamentosMensais")
+load_plan_df.clear = _limpador("Planejamento")
+load_parc_df.clear = _limpador("Parcelamentos")
+load_metas_df.clear = _limpador("Metas")
@@ -0,0 +1,55 @@
+# snapshot.py — cópia local (Parquet) dos DataFrames já tipados de cada aba
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+_META = b"controlefamiliar"
+_lock = threading.Lock()
+
+
+def caminho(pasta: Path, ss_id: str, title: str) -> Path:
+    nome = re.sub(r"[^\w.-]", "_", f"{ss_id}__{title}")
+    return Path(pasta) / f"{nome}.parquet"
+
+
+def ler(pasta: Path, ss_id: str, title: str) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    """Devolve (df, meta) do último snapshot, ou None se não houver/estiver corrompido."""
+    arq = caminho(pasta, ss_id, title)
+    if not arq.exists():
+        return None
+    try:
+        tbl = pq.read_table(arq)
+        meta = json.loads((tbl.schema.metadata or {}).get(_META, b"{}"))
+        return tbl.to_pandas(), meta
+    except Exception:
+        return None
+
+
+def gravar(pasta: Path, ss_id: str, title: str, df: pd.DataFrame, meta: Dict[str, Any]) -> None:
+    arq = caminho(pasta, ss_id, title)
+    arq.parent.mkdir(parents=True, exist_ok=True)
+    tbl = pa.Table.from_pandas(df, preserve_index=True)
+    tbl = tbl.replace_schema_metadata({**(tbl.schema.metadata or {}),
+                                       _META: json.dumps(meta).encode("utf-8")})
+    tmp = arq.with_suffix(".tmp")
+    with _lock:
+        pq.write_table(tbl, tmp, compression="zstd")
+        os.replace(tmp, arq)
+
+
+def gravar_em_segundo_plano(pasta: Path, ss_id: str, title: str,
+                            df: pd.DataFrame, meta: Dict[str, Any]) -> None:
+    def _run():
+        try:
+            gravar(pasta, ss_id, title, df, meta)
+        except Exception:
+            pass  # snapshot é só acelerador; a planilha continua sendo a fonte
+    threading.Thread(target=_run, daemon=True).start()
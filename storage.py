@@ -0,0 +1,258 @@
+# storage.py — onde as abas ficam: Google Sheets ou um arquivo SQLite local
+#
+# sheets.py fala só com esta interface (ler/anexar/atualizar/apagar/substituir
+# linhas em texto, numeradas como na planilha: 1 = cabeçalho). O cache,
+# snapshots, diário e fila local funcionam igual sobre qualquer implementação.
+from __future__ import annotations
+import json
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+Linhas = List[List[Any]]
+
+
+class Armazenamento(ABC):
+    """Planilha com abas de linhas em texto. `id` identifica o arquivo."""
+
+    id: str
+
+    @abstractmethod
+    def revisao(self) -> Optional[str]:
+        """Marca que muda a cada alteração do arquivo (None se não souber)."""
+
+    @abstractmethod
+    def existe(self, title: str) -> bool:
+        """Se a aba já existe (sem criá-la)."""
+
+    @abstractmethod
+    def garantir(self, title: str, headers: List[str]) -> None:
+        """Cria a aba com o cabeçalho se ela não existir."""
+
+    @abstractmethod
+    def ler(self, titles: List[str]) -> Dict[str, Linhas]:
+        """Conteúdo inteiro de cada aba (cabeçalho incluso), numa leitura só."""
+
+    @abstractmethod
+    def ler_linhas(self, title: str, faixas: List[Tuple[int, Optional[int]]],
+                   largura: int) -> List[Linhas]:
+        """Linhas ini..fim (inclusive; fim None = até o fim) de cada faixa."""
+
+    @abstractmethod
+    def anexar(self, title: str, linhas: Linhas) -> Optional[int]:
+        """Acrescenta no fim; devolve o número da primeira linha gravada, se souber."""
+
+    @abstractmethod
+    def atualizar(self, edicoes: Dict[str, Dict[int, List[Any]]]) -> None:
+        """Sobrescreve linhas inteiras: {aba: {linha: valores}}, tudo ou nada."""
+
+    @abstractmethod
+    def apagar(self, title: str, linhas: List[int]) -> None:
+        """Remove as linhas (as de baixo sobem), numa operação só."""
+
+    @abstractmethod
+    def substituir(self, title: str, inicio: int, linhas: Linhas) -> None:
+        """Grava `linhas` a partir da linha `inicio`, por cima do que houver."""
+
+
+# ------------------------- Google Sheets ------------------------- #
+class ArmazenamentoSheets(Armazenamento):
+    """gspread sobre uma Spreadsheet já aberta (ver sheets.get_sheet)."""
+
+    def __init__(self, planilha):
+        self.planilha = planilha
+        self.id = planilha.id
+        self._abas: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _aba(self, title: str):
+        with self._lock:
+            if self._abas is None or title not in self._abas:
+                # todas as abas numa chamada de metadados (planilha.worksheet faz uma por aba)
+                self._abas = {ws.title: ws for ws in self.planilha.worksheets()}
+            return self._abas.get(title)
+
+    def revisao(self) -> Optional[str]:
+        """Versão do arquivo no Drive: só metadados, bem mais barato que reler a aba."""
+        from gspread.urls import DRIVE_FILES_API_V3_URL
+        try:
+            r = self.planilha.client.http_client.request(
+                "get", f"{DRIVE_FILES_API_V3_URL}/{self.id}",
+                params={"fields": "version,modifiedTime", "supportsAllDrives": True},
+            )
+            meta = r.json()
+            return str(meta.get("version") or meta.get("modifiedTime") or "") or None
+        except Exception:
+            return None
+
+    def existe(self, title: str) -> bool:
+        return self._aba(title) is not None
+
+    def garantir(self, title: str, headers: List[str]) -> None:
+        if self._aba(title) is not None:
+            return
+        ws = self.planilha.add_worksheet(title=title, rows=1000, cols=max(10, len(headers)))
+        ws.append_row(headers, value_input_option="RAW")
+        with self._lock:
+            self._abas[title] = ws
+
+    def _faixa(self, title: str, a1: Optional[str] = None) -> str:
+        from gspread.utils import absolute_range_name
+        return absolute_range_name(title, a1)
+
+    def ler(self, titles: List[str]) -> Dict[str, Linhas]:
+        resp = self.planilha.values_batch_get([self._faixa(t) for t in titles])
+        faixas = resp.get("valueRanges", [])
+        return {t: [list(l) for l in (faixas[i].get("values", []) if i < len(faixas) else [])]
+                for i, t in enumerate(titles)}
+
+    def ler_linhas(self, title: str, faixas: List[Tuple[int, Optional[int]]],
+                   largura: int) -> List[Linhas]:
+        from gspread.utils import rowcol_to_a1
+        col = re.sub(r"\d", "", rowcol_to_a1(1, max(1, largura)))
+        resp = self.planilha.values_batch_get(
+            [self._faixa(title, f"A{i}:{col}{'' if j is None else j}") for i, j in faixas])
+        return [[list(l) for l in vr.get("values", [])] for vr in resp.get("valueRanges", [])]
+
+    def anexar(self, title: str, linhas: Linhas) -> Optional[int]:
+        resp = self._aba(title).append_rows(linhas, value_input_option="USER_ENTERED",
+                                            table_range="A1")
+        try:
+            m = re.search(r"![A-Z]+(\d+)", resp["updates"]["updatedRange"])
+        except Exception:
+            return None
+        return int(m.group(1)) if m else None
+
+    def atualizar(self, edicoes: Dict[str, Dict[int, List[Any]]]) -> None:
+        dados = [{"range": self._faixa(title, f"A{linha}"), "values": [valores]}
+                 for title, linhas in edicoes.items()
+                 for linha, valores in sorted(linhas.items())]
+        if dados:
+            self.planilha.values_batch_update(body={"valueInputOption": "USER_ENTERED", "data": dados})
+
+    def apagar(self, title: str, linhas: List[int]) -> None:
+        sheet_id = self._aba(title).id
+        reqs = [{"deleteDimension": {"range": {"sheetId": sheet_id, "dimension": "ROWS",
+                                               "startIndex": l - 1, "endIndex": l}}}
+                for l in sorted(set(linhas), reverse=True)]
+        if reqs:
+            self.planilha.batch_update({"requests": reqs})
+
+    def substituir(self, title: str, inicio: int, linhas: Linhas) -> None:
+        self.planilha.values_update(self._faixa(title, f"A{inicio}"),
+                                    params={"valueInputOption": "USER_ENTERED"},
+                                    body={"values": linhas})
+
+
+# ------------------------- Local (SQLite) ------------------------- #
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS linhas (
+    aba TEXT NOT NULL, pos INTEGER NOT NULL, valores TEXT NOT NULL,
+    PRIMARY KEY (aba, pos)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revisao (id INTEGER PRIMARY KEY CHECK (id = 1), n INTEGER NOT NULL);
+INSERT OR IGNORE INTO revisao (id, n) VALUES (1, 0);
+"""
+
+
+class ArmazenamentoLocal(Armazenamento):
+    """Abas num arquivo SQLite: roda o app, benchmarks e testes sem rede.
+
+    Os valores ficam como texto, do jeito que foram gravados (o Google Sheets
+    interpretaria USER_ENTERED; aqui o parse fica todo com sheets._tipar).
+    """
+
+    def __init__(self, arq: Path):
+        arq = Path(arq)
+        arq.parent.mkdir(parents=True, exist_ok=True)
+        self.arq = arq
+        self.id = "local-" + re.sub(r"[^\w.-]", "_", arq.stem)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(str(arq), check_same_thread=False, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(_ESQUEMA)
+
+    def _escrever(self, *comandos: Tuple[str, Any]) -> None:
+        """Executa os comandos numa transação e avança a revisão."""
+        with self._lock:
+            self._con.execute("BEGIN")
+            try:
+                for sql, args in comandos:
+                    if isinstance(args, list):
+                        self._con.executemany(sql, args)
+                    else:
+                        self._con.execute(sql, args or ())
+                self._con.execute("UPDATE revisao SET n = n + 1 WHERE id = 1")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+            self._con.execute("COMMIT")
+
+    def _ultima(self, title: str) -> int:
+        r = self._con.execute("SELECT COALESCE(MAX(pos), 0) FROM linhas WHERE aba = ?", (title,))
+        return int(r.fetchone()[0])
+
+    def revisao(self) -> Optional[str]:
+        with self._lock:
+            return str(self._con.execute("SELECT n FROM revisao WHERE id = 1").fetchone()[0])
+
+    def existe(self, title: str) -> bool:
+        with self._lock:
+            return self._ultima(title) > 0
+
+    def garantir(self, title: str, headers: List[str]) -> None:
+        with self._lock:
+            existe = self._ultima(title) > 0
+        if not existe:
+            self._escrever(("INSERT INTO linhas (aba, pos, valores) VALUES (?, 1, ?)",
+                            (title, json.dumps(list(headers), ensure_ascii=False))))
+
+    def _faixa(self, title: str, ini: int, fim: Optional[int]) -> Linhas:
+        r = self._con.execute(
+            "SELECT pos, valores FROM linhas WHERE aba = ? AND pos >= ? AND pos <= ? ORDER BY pos",
+            (title, ini, fim if fim is not None else 2 ** 62))
+        out: Linhas = []
+        esperado = ini
+        for pos, valores in r:
+            out.extend([] for _ in range(pos - esperado))  # buraco = linha vazia
+            out.append(json.loads(valores))
+            esperado = pos + 1
+        return out
+
+    def ler(self, titles: List[str]) -> Dict[str, Linhas]:
+        with self._lock:
+            return {t: self._faixa(t, 1, None) for t in titles}
+
+    def ler_linhas(self, title: str, faixas: List[Tuple[int, Optional[int]]],
+                   largura: int) -> List[Linhas]:
+        with self._lock:
+            return [[l[:largura] for l in self._faixa(title, i, j)] for i, j in faixas]
+
+    def anexar(self, title: str, linhas: Linhas) -> Optional[int]:
+        with self._lock:
+            ini = self._ultima(title) + 1
+        self._escrever(("INSERT INTO linhas (aba, pos, valores) VALUES (?, ?, ?)",
+                        [(title, ini + i, json.dumps([str(c) for c in l], ensure_ascii=False))
+                         for i, l in enumerate(linhas)]))
+        return ini
+
+    def atualizar(self, edicoes: Dict[str, Dict[int, List[Any]]]) -> None:
+        self._escrever(("INSERT OR REPLACE INTO linhas (aba, pos, valores) VALUES (?, ?, ?)",
+                        [(t, int(l), json.dumps([str(c) for c in v], ensure_ascii=False))
+                         for t, ls in edicoes.items() for l, v in ls.items()]))
+
+    def apagar(self, title: str, linhas: List[int]) -> None:
+        cmds = []
+        for l in sorted(set(linhas), reverse=True):
+            cmds += [("DELETE FROM linhas WHERE aba = ? AND pos = ?", (title, l)),
+                     # em dois passos para não colidir com a chave (aba, pos)
+                     ("UPDATE linhas SET pos = -(pos - 1) WHERE aba = ? AND pos > ?", (title, l)),
+                     ("UPDATE linhas SET pos = -pos WHERE aba = ? AND pos < 0", (title,))]
+        if cmds:
+            self._escrever(*cmds)
+
+    def substituir(self, title: str, inicio: int, linhas: Linhas) -> None:
+        self.atualizar({title: {inicio + i: l for i, l in enumerate(linhas)}})
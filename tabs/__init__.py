@@ -1 +1,73 @@
-from . import visao, receitas, detalhamento, fatura, parcelas, pagamentos, planejamento
+# tabs — registro das abas e despacho preguiçoso
+#
+# Cada módulo declara TITULO, DEPENDE (chaves do Contexto que usa) e
+# abrir(st, ctx). Só a aba selecionada roda, e só as dependências dela são
+# carregadas: Pagamentos e Planejamento deixam de ler a planilha quando a aba
+# aberta é outra.
+from typing import Any, Callable, Dict
+
+import perfil
+
+from . import (visao, receitas, detalhamento, fatura, parcelas, pagamentos, planejamento,
+               tendencias)
+
+ABAS = [visao, receitas, detalhamento, fatura, parcelas, pagamentos, planejamento, tendencias]
+_MAX_MEMO = 32
+
+
+class Contexto(dict):
+    """Dados que as abas consomem. Valores prontos entram como chaves comuns;
+    os caros entram em `fontes` (chave -> função) e só rodam na primeira leitura.
+
+    `versao` identifica os dados carregados (df.attrs["versao"]); `memo` guarda
+    resultados derivados por versão na sessão, então a aba não refaz o cálculo
+    a cada rerun enquanto a planilha não mudar.
+    """
+
+    def __init__(self, st, versao, fontes: Dict[str, Callable[[], Any]], **valores):
+        super().__init__(**valores)
+        self._fontes = fontes
+        self._st = st
+        self.versao = versao
+
+    def __missing__(self, chave):
+        if chave not in self._fontes:
+            raise KeyError(chave)
+        with perfil.medir(self._st, f"fonte {chave}"):
+            valor = self[chave] = self._fontes[chave]()
+        return valor
+
+    def carregar(self, chaves) -> None:
+        for c in chaves:
+            self[c]
+
+    def memo(self, chave, fn: Callable[[], Any]):
+        if self.versao is None:
+            return fn()
+        cache = self._st.session_state.setdefault("__abas_memo__", {})
+        k = (self.versao, chave)
+        if k not in cache:
+            for antiga in [c for c in cache if c[0] != self.versao]:
+                del cache[antiga]  # versão nova: resultados antigos não servem mais
+            while len(cache) >= _MAX_MEMO:
+                del cache[next(iter(cache))]
+            cache[k] = fn()
+        return cache[k]
+
+
+def aba_ativa(st, chave_estado: str = "aba_ativa"):
+    """Módulo da aba selecionada (a primeira, numa sessão nova)."""
+    titulos = [m.TITULO for m in ABAS]
+    sel = st.session_state.get(chave_estado)
+    return ABAS[titulos.index(sel)] if sel in titulos else ABAS[0]
+
+
+def renderizar(st, ctx: Contexto, chave_estado: str = "aba_ativa") -> None:
+    """Seletor de abas + render apenas da aba escolhida (mantida na sessão)."""
+    titulos = [m.TITULO for m in ABAS]
+    sel = st.radio("Aba", titulos, horizontal=True, key=chave_estado,
+                   label_visibility="collapsed")
+    aba = ABAS[titulos.index(sel)]
+    with perfil.medir(st, f"aba {aba.__name__.rsplit('.', 1)[-1]}"):
+        ctx.carregar(aba.DEPENDE)
+        aba.abrir(st, ctx)
@@ -1,6 +1,11 @@
 
 import pandas as pd
-from utils import fmt_currency, _norm_txt
+from utils import fmt_currency_series
+from ledger import ledger_de
+from search import indice_de
+
+TITULO = "🔍 Detalhamento"
+DEPENDE = ("df", "df_mes", "label_periodo", "spreadsheet")
 
 def render(st, df, df_mes, label_periodo, sheet):
     st.subheader("🔍 Detalhamento de lançamentos")
@@ -23,8 +28,7 @@ def render(st, df, df_mes, label_periodo, sheet):
     met_sel = colf4.multiselect("Método", ["(todos)"] + met_disp, default="(todos)", key="det_mets")
     busca_txt = colf5.text_input("Busca (Descrição/Categoria/Responsável)", "", key="det_busca")
 
-    det = df_mes.copy()
-    det = det[det["Tipo"].isin(tipos_sel)]
+    det = df_mes[df_mes["Tipo"].isin(tipos_sel)]
     if cats_sel and "(todas)" not in cats_sel:
         det = det[det["Categoria"].isin(cats_sel)]
     if resp_sel and "(todos)" not in resp_sel:
@@ -32,46 +36,71 @@ def render(st, df, df_mes, label_periodo, sheet):
     if met_sel and "(todos)" not in met_sel:
         det = det[det["Método de Pagamento/Recebimento"].isin(met_sel)]
     if busca_txt.strip():
-        pat = _norm_txt(busca_txt)
-        det = det[
-            _norm_txt(det["Descrição"]).str.contains(pat, na=False) |
-            _norm_txt(det["Categoria"]).str.contains(pat, na=False) |
-            _norm_txt(det["Responsável"]).str.contains(pat, na=False)
-        ]
+        det = det[det.index.isin(indice_de(st, ledger_de(st, df)).buscar(busca_txt))]
 
-    filtros_ativos = (det.shape[0] != df_mes.shape[0])
+    # parcelas de parcelamentos (índice negativo) não são linhas da planilha:
+    # aparecem à parte, só para leitura
+    virt = det[det.index < 0]
+    det = det[det.index > 0]
 
+    # cada linha do editor guarda o número da linha na planilha (coluna oculta);
+    # linhas novas chegam com __linha vazio
+    base = det
+    det = det.astype({c: "string" for c in det.columns if isinstance(det[c].dtype, pd.CategoricalDtype)})
     det["Data"] = det["Data"].dt.strftime("%d/%m/%Y")
+    det["Valor"] = fmt_currency_series(det["Valor"])
+    det.insert(0, "__linha", det.index)
     det.index = range(1, len(det)+1)
-    det["Valor"] = det["Valor"].apply(fmt_currency)
 
-    edit = st.data_editor(det, num_rows="dynamic", use_container_width=True, key="det_editor")
+    edit = st.data_editor(det, num_rows="dynamic", use_container_width=True, key="det_editor",
+                          column_config={"__linha": None})
+
+    if not virt.empty:
+        st.caption("Parcelas de compras parceladas (geradas do plano na aba Parcelamentos):")
+        st.dataframe(virt.assign(Data=virt["Data"].dt.strftime("%d/%m/%Y"),
+                                 Valor=fmt_currency_series(virt["Valor"])),
+                     use_container_width=True, hide_index=True)
 
-    btn_save_full = st.button(
-        "💾 Salvar alterações (mês inteiro)",
-        disabled=filtros_ativos,
-        help="Desative os filtros para salvar o mês inteiro com segurança."
+    btn_save = st.button(
+        "💾 Salvar alterações",
+        help="Grava só as linhas alteradas, incluídas ou removidas na tabela acima."
     )
 
-    if btn_save_full:
-        df_edit = edit.copy()
-        df_edit["Valor"] = (df_edit["Valor"].str.replace(r"[^\d,\-]","",regex=True)
-                            .str.replace(",",".").astype(float))
+    if btn_save:
+        from sheets import salvar_edicoes, ConflitoEdicao, FalhaEscrita
+        from utils import _money_to_float
+        df_edit = edit.set_index("__linha")
+        df_edit["Valor"] = df_edit["Valor"].map(_money_to_float)
         df_edit["Data"]  = pd.to_datetime(df_edit["Data"], dayfirst=True, format="%d/%m/%Y")
 
-        # Backup simples automático em nova aba
         try:
-            bk = sheet.worksheet("_backup_auto")
-        except Exception:
-            bk = sheet.add_worksheet("_backup_auto", rows=2, cols=10)
-            bk.append_row(df.columns.tolist())
-        bk.append_rows(df.astype(str).values.tolist(), value_input_option="USER_ENTERED")
-
-        df_hist = df[df["Data"].dt.strftime("%m/%Y") != label_periodo]
-        df_save = pd.concat([df_hist, df_edit.reset_index(drop=True)], ignore_index=True)
-        df_save["Data"] = df_save["Data"].dt.strftime("%d/%m/%Y")
-
-        sheet.sheet1.clear()
-        sheet.sheet1.append_row(df_save.columns.tolist(), value_input_option="USER_ENTERED")
-        sheet.sheet1.append_rows(df_save.astype(str).values.tolist(), value_input_option="USER_ENTERED")
-        st.success("Alterações salvas! As tabelas serão recarregadas pelo botão na sidebar.")
+            n_ops = salvar_edicoes(st, sheet, "Lancamentos", base, df_edit)
+        except (ConflitoEdicao, FalhaEscrita) as e:
+            st.error(str(e))
+        else:
+            if n_ops:
+                st.success(f"Alterações salvas! ({n_ops} linha(s))")
+                st.rerun()
+            else:
+                st.info("Nenhuma alteração para salvar.")
+
+    with st.expander("🕘 Histórico de alterações"):
+        from sheets import historico, load_main_df, reconstruir_em
+        hist = historico(st, sheet, "Lancamentos")
+        if hist.empty:
+            st.caption("Nenhuma alteração registrada no diário local.")
+            return
+        st.dataframe(hist.tail(200).iloc[::-1], hide_index=True, use_container_width=True)
+
+        ch1, ch2 = st.columns(2)
+        dia = ch1.date_input("Reconstruir em", format="DD/MM/YYYY", key="det_hist_dia")
+        hora = ch2.time_input("Hora", key="det_hist_hora")
+        instante = pd.Timestamp.combine(dia, hora).tz_localize("America/Sao_Paulo")
+        if st.button("Reconstruir planilha nesse instante", key="det_hist_btn"):
+            # parte da aba como carregada (Valor com o sinal gravado), não da visão do livro
+            antigo = reconstruir_em(st, sheet, "Lancamentos", load_main_df(st, sheet), instante)
+            st.download_button("⬇️ Baixar CSV", antigo.to_csv(index=False).encode("utf-8"),
+                               file_name=f"lancamentos_{instante:%Y%m%d_%H%M}.csv", mime="text/csv")
+
+def abrir(st, ctx):
+    render(st, ctx["df"], ctx["df_mes"], ctx["label_periodo"], ctx["spreadsheet"])
@@ -1,20 +1,48 @@
-
 import pandas as pd
-from utils import fmt_currency, _norm_txt
+from utils import fmt_currency, fmt_currency_series
+from ledger import ledger_de
+from search import indice_de
+from billing import faturas_de
+
+TITULO = "💳 Resumo de Fatura"
+DEPENDE = ("df", "label_periodo")
+
+_CICLO, _INTERVALO = "Fatura (ciclo)", "Intervalo de datas"
 
-def render(st, df, label_periodo):
+def _rotulo(ciclos, p):
+    return f"{p.strftime('%m/%Y')} — {fmt_currency(ciclos.at[p, 'total'])}"
+
+def render(st, df, label_periodo, faturas=None):
     st.subheader("💳 Resumo de Fatura de Cartão de Crédito")
     c1,c2,c3 = st.columns(3)
 
-    met_norm_all = _norm_txt(df["Método de Pagamento/Recebimento"])
-    mask_cc_all = met_norm_all.str.contains(r"\bcartao\s*de\s*credito\b", regex=True, na=False)
-    cc_methods = sorted(df.loc[mask_cc_all, "Método de Pagamento/Recebimento"].dropna().unique().tolist())
-    cartao = c1.selectbox("Cartão (método)", ["Todos"] + cc_methods, 0, key="fat_cartao")
-
-    data_ini = c2.date_input("Data inicial", format="DD/MM/YYYY",
-                             value=pd.to_datetime(label_periodo, format="%m/%Y"), key="fat_data_ini")
-    data_fim = c3.date_input("Data final", format="DD/MM/YYYY",
-                             value=pd.to_datetime(label_periodo, format="%m/%Y") + pd.offsets.MonthEnd(0), key="fat_data_fim")
+    livro = ledger_de(st, df)
+    fat = faturas if faturas is not None else faturas_de(st, livro)
+    cartao = c1.selectbox("Cartão (método)", ["Todos"] + fat.cartoes, 0, key="fat_cartao")
+    sel_cartao = None if cartao == "Todos" else cartao
+    modo = c2.radio("Período", [_CICLO, _INTERVALO], horizontal=True, key="fat_modo")
+
+    ciclos = fat.ciclos(sel_cartao)
+    if modo == _CICLO:
+        if ciclos.empty:
+            st.info("Nenhum lançamento no cartão.")
+            return
+        opcoes = list(ciclos.index[::-1])
+        atual = pd.Period(pd.to_datetime(label_periodo, format="%m/%Y"), freq="M")
+        ciclo = c3.selectbox("Fatura de", opcoes, index=opcoes.index(atual) if atual in opcoes else 0,
+                             format_func=lambda p: _rotulo(ciclos, p), key="fat_ciclo")
+        pos_desp, pos_cred = fat.fatura(sel_cartao, ciclo)
+        if sel_cartao is not None:
+            info = ciclos.loc[ciclo]
+            st.caption(f"De {info['abertura']:%d/%m/%Y} a {info['fechamento']:%d/%m/%Y} · "
+                       f"vencimento {info['vencimento']:%d/%m/%Y}")
+    else:
+        ci, cf = c3.columns(2)
+        data_ini = ci.date_input("Data inicial", format="DD/MM/YYYY",
+                                 value=pd.to_datetime(label_periodo, format="%m/%Y"), key="fat_data_ini")
+        data_fim = cf.date_input("Data final", format="DD/MM/YYYY",
+                                 value=pd.to_datetime(label_periodo, format="%m/%Y") + pd.offsets.MonthEnd(0), key="fat_data_fim")
+        pos_desp, pos_cred = fat.intervalo(sel_cartao, data_ini, data_fim)
 
     c4, c5, c6 = st.columns(3)
     resp_f_disp = sorted(df["Responsável"].dropna().unique().tolist())
@@ -27,24 +55,10 @@ def render(st, df, label_periodo):
 
     busca_f = st.text_input("Busca (Descrição/Categoria/Responsável)", "", key="fat_busca")
 
-    met_norm = _norm_txt(df["Método de Pagamento/Recebimento"])
-    is_cc = met_norm.str.contains(r"\bcartao\s*de\s*credito\b", regex=True, na=False)
-    if cartao != "Todos":
-        is_cc = is_cc & (df["Método de Pagamento/Recebimento"] == cartao)
-
-    base_intervalo = df[
-        is_cc & df["Data"].between(pd.to_datetime(data_ini), pd.to_datetime(data_fim))
-    ].copy()
+    despesas = df.iloc[pos_desp]
+    creditos = df.iloc[pos_cred] if inclui_creditos else df.iloc[0:0]
 
-    despesas = base_intervalo[base_intervalo["Tipo"] == "Despesa"].copy()
-
-    if inclui_creditos:
-        creditos = base_intervalo[
-            (base_intervalo["Tipo"] == "Receita") &
-            (_norm_txt(base_intervalo["Categoria"]).isin(["estorno","estornos"]))
-        ].copy()
-    else:
-        creditos = base_intervalo.iloc[0:0].copy()
+    achados = indice_de(st, livro).buscar(busca_f) if busca_f.strip() else None
 
     def _aplica_filtros(dfa):
         if resp_f_sel and "(todos)" not in resp_f_sel:
@@ -52,12 +66,7 @@ def render(st, df, label_periodo):
         if cat_f_sel and "(todas)" not in cat_f_sel:
             dfa = dfa[dfa["Categoria"].isin(cat_f_sel)]
         if busca_f.strip():
-            pat = _norm_txt(busca_f)
-            dfa = dfa[
-                _norm_txt(dfa["Descrição"]).str.contains(pat, na=False) |
-                _norm_txt(dfa["Categoria"]).str.contains(pat, na=False) |
-                _norm_txt(dfa["Responsável"]).str.contains(pat, na=False)
-            ]
+            dfa = dfa[dfa.index.isin(achados)]
         return dfa
 
     despesas = _aplica_filtros(despesas)
@@ -75,8 +84,8 @@ def render(st, df, label_periodo):
     if inclui_creditos and total_creditos:
         st.caption(f"Créditos (estornos) abatidos: {fmt_currency(total_creditos)}")
 
-    res = despesas.groupby("Categoria")["Valor"].sum().abs().sort_values(ascending=False).reset_index()
-    res["Valor"] = res["Valor"].apply(fmt_currency)
+    res = despesas.groupby("Categoria", observed=True)["Valor"].sum().abs().sort_values(ascending=False).reset_index()
+    res["Valor"] = fmt_currency_series(res["Valor"])
     st.markdown("**Gastos por categoria:**")
     st.dataframe(res, hide_index=True, use_container_width=True)
 
@@ -85,10 +94,13 @@ def render(st, df, label_periodo):
         lista_frames.append(creditos.assign(__tipo_linha="Crédito"))
     detalhada = pd.concat(lista_frames, ignore_index=True) if len(lista_frames)>1 else despesas.assign(__tipo_linha="Despesa")
 
-    detalhada = detalhada[["Data","Responsável","Descrição","Categoria","Valor","__tipo_linha"]].copy()
+    detalhada = detalhada[["Data","Responsável","Descrição","Categoria","Valor","__tipo_linha"]]
     detalhada["Data"] = detalhada["Data"].dt.strftime("%d/%m/%Y")
-    detalhada["Valor"] = detalhada["Valor"].apply(fmt_currency)
+    detalhada["Valor"] = fmt_currency_series(detalhada["Valor"])
     detalhada = detalhada.rename(columns={"__tipo_linha":"Tipo do Lançamento"})
 
     st.markdown("**Lançamentos:**")
     st.dataframe(detalhada, hide_index=True, use_container_width=True)
+
+def abrir(st, ctx):
+    render(st, ctx["df"], ctx["label_periodo"])
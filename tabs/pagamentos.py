@@ -1,12 +1,28 @@
-
 from datetime import datetime
-from utils import money_input, modal_or_expander
+import pandas as pd
+from utils import fmt_currency, fmt_currency_series, money_input, modal_or_expander
 from constants import METS, ICON_MAP, DEFAULT_ICON
+from recurring import lancamentos, recorrentes_de
+
+TITULO = "💸 Pagamentos Mensais"
+DEPENDE = ("df", "spreadsheet", "dfpm", "sel_ano", "sel_mes")
+
+_MESES_PROJECAO = 6
+
+def _pagar(st, spreadsheet, contas, valores, metodos):
+    from sheets import BufferEscrita, FalhaEscrita
+    try:
+        with BufferEscrita(st, spreadsheet) as buf:  # um lote só, qualquer que seja o número de contas
+            buf.anexar_linhas("Lancamentos", lancamentos(contas, valores, metodos, datetime.today()))
+    except FalhaEscrita as e:
+        st.error(str(e))
+        return False
+    return True
 
-def render(st, df_mes, spreadsheet, dfpm):
+def render(st, df, spreadsheet, dfpm, sel_ano, sel_mes):
     st.header("💸 Pagamentos Mensais")
 
-    from sheets import ws_pm, load_pm_df
+    from sheets import BufferEscrita, FalhaEscrita
     with st.expander("➕ Cadastrar conta recorrente", expanded=False):
         with st.form("pm_add", clear_on_submit=True):
             desc_pm = st.text_input("Descrição")
@@ -20,70 +36,50 @@ def render(st, df_mes, spreadsheet, dfpm):
                 if resp_pm == "Selecione…":
                     st.warning("Escolha o responsável.")
                 else:
-                    ws_pm(spreadsheet).append_row([desc_pm,"",dia_pm,cat_pm,resp_pm], value_input_option="USER_ENTERED")
-                    st.success("Conta adicionada!"); load_pm_df.clear(); st.rerun()
+                    try:
+                        with BufferEscrita(st, spreadsheet) as buf:
+                            buf.anexar("PagamentosMensais", [desc_pm,"",dia_pm,cat_pm,resp_pm])
+                    except FalhaEscrita as e:
+                        st.error(str(e))
+                    else:
+                        st.success("Conta adicionada!"); st.rerun()
 
-    if dfpm.empty:
+    rec = recorrentes_de(st, dfpm, df)
+    if not len(rec):
         st.info("Nenhuma conta recorrente cadastrada.")
         return
 
-    sel_ano = st.session_state.get("sel_ano")
-    sel_mes = st.session_state.get("sel_mes")
-
-    dfpm_mes = dfpm.copy()
-    dfpm_mes["Vencimento"] = [datetime(sel_ano, sel_mes, min(int(d), 28)) for d in dfpm_mes["Dia"]]
-    dfpm_mes["chave"] = (dfpm_mes["Descrição"].str.strip()+"|"+
-                         dfpm_mes["Categoria"].str.strip()+"|"+
-                         dfpm_mes["Responsável"].str.strip())
-
-    ch_lanc = (df_mes[df_mes["Tipo"]=="Despesa"]
-               .assign(chave=lambda d:
-                       d["Descrição"].str.strip()+"|"+
-                       d["Categoria"].str.strip()+"|"+
-                       d["Responsável"].str.strip())
-               ["chave"].unique())
-    dfpm_mes = dfpm_mes[~dfpm_mes["chave"].isin(ch_lanc)].copy()
+    sit = rec.situacao(sel_ano, sel_mes)
+    abertas = sit[~sit["Paga"]]
 
-    if st.session_state.get("pm_modal") and st.session_state.get("pm_idx") not in dfpm_mes.index:
+    if st.session_state.get("pm_modal") and st.session_state.get("pm_idx") not in abertas.index:
         st.session_state.pop("pm_modal", None); st.session_state.pop("pm_idx", None)
 
-    if dfpm_mes.empty:
+    if abertas.empty:
         st.success("Todas as contas do mês já foram pagas 🎉")
-        return
-
-    st.markdown("#### Contas a pagar")
-    cols = st.columns(3)
-    for idx, row in dfpm_mes.iterrows():
-        with cols[idx % 3]:
-            icon = ICON_MAP.get(row["Descrição"], ICON_MAP.get(row["Categoria"], DEFAULT_ICON))
-            lbl = (f"{icon} **{row['Descrição']}**  \\n"
-                   f"*venc.* {row['Vencimento'].strftime('%d/%m')}")
-            if st.button(lbl, key=f"card_{idx}", help="Clique para pagar", use_container_width=True):
-                st.session_state["pm_idx"] = idx; st.session_state["pm_modal"] = True; st.rerun()
+    else:
+        st.markdown("#### Contas a pagar")
+        cols = st.columns(3)
+        for n, (idx, row) in enumerate(abertas.iterrows()):
+            with cols[n % 3]:
+                icon = ICON_MAP.get(row["Descrição"], ICON_MAP.get(row["Categoria"], DEFAULT_ICON))
+                lbl = (f"{icon} **{row['Descrição']}**  \\n"
+                       f"*venc.* {row['Vencimento'].strftime('%d/%m')}")
+                if st.button(lbl, key=f"card_{idx}", help="Clique para pagar", use_container_width=True):
+                    st.session_state["pm_idx"] = idx; st.session_state["pm_modal"] = True; st.rerun()
 
     if st.session_state.get("pm_modal"):
-        conta = dfpm_mes.loc[st.session_state["pm_idx"]]
-        with modal_or_expander(f"Pagar {conta['Descrição']}"):
-            v_pago = money_input("Valor pago (R$)", 0.0, key="pm_valor_txt")
+        conta = abertas.loc[[st.session_state["pm_idx"]]]
+        ref = conta["Referência"].iloc[0]
+        with modal_or_expander(f"Pagar {conta['Descrição'].iloc[0]}"):
+            v_pago = money_input("Valor pago (R$)", 0.0 if pd.isna(ref) else float(ref), key="pm_valor_txt")
             metodo = st.selectbox("Método", ["Selecione…"] + METS, key="pm_metodo")
             c_ok, c_cancel = st.columns(2)
             if c_ok.button("Confirmar"):
                 if v_pago > 0 and metodo != "Selecione…":
-                    existe = (
-                        (df_mes["Tipo"] == "Despesa")
-                        & (df_mes["Descrição"].str.strip() == conta["Descrição"].strip())
-                        & (df_mes["Categoria"].str.strip() == conta["Categoria"].strip())
-                        & (df_mes["Responsável"].str.strip() == conta["Responsável"].strip())
-                    ).any()
-                    if existe:
-                        st.warning("Esta conta já foi paga neste mês.")
-                        st.session_state.pop("pm_modal"); st.rerun()
-                    else:
-                        spreadsheet.sheet1.append_row([
-                            datetime.today().strftime("%d/%m/%Y"),
-                            conta["Responsável"], "Despesa", conta["Descrição"],
-                            conta["Categoria"], metodo, f"{-abs(v_pago):.2f}",
-                        ], value_input_option="USER_ENTERED")
+                    # a situação vem do índice da versão atual: conta paga em outra
+                    # sessão já some de `abertas` no rerun
+                    if _pagar(st, spreadsheet, conta, [v_pago], [metodo]):
                         st.success("Pagamento lançado!")
                         st.session_state.pop("pm_modal")
                         st.rerun()
@@ -91,3 +87,53 @@ def render(st, df_mes, spreadsheet, dfpm):
                     st.warning("Preencha valor e método.")
             if c_cancel.button("Cancelar"):
                 st.session_state.pop("pm_modal"); st.rerun()
+
+    if len(abertas) > 1:
+        with st.expander("✅ Pagar várias de uma vez"):
+            lote = pd.DataFrame({
+                "Pagar": False,
+                "Descrição": abertas["Descrição"],
+                "Vencimento": abertas["Vencimento"].dt.strftime("%d/%m"),
+                "Valor": abertas["Referência"].fillna(0.0).round(2),
+                "Método": pd.Series(pd.NA, index=abertas.index, dtype="string"),
+            })
+            edit = st.data_editor(
+                lote, hide_index=True, use_container_width=True, key="pm_lote",
+                disabled=["Descrição", "Vencimento"],
+                column_config={
+                    "Pagar": st.column_config.CheckboxColumn("Pagar"),
+                    "Valor": st.column_config.NumberColumn("Valor (R$)", min_value=0.0, format="%.2f"),
+                    "Método": st.column_config.SelectboxColumn("Método", options=METS),
+                })
+            marcadas = edit[edit["Pagar"]]
+            if st.button(f"💳 Pagar selecionadas ({len(marcadas)})", key="pm_lote_pagar",
+                         disabled=marcadas.empty):
+                falta = marcadas[(marcadas["Valor"].fillna(0) <= 0) | marcadas["Método"].isna()]
+                if not falta.empty:
+                    st.warning("Preencha valor e método de: " + ", ".join(falta["Descrição"].astype(str)))
+                elif _pagar(st, spreadsheet, abertas.loc[marcadas.index],
+                            marcadas["Valor"].tolist(), marcadas["Método"].tolist()):
+                    st.success(f"{len(marcadas)} pagamento(s) lançado(s)!"); st.rerun()
+
+    pagas = sit[sit["Paga"]]
+    if not pagas.empty:
+        with st.expander(f"🧾 Pagas em {sel_mes:02d}/{sel_ano} ({len(pagas)})"):
+            st.dataframe(pd.DataFrame({
+                "Descrição": pagas["Descrição"],
+                "Valor pago": fmt_currency_series(pagas["Valor pago"]),
+                "Casamento": pagas["Casamento"],
+            }), hide_index=True, use_container_width=True)
+            if (pagas["Casamento"] == "aproximado").any():
+                st.caption("\"aproximado\": lançamento com descrição parecida, ou valor e data perto "
+                           "do esperado, na mesma categoria e responsável.")
+
+    st.markdown("#### Próximos meses")
+    proj = rec.projecao(sel_ano, sel_mes, _MESES_PROJECAO)
+    tot = proj.sum(axis=0)
+    st.bar_chart(pd.Series(tot.to_numpy(), index=tot.index.strftime("%m/%Y")))
+    sem_ref = int(rec.referencia.size - pd.notna(rec.referencia).sum())
+    st.caption(f"Previsto em {_MESES_PROJECAO} meses: {fmt_currency(tot.sum())}"
+               + (f" · {sem_ref} conta(s) sem valor de referência ficam de fora" if sem_ref else ""))
+
+def abrir(st, ctx):
+    render(st, ctx["df"], ctx["spreadsheet"], ctx["dfpm"], ctx["sel_ano"], ctx["sel_mes"])
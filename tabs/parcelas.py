@@ -1,18 +1,93 @@
+import pandas as pd
+from utils import fmt_currency_series
 
-from utils import fmt_currency
+TITULO = "📅 Parcelas Futuras"
+DEPENDE = ("df", "parcelamentos", "spreadsheet")
 
-def render(st, df):
+_MESES_PROJECAO = 12
+
+def _futuras(df, hoje):
+    # lançamentos gravados na planilha a partir de amanhã (datas não têm hora);
+    # as parcelas virtuais (índice negativo) vêm do plano
+    fut = df[(df.index > 0) & (df["Data"] >= hoje + pd.Timedelta(days=1))]
+    if fut.empty:
+        return fut
+    fut = fut.assign(Data=fut["Data"].dt.strftime("%d/%m/%Y"), Valor=fmt_currency_series(fut["Valor"]))
+    return fut[["Data","Responsável","Descrição","Categoria",
+                "Método de Pagamento/Recebimento","Valor"]]
+
+def _planos(plano, hoje):
+    tbl = plano.futuras(hoje)
+    if not tbl.empty:
+        tbl = tbl.assign(**{"Próxima": pd.to_datetime(tbl["Próxima"]).dt.strftime("%d/%m/%Y"),
+                            "Valor restante": fmt_currency_series(tbl["Valor restante"])})
+    return tbl, plano.projecao(hoje, _MESES_PROJECAO)
+
+def _mostrar(st, plano, planos, projecao, fut):
     st.subheader("📅 Parcelas Futuras")
-    futuro = df[df["Data"] > st.session_state.get("__today__", None)]
-    if futuro is None or futuro.empty:
-        from pandas import to_datetime
-        futuro = df[df["Data"] > to_datetime("today")]
-    if futuro.empty:
+    if planos.empty and fut.empty:
         st.info("Nenhuma parcela futura registrada.")
-    else:
-        fut = futuro.copy()
-        fut["Data"] = fut["Data"].dt.strftime("%d/%m/%Y")
-        fut["Valor"] = fut["Valor"].apply(fmt_currency)
-        st.dataframe(fut[["Data","Responsável","Descrição","Categoria",
-                          "Método de Pagamento/Recebimento","Valor"]],
-                     use_container_width=True)
+        return
+    if not planos.empty:
+        st.dataframe(planos, use_container_width=True, hide_index=True)
+    proj = projecao[projecao != 0]
+    if not proj.empty:
+        st.markdown("**Parcelas por mês**")
+        st.bar_chart(pd.Series(proj.abs().to_numpy(), index=proj.index.strftime("%m/%Y")))
+        mes = st.selectbox("Parcelas do mês", list(proj.index), format_func=lambda p: p.strftime("%m/%Y"),
+                           key="parc_mes")
+        det = plano.expandir([mes]).sort_values("Data")
+        det = det.assign(Data=det["Data"].dt.strftime("%d/%m/%Y"), Valor=fmt_currency_series(det["Valor"]))
+        st.dataframe(det.drop(columns="Tipo"), use_container_width=True, hide_index=True)
+    if not fut.empty:
+        st.markdown("**Lançamentos com data futura na planilha**")
+        st.dataframe(fut, use_container_width=True)
+
+def _editar(st, sheet, plano):
+    # a aba Parcelamentos editada como o Detalhamento edita Lancamentos: só o diff é gravado
+    if plano.df.empty:
+        return
+    with st.expander("✏️ Editar ou apagar parcelamentos"):
+        base = plano.df
+        tab = base.astype({c: "string" for c in base.columns
+                           if c == "Descrição" or isinstance(base[c].dtype, pd.CategoricalDtype)})
+        tab.insert(0, "__linha", tab.index)
+        tab.index = range(1, len(tab)+1)
+        edit = st.data_editor(tab, num_rows="dynamic", use_container_width=True, key="parc_editor",
+                              column_config={
+                                  "__linha": None,
+                                  "Data": st.column_config.DateColumn("1ª parcela", format="DD/MM/YYYY"),
+                                  "Valor Parcela": st.column_config.NumberColumn(format="%.2f"),
+                                  "Parcelas": st.column_config.NumberColumn(min_value=1, max_value=99, step=1),
+                                  "Resto": st.column_config.NumberColumn(
+                                      format="%.2f", help="Diferença de arredondamento, somada à 1ª parcela"),
+                              })
+        st.caption("Apagar a linha apaga todas as parcelas da compra.")
+        if st.button("💾 Salvar parcelamentos", key="parc_salvar"):
+            from sheets import salvar_edicoes, ConflitoEdicao, FalhaEscrita
+            df_edit = edit.set_index("__linha")
+            df_edit["Data"] = pd.to_datetime(df_edit["Data"], errors="coerce")
+            df_edit["Parcelas"] = pd.to_numeric(df_edit["Parcelas"], errors="coerce").round().astype("Int64")
+            try:
+                n_ops = salvar_edicoes(st, sheet, "Parcelamentos", base, df_edit)
+            except (ConflitoEdicao, FalhaEscrita) as e:
+                st.error(str(e))
+            else:
+                if n_ops:
+                    st.success(f"Parcelamentos salvos! ({n_ops} linha(s))")
+                    st.rerun()
+                else:
+                    st.info("Nenhuma alteração para salvar.")
+
+def render(st, df, plano, sheet):
+    hoje = pd.Timestamp.today().normalize()
+    _mostrar(st, plano, *_planos(plano, hoje), _futuras(df, hoje))
+    _editar(st, sheet, plano)
+
+def abrir(st, ctx):
+    hoje = pd.Timestamp.today().normalize()
+    plano = ctx["parcelamentos"]
+    planos, projecao = ctx.memo(("parcelas_planos", hoje), lambda: _planos(plano, hoje))
+    fut = ctx.memo(("parcelas", hoje), lambda: _futuras(ctx["df"], hoje))
+    _mostrar(st, plano, planos, projecao, fut)
+    _editar(st, ctx["spreadsheet"], plano)
@@ -1,69 +1,98 @@
-
-from utils import fmt_currency
+import pandas as pd
+from utils import fmt_currency, fmt_currency_series
 from constants import DESP_CATS
-from sheets import get_sheet, ensure_worksheet, _ws_to_df
+from sheets import load_metas_df, load_plan_df, salvar_metas, FalhaEscrita
+from budget import RECEITAS_PLANO, comparativo_ano, metas_de
+from trends import cubo_de
+
+TITULO = "📋 Planejamento"
+DEPENDE = ("spreadsheet", "df", "dfmetas", "dfplan")
+
+_CHAVES_RECEITA = ["plan_sal_ric", "plan_sal_hel", "plan_ext", "plan_inv"]
+_MESES = ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
+          "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
 
-def render(st, spreadsheet, df_desp, sel_ano, sel_mes):
+def _mapa(comp):
+    import plotly.express as px
+    dif = comp.pivot(index="Categoria", columns="Mês", values="Diferença").reindex(columns=range(1, 13))
+    lim = float(dif.abs().max().max() or 1.0)
+    fig = px.imshow(dif, x=[m[:3] for m in _MESES], y=list(dif.index), zmin=-lim, zmax=lim,
+                    color_continuous_scale="RdYlGn", aspect="auto",
+                    labels=dict(color="Planejado − Realizado"))
+    fig.update_layout(margin=dict(l=0, r=0, t=20, b=0))
+    return fig
+
+def render(st, spreadsheet, df, df_metas=None, df_plan=None):
     st.header("📋 Planejamento Financeiro Mensal")
-    import pandas as pd
     hoje = pd.to_datetime("today")
     anos = list(range(hoje.year-2, hoje.year+2))
 
     ano = st.selectbox("Ano", anos, index=anos.index(hoje.year), key="plan_ano")
-    mes = st.selectbox("Mês", [(i+1,n) for i,n in enumerate(
-        ["Janeiro","Fevereiro","Março","Abril","Maio","Junho",
-         "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
-    )], index=hoje.month-1, key="plan_mes", format_func=lambda x: x[1])[0]
-
-    df_plan = load_plan_df(st, spreadsheet, DESP_CATS)()
-    linha = df_plan[(df_plan["Ano"].astype(int) == ano) & (df_plan["Mês"].astype(int) == mes)].index
-
-    if not linha.empty:
-        plan = df_plan.loc[linha[0]]
-        r_ric, r_hel, r_ext, r_inv = map(float, (
-            plan.get("Salário Ricardo",0), plan.get("Salário Helena",0),
-            plan.get("Extras",0), plan.get("Investimentos",0)))
-        orc_init = {c: plan.get(c,0) for c in DESP_CATS}
-    else:
-        r_ric = r_hel = r_ext = r_inv = 0.0
-        orc_init = {c: 0.0 for c in DESP_CATS}
+    mes = st.selectbox("Mês", [(i+1,n) for i,n in enumerate(_MESES)],
+                       index=hoje.month-1, key="plan_mes", format_func=lambda x: x[1])[0]
+
+    if df_metas is None:
+        df_metas = load_metas_df(st, spreadsheet)
+    if df_plan is None:
+        df_plan = load_plan_df(st, spreadsheet)
+    metas = metas_de(st, df_metas, df_plan)
+    plano = metas.mes(ano, mes)
 
     def to_float(s):
         return float(str(s).replace(".","").replace(",",".").replace("R$","").strip() or 0)
 
-    c1,c2,c3,c4 = st.columns(4)
-    r_ric = to_float(c1.text_input("Salário Ricardo", fmt_currency(r_ric), key="plan_sal_ric"))
-    r_hel = to_float(c2.text_input("Salário Helena", fmt_currency(r_hel), key="plan_sal_hel"))
-    r_ext = to_float(c3.text_input("Extras", fmt_currency(r_ext), key="plan_ext"))
-    r_inv = to_float(c4.text_input("Investimentos", fmt_currency(r_inv), key="plan_inv"))
+    receitas = {}
+    for col, nome, chave in zip(st.columns(4), RECEITAS_PLANO, _CHAVES_RECEITA):
+        receitas[nome] = to_float(col.text_input(nome, fmt_currency(plano.get(nome, 0.0)), key=chave))
 
-    rec_prev = r_ric + r_hel + r_ext + r_inv
+    rec_prev = sum(receitas.values())
     st.markdown(f"**Receita prevista:** {fmt_currency(rec_prev)}")
 
     st.markdown("#### Orçamento")
     cols = st.columns(4); orc = {}
     for i, cat in enumerate(DESP_CATS):
         with cols[i % 4]:
-            orc[cat] = st.number_input(cat, 0.0, value=float(orc_init[cat]), step=50.0, format="%.2f", key=f"orc_{cat}")
+            orc[cat] = st.number_input(cat, 0.0, value=float(plano.get(cat, 0.0)), step=50.0,
+                                       format="%.2f", key=f"orc_{cat}")
 
     desp_prev = sum(orc.values())
     st.markdown(f"**Gastos previstos:** {fmt_currency(desp_prev)}")
     st.markdown(f"**Saldo previsto:** {fmt_currency(rec_prev - desp_prev)}")
 
     if st.button("💾 Salvar Planejamento", key="plan_salvar"):
-        salvar_plan(ws_plan(spreadsheet, DESP_CATS), linha[0] if not linha.empty else None,
-                    [ano, mes, r_ric, r_hel, r_ext, r_inv] + [orc[c] for c in DESP_CATS])
-        st.success("Planejamento salvo!")
-        load_plan_df(st, spreadsheet, DESP_CATS).clear(); st.rerun()
+        novas, edicoes = metas.alteracoes(ano, mes, {**receitas, **orc})
+        if not novas and not edicoes:
+            st.info("Nenhuma meta alterada.")
+        else:
+            try:
+                salvar_metas(st, spreadsheet, novas, edicoes)
+            except FalhaEscrita as e:
+                st.error(str(e))
+            else:
+                st.success(f"Planejamento salvo! ({len(novas) + len(edicoes)} meta(s))"); st.rerun()
+
+    # Planejado × Realizado do ano inteiro: um groupby no cubo + merge com as metas
+    comp = comparativo_ano(metas, cubo_de(st, df), ano)
 
     st.markdown("---")
-    st.markdown("### Comparativo Planejado × Realizado")
-    if ano == sel_ano and mes == sel_mes:
-        comp = df_desp.groupby("Categoria")["Valor"].sum().abs().reset_index()
-        comp["Planejado"] = comp["Categoria"].map(orc)
-        comp["Diferença"] = comp["Planejado"] - comp["Valor"]
-        for col in ["Planejado","Valor","Diferença"]:
-            comp[col] = comp[col].apply(fmt_currency)
-        st.dataframe(comp, hide_index=True, use_container_width=True)
+    st.markdown(f"### Comparativo Planejado × Realizado — {_MESES[mes-1]}/{ano}")
+    do_mes = comp[comp["Mês"] == mes]
+    if do_mes.empty:
+        st.info("Sem metas nem despesas neste mês.")
     else:
-        st.info("Comparativo disponível apenas para o mês corrente.")
+        tbl = do_mes[["Categoria", "Planejado", "Realizado", "Diferença"]].sort_values("Realizado", ascending=False)
+        for col in ["Planejado", "Realizado", "Diferença"]:
+            tbl[col] = fmt_currency_series(tbl[col])
+        st.dataframe(tbl, hide_index=True, use_container_width=True)
+
+    st.markdown(f"### {ano}: diferença por categoria e mês")
+    if comp.empty:
+        st.info("Sem metas nem despesas neste ano.")
+        return
+    st.plotly_chart(_mapa(comp), use_container_width=True)
+    tot = comp.groupby("Mês")[["Planejado", "Realizado", "Diferença"]].sum().reindex(range(1, 13), fill_value=0.0)
+    st.dataframe(pd.DataFrame({"Mês": _MESES, **{c: fmt_currency_series(tot[c]).to_numpy() for c in tot.columns}}),
+                 hide_index=True, use_container_width=True)
+
+def abrir(st, ctx):
+    render(st, ctx["spreadsheet"], ctx["df"], ctx["dfmetas"], ctx["dfplan"])
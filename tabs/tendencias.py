@@ -0,0 +1,86 @@
+import pandas as pd
+from utils import fmt_currency, fmt_currency_series
+from trends import MEDIDAS, cubo_de, fluxo_acumulado, indicadores
+
+TITULO = "📈 Tendências"
+DEPENDE = ("df", "label_periodo")
+
+_MESES_PADRAO = 24
+
+def _mes(p):
+    return p.strftime("%m/%Y")
+
+def _pct(s):
+    return s.map(lambda v: f"{v:+.1f}%", na_action="ignore").fillna("—")
+
+def render(st, df, label_periodo, cubo=None):
+    st.subheader("📈 Tendências")
+    cubo = cubo if cubo is not None else cubo_de(st, df)
+    if len(cubo.meses) == 0:
+        st.info("Nenhum lançamento para analisar.")
+        return
+
+    # filtros e intervalo só fatiam o cubo (memorizado por versão dos dados)
+    c1, c2, c3 = st.columns(3)
+    filtros = {
+        "Categoria": c1.multiselect("Categoria", cubo.opcoes("Categoria"), key="tend_cats"),
+        "Responsável": c2.multiselect("Responsável", cubo.opcoes("Responsável"), key="tend_resps"),
+        "Método de Pagamento/Recebimento": c3.multiselect(
+            "Método", cubo.opcoes("Método de Pagamento/Recebimento"), key="tend_mets"),
+    }
+    c4, c5 = st.columns([1, 2])
+    medida = c4.radio("Medida", MEDIDAS, horizontal=True, key="tend_medida")
+    meses = list(cubo.meses)
+    atual = pd.Period(pd.to_datetime(label_periodo, format="%m/%Y"), freq="M")
+    fim_padrao = atual if atual in meses else meses[-1]
+    ini_padrao = meses[max(0, meses.index(fim_padrao) - _MESES_PADRAO + 1)]
+    ini, fim = c5.select_slider("Meses", meses, value=(ini_padrao, fim_padrao),
+                                format_func=_mes, key="tend_meses")
+
+    ind = indicadores(cubo.serie(medida, filtros)).loc[ini:fim]
+    ult = ind.iloc[-1]
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric(f"{medida} em {_mes(fim)}", fmt_currency(ult["Valor"]))
+    m2.metric("Média 3 meses", fmt_currency(ult["Média 3m"]))
+    m3.metric("Média 12 meses", fmt_currency(ult["Média 12m"]))
+    if pd.notna(ult["Ano anterior"]):
+        pct = ult["Variação a/a %"]
+        m4.metric(f"Contra {_mes(fim - 12)}", fmt_currency(ult["Variação a/a"]),
+                  delta=f"{pct:+.1f}%" if pd.notna(pct) else None,
+                  delta_color="inverse" if medida == "Despesas" else "normal")
+
+    grafico = ind[["Valor", "Média 3m", "Média 12m"]]
+    st.line_chart(grafico.set_axis(grafico.index.strftime("%Y-%m")))
+
+    st.markdown("**Mês a mês, contra o mesmo mês do ano anterior**")
+    tbl = ind.iloc[::-1]
+    st.dataframe(pd.DataFrame({
+        "Mês": tbl.index.strftime("%m/%Y"),
+        "Valor": fmt_currency_series(tbl["Valor"]),
+        "Média 3m": fmt_currency_series(tbl["Média 3m"]),
+        "Média 12m": fmt_currency_series(tbl["Média 12m"]),
+        "Ano anterior": fmt_currency_series(tbl["Ano anterior"]).fillna("—"),
+        "Variação a/a": _pct(tbl["Variação a/a %"]),
+    }), hide_index=True, use_container_width=True)
+
+    st.markdown("**Fluxo de caixa acumulado (receitas − despesas)**")
+    fluxo = fluxo_acumulado(cubo, ini, fim, filtros)
+    st.area_chart(fluxo["Acumulado"].set_axis(fluxo.index.strftime("%Y-%m")))
+    st.caption(f"Acumulado de {_mes(ini)} a {_mes(fim)}: {fmt_currency(fluxo['Acumulado'].iloc[-1])}")
+
+    if medida != "Resultado":
+        dim = st.radio("Comparar por", ["Categoria", "Responsável", "Método de Pagamento/Recebimento"],
+                       horizontal=True, key="tend_dim")
+        comp = cubo.por(dim, medida, ini, fim, filtros)
+        if not comp.empty:
+            st.markdown(f"**{medida} por {dim.split(' ')[0].lower()}: {_mes(ini)}–{_mes(fim)} "
+                        f"contra {_mes(ini - 12)}–{_mes(fim - 12)}**")
+            st.dataframe(pd.DataFrame({
+                dim: comp.index,
+                "Total": fmt_currency_series(comp["Total"]),
+                "Ano anterior": fmt_currency_series(comp["Ano anterior"]),
+                "Variação": _pct(comp["Variação %"]),
+            }), hide_index=True, use_container_width=True)
+
+def abrir(st, ctx):
+    render(st, ctx["df"], ctx["label_periodo"])
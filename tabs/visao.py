@@ -1,6 +1,9 @@
 
 from utils import fmt_currency, section
 
+TITULO = "📊 Visão Geral"
+DEPENDE = ("df_mes", "df_rec", "df_desp", "df_saldo", "label_periodo", "saldos")
+
 def render(st, df_mes, df_rec, df_desp, df_saldo,
            label_periodo, saldo_inicial, saldo_final, saldo_periodo,
            out_cc, variacao_caixa, saldo_final_caixa):
@@ -25,14 +28,14 @@ def render(st, df_mes, df_rec, df_desp, df_saldo,
         st.info("Nenhum registro neste período.")
     else:
         cmap_resp = {"Família":"#f4cccc", "Helena":"#b7e1cd", "Ricardo":"#4f81bd"}
-        s_cat = df_desp.groupby("Categoria")["Valor"].sum().abs().reset_index()
-        c_cat = df_desp.groupby("Categoria")["Valor"].count().reset_index(name="Lançamentos")
-        section(st, "Despesas por Categoria", s_cat, "Categoria", "Valor", c_cat, "Lançamentos")
-
-        s_met = df_desp.groupby("Método de Pagamento/Recebimento")["Valor"].sum().abs().reset_index()
-        c_met = df_desp.groupby("Método de Pagamento/Recebimento")["Valor"].count().reset_index(name="Lançamentos")
-        section(st, "Despesas por Método", s_met, "Método de Pagamento/Recebimento", "Valor", c_met, "Lançamentos")
+        versao = df_mes.attrs.get("versao")
+        chave = (versao, label_periodo, "desp") if versao else None
+        section(st, "Despesas por Categoria", df_desp, "Categoria", chave=chave)
+        section(st, "Despesas por Método", df_desp, "Método de Pagamento/Recebimento", chave=chave)
+        section(st, "Despesas por Responsável", df_desp, "Responsável", cmap=cmap_resp, chave=chave)
 
-        s_resp = df_desp.groupby("Responsável")["Valor"].sum().abs().reset_index()
-        c_resp = df_desp.groupby("Responsável")["Valor"].count().reset_index(name="Lançamentos")
-        section(st, "Despesas por Responsável", s_resp, "Responsável", "Valor", c_resp, "Lançamentos", cmap=cmap_resp)
+def abrir(st, ctx):
+    s = ctx["saldos"]
+    render(st, ctx["df_mes"], ctx["df_rec"], ctx["df_desp"], ctx["df_saldo"],
+           ctx["label_periodo"], s["saldo_inicial"], s["saldo_final"], s["saldo_periodo"],
+           s["out_cc"], s["variacao_caixa"], s["saldo_final_caixa"])
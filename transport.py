@@ -0,0 +1,186 @@
+# transport.py — sessão HTTP instrumentada para o cliente gspread
+#
+# Uma AuthorizedSession com pool de conexões ajustado, contagem/tempo de cada
+# chamada à API (marcada com o módulo que a originou: app, tabs.pagamentos...)
+# e um limitador por minuto, para ficar abaixo da cota do Sheets em vez de
+# descobrir o limite pelos 429.
+from __future__ import annotations
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import pandas as pd
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+
+_LIMITE_PADRAO = 55        # chamadas/min; a cota por usuário do Sheets é 60
+_POOL_PADRAO = 10
+_HISTORICO = 2000          # chamadas guardadas para o painel
+_INTERNOS = ("transport", "perfil", "sheets", "storage", "snapshot", "journal", "gspread", "google",
+             "requests", "urllib3", "concurrent", "threading", "streamlit")
+
+
+def _origem() -> str:
+    """Módulo do app que disparou a chamada (primeiro quadro fora das bibliotecas)."""
+    f = sys._getframe(2)
+    sheets = False
+    while f is not None:
+        nome = f.f_globals.get("__name__", "")
+        if nome == "__main__":
+            return "app"
+        if nome == "app" or nome.startswith("tabs."):
+            return nome
+        sheets = sheets or nome == "sheets"
+        if nome and not nome.startswith(_INTERNOS):
+            return nome
+        f = f.f_back
+    return "sheets" if sheets else "?"
+
+
+def _sessao_atual() -> Optional[str]:
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx is not None else None
+    except Exception:
+        return None
+
+
+def _tipo(metodo: str, url: str) -> str:
+    if "drive" in url:
+        return "drive"
+    return "leitura" if metodo.upper() == "GET" or url.endswith(":batchGet") else "escrita"
+
+
+class Estatisticas:
+    """Registro das chamadas feitas pelo processo (todas as sessões)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chamadas: Deque[Dict[str, Any]] = deque(maxlen=_HISTORICO)
+
+    def registrar(self, **chamada) -> None:
+        with self._lock:
+            self.chamadas.append(chamada)
+
+    def tabela(self, desde: float = float("-inf"), sessao: Optional[str] = None) -> pd.DataFrame:
+        with self._lock:
+            linhas = [c for c in self.chamadas
+                      if c["ts"] >= desde and (sessao is None or c["sessao"] in (sessao, None))]
+        return pd.DataFrame(linhas, columns=["ts", "sessao", "origem", "tipo", "metodo",
+                                             "url", "status", "ms", "espera_ms"])
+
+
+ESTATISTICAS = Estatisticas()
+
+
+class Limitador:
+    """Janela deslizante de 60 s: espera quando o limite por minuto foi atingido.
+
+    Um 429 com Retry-After (ou, sem ele, 10 s) pausa todas as chamadas do
+    processo até o prazo, em vez de cada thread insistir sozinha.
+    """
+
+    def __init__(self, por_minuto: int):
+        self.por_minuto = max(1, int(por_minuto))
+        self._lock = threading.Lock()
+        self._janela: Deque[float] = deque()
+        self._pausa_ate = 0.0
+
+    def aguardar(self) -> float:
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                while self._janela and agora - self._janela[0] >= 60:
+                    self._janela.popleft()
+                espera = max(self._pausa_ate - agora,
+                             60 - (agora - self._janela[0]) if len(self._janela) >= self.por_minuto else 0)
+                if espera <= 0:
+                    self._janela.append(agora)
+                    return agora - inicio
+            time.sleep(min(espera, 1.0))
+
+    def pausar(self, segundos: float) -> None:
+        with self._lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+
+
+class SessaoInstrumentada(AuthorizedSession):
+    """AuthorizedSession com pool ajustado, limitador e registro de cada chamada."""
+
+    def __init__(self, credentials, por_minuto: int = _LIMITE_PADRAO, pool: int = _POOL_PADRAO,
+                 estatisticas: Estatisticas = ESTATISTICAS, **kwargs):
+        super().__init__(credentials, **kwargs)
+        adaptador = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, pool_block=True)
+        self.mount("https://", adaptador)
+        self.limitador = Limitador(por_minuto)
+        self.estatisticas = estatisticas
+
+    def request(self, method, url, *args, **kwargs):
+        # a renovação do token passa por aqui também; só a API entra na conta
+        if "googleapis.com" not in str(url) or "oauth2" in str(url):
+            return super().request(method, url, *args, **kwargs)
+        origem = _origem()
+        espera = self.limitador.aguardar()
+        t0 = time.perf_counter()
+        status = None
+        try:
+            resp = super().request(method, url, *args, **kwargs)
+            status = resp.status_code
+            if status == 429:
+                try:
+                    self.limitador.pausar(float(resp.headers.get("Retry-After", 10)))
+                except ValueError:
+                    self.limitador.pausar(10)
+            return resp
+        finally:
+            self.estatisticas.registrar(
+                ts=time.time(), sessao=_sessao_atual(), origem=origem,
+                tipo=_tipo(method, str(url)), metodo=method.upper(),
+                url=str(url).split("?")[0], status=status,
+                ms=(time.perf_counter() - t0) * 1000, espera_ms=espera * 1000,
+            )
+
+
+# ------------------------- Painel de depuração ------------------------- #
+def marcar_rerun(st) -> None:
+    """Marca o início do rerun; o painel mostra as chamadas feitas a partir daqui."""
+    st.session_state["__api_rerun__"] = time.time()
+
+
+def _resumo(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns=["origem", "chamadas", "erros 429", "ms total", "ms médio"])
+    g = df.assign(e429=df["status"].eq(429)).groupby("origem")
+    return pd.DataFrame({
+        "chamadas": g.size(), "erros 429": g["e429"].sum(),
+        "ms total": g["ms"].sum().round(0), "ms médio": g["ms"].mean().round(0),
+    }).sort_values("chamadas", ascending=False).reset_index()
+
+
+def painel(st) -> None:
+    """Estatísticas da API na barra lateral ([debug] api = true ou ?debug=1)."""
+    ligado = False
+    try:
+        ligado = bool(st.secrets.get("debug", {}).get("api", False))
+    except Exception:
+        pass
+    ligado = ligado or st.query_params.get("debug") == "1"
+    if not ligado:
+        return
+    sessao = _sessao_atual()
+    rerun = ESTATISTICAS.tabela(st.session_state.get("__api_rerun__", time.time()), sessao)
+    minuto = ESTATISTICAS.tabela(time.time() - 60)
+    with st.sidebar.expander("🛠️ Chamadas à API do Google"):
+        st.caption(f"Neste rerun: {len(rerun)} chamada(s), {rerun['ms'].sum():.0f} ms")
+        st.dataframe(_resumo(rerun), hide_index=True, use_container_width=True)
+        st.caption(f"Último minuto (todas as sessões): {len(minuto)} chamada(s), "
+                   f"{int(minuto['status'].eq(429).sum())} erro(s) 429")
+        st.dataframe(_resumo(minuto), hide_index=True, use_container_width=True)
+        tudo = ESTATISTICAS.tabela()
+        if not tudo.empty:
+            st.caption("Desde o início do processo")
+            st.dataframe(_resumo(tudo), hide_index=True, use_container_width=True)
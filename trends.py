@@ -0,0 +1,128 @@
+# trends.py — cubo mensal do livro para as análises de vários meses
+#
+# Uma passada sobre o livro agrega Valor por (mês × Tipo × Categoria ×
+# Responsável × Método). O cubo tem no máximo alguns milhares de células, então
+# cada filtro ou mudança de intervalo na aba Tendências fatia o cubo, sem voltar
+# aos lançamentos.
+from __future__ import annotations
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from ledger import Ledger, ledger_de
+
+DIMENSOES = ["Categoria", "Responsável", "Método de Pagamento/Recebimento"]
+MEDIDAS = ["Despesas", "Receitas", "Resultado"]
+
+
+def _periodos(ordinais: np.ndarray) -> pd.PeriodIndex:
+    return pd.DatetimeIndex(np.asarray(ordinais, dtype=np.int64).astype("datetime64[M]")).to_period("M")
+
+
+class Cubo:
+    """Totais mensais por Tipo e pelas DIMENSOES, com o sinal do livro.
+
+    `meses` vai do primeiro ao último mês com lançamentos, sem buracos: as
+    séries saem contínuas e `shift(12)` é sempre o mesmo mês do ano anterior.
+    """
+
+    def __init__(self, livro: Ledger):
+        df = livro.df
+        mes = df["Data"].to_numpy(dtype="datetime64[M]")
+        ok = ~np.isnat(mes)
+        tipo = df["Tipo"].astype("string")
+        ok &= tipo.isin(["Despesa", "Receita"]).fillna(False).to_numpy()
+        base = df.loc[ok, ["Tipo"] + DIMENSOES]  # categóricas continuam categóricas
+        base = base.assign(mes=mes[ok].astype(np.int64),
+                           valor=df["Valor"].fillna(0.0).to_numpy(dtype="float64")[ok])
+        g = base.groupby(["mes", "Tipo"] + DIMENSOES, observed=True, dropna=False, sort=False)["valor"]
+        self.dados = pd.DataFrame({"valor": g.sum(), "lancamentos": g.size()}).reset_index()
+        # despesas em módulo: a medida "Despesas" soma gastos como números positivos
+        desp = (self.dados["Tipo"] == "Despesa").to_numpy()
+        self.dados["valor"] = np.where(desp, -self.dados["valor"], self.dados["valor"])
+        self.versao: Optional[str] = livro.versao
+        m = self.dados["mes"]
+        self._ini, self._fim = (int(m.min()), int(m.max())) if len(m) else (0, -1)
+        self.meses = _periodos(np.arange(self._ini, self._fim + 1))
+
+    def opcoes(self, dim: str) -> list:
+        return sorted(self.dados[dim].dropna().astype(str).unique().tolist())
+
+    def _filtrar(self, filtros: Optional[Dict[str, Iterable[str]]]) -> pd.DataFrame:
+        d = self.dados
+        for dim, vals in (filtros or {}).items():
+            vals = list(vals or [])
+            if vals:
+                d = d[d[dim].isin(vals)]
+        return d
+
+    def _por_mes(self, d: pd.DataFrame, tipo: str) -> pd.Series:
+        s = d.loc[d["Tipo"] == tipo].groupby("mes")["valor"].sum()
+        return pd.Series(s.reindex(np.arange(self._ini, self._fim + 1), fill_value=0.0).to_numpy(),
+                         index=self.meses)
+
+    def serie(self, medida: str, filtros: Optional[Dict[str, Iterable[str]]] = None) -> pd.Series:
+        """Total mensal da `medida` (ver MEDIDAS), em todos os meses do cubo."""
+        d = self._filtrar(filtros)
+        if medida == "Resultado":
+            return self._por_mes(d, "Receita") - self._por_mes(d, "Despesa")
+        return self._por_mes(d, "Receita" if medida == "Receitas" else "Despesa")
+
+    def por(self, dim: str, medida: str, ini: pd.Period, fim: pd.Period,
+            filtros: Optional[Dict[str, Iterable[str]]] = None) -> pd.DataFrame:
+        """Total de `dim` no intervalo [ini, fim] e no mesmo intervalo um ano antes."""
+        d = self._filtrar(filtros)
+        tipo = "Receita" if medida == "Receitas" else "Despesa"
+        d = d[d["Tipo"] == tipo]
+
+        def _soma(a: pd.Period, b: pd.Period) -> pd.Series:
+            no = d[(d["mes"] >= a.ordinal) & (d["mes"] <= b.ordinal)]
+            return no.groupby(dim, observed=True)["valor"].sum()
+
+        atual, anterior = _soma(ini, fim), _soma(ini - 12, fim - 12)
+        out = pd.DataFrame({"Total": atual, "Ano anterior": anterior}).fillna(0.0)
+        out["Variação"] = out["Total"] - out["Ano anterior"]
+        out["Variação %"] = (out["Variação"] / out["Ano anterior"].where(out["Ano anterior"] != 0)) * 100
+        out.index = out.index.astype(str)
+        return out.sort_values("Total", ascending=False)
+
+
+def indicadores(s: pd.Series) -> pd.DataFrame:
+    """Série mensal com médias móveis de 3 e 12 meses e variação contra o mesmo mês do ano anterior.
+
+    Calcular na série inteira e só depois recortar o intervalo faz a média de
+    12 meses do primeiro mês mostrado usar os meses anteriores a ele. A
+    variação % divide pelo módulo do ano anterior: no Resultado, de -100 para
+    +50 é +150%, não -150%.
+    """
+    ano_ant = s.shift(12)
+    return pd.DataFrame({
+        "Valor": s,
+        "Média 3m": s.rolling(3, min_periods=1).mean(),
+        "Média 12m": s.rolling(12, min_periods=1).mean(),
+        "Ano anterior": ano_ant,
+        "Variação a/a": s - ano_ant,
+        "Variação a/a %": (s - ano_ant) / ano_ant.abs().where(ano_ant != 0) * 100,
+    })
+
+
+def fluxo_acumulado(cubo: Cubo, ini: pd.Period, fim: pd.Period,
+                    filtros: Optional[Dict[str, Iterable[str]]] = None) -> pd.DataFrame:
+    """Receitas, despesas e resultado acumulado mês a mês dentro de [ini, fim]."""
+    rec = cubo.serie("Receitas", filtros).loc[ini:fim]
+    desp = cubo.serie("Despesas", filtros).loc[ini:fim]
+    return pd.DataFrame({"Receitas": rec, "Despesas": desp, "Acumulado": (rec - desp).cumsum()})
+
+
+def cubo_de(st, df) -> Cubo:
+    """Cubo do livro, reaproveitado enquanto a versão dos dados não mudar."""
+    livro = ledger_de(st, df)
+    if livro.versao is None:
+        return Cubo(livro)
+
+    @st.cache_resource(show_spinner=False, max_entries=4)
+    def _cubo(_livro, versao):
+        return Cubo(_livro)
+
+    return _cubo(livro, livro.versao)
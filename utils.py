@@ -1,5 +1,7 @@
 
-import re, unicodedata
+import html, re, threading, unicodedata
+from collections import OrderedDict
+import numpy as np
 import streamlit as st
 import pandas as pd
 
@@ -10,6 +12,35 @@ def fmt_currency(x):
     except Exception:
         return x
 
+def fmt_currency_series(s) -> pd.Series:
+    """fmt_currency para uma Series/array inteira: cada valor distinto passa
+    uma vez por fmt_currency (mesmo texto, mesmo arredondamento de "{:.2f}").
+    Entradas não numéricas saem como vieram; NaN continua NaN (e não "R$ nan")."""
+    s = s if isinstance(s, pd.Series) else pd.Series(s)
+    v = pd.Series(pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan), index=s.index)
+    ok = v.notna()
+    textos = {x: fmt_currency(x) for x in pd.unique(v[ok].to_numpy())}
+    return v.map(textos).where(ok, s).astype(object)
+
+def _esc(s: pd.Series) -> pd.Series:
+    return (s.astype(str).str.replace("&", "&amp;", regex=False)
+            .str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False))
+
+def tabela_html(df: pd.DataFrame, classes: dict | None = None, rodape: list | None = None) -> str:
+    """Tabela .tbl montada coluna a coluna (sem laço por linha).
+    `classes`: coluna -> classe da célula ('center', 'right'); `rodape`: valores da linha de total."""
+    classes = classes or {}
+    tds = [f"<td class='{classes[c]}'>" if classes.get(c) else "<td>" for c in df.columns]
+    cab = "".join(f"<th>{html.escape(str(c))}</th>" for c in df.columns)
+    corpo = pd.Series("<tr>", index=df.index, dtype=object)
+    for c, td in zip(df.columns, tds):
+        corpo = corpo + td + _esc(df[c]) + "</td>"
+    linhas = "</tr>".join(corpo.tolist()) + ("</tr>" if len(corpo) else "")
+    if rodape is not None:
+        linhas += "<tr>" + "".join(f"{td}<strong>{html.escape(str(v))}</strong></td>"
+                                   for td, v in zip(tds, rodape)) + "</tr>"
+    return f"<table class='tbl'><thead><tr>{cab}</tr></thead><tbody>{linhas}</tbody></table>"
+
 def _money_to_float(s: str) -> float:
     if s is None: return 0.0
     s = str(s)
@@ -19,6 +50,13 @@ def _money_to_float(s: str) -> float:
     try: return float(s) if s else 0.0
     except Exception: return 0.0
 
+def _money_to_float_series(s: pd.Series) -> pd.Series:
+    """_money_to_float na coluna inteira, com as operações de texto vetorizadas."""
+    t = s.astype("string")
+    t = t.str.replace(r"[^\d,.\-]", "", regex=True)
+    t = t.str.replace(r"\.(?=\d{3}(?:\D|$))", "", regex=True).str.replace(",", ".", regex=False)
+    return pd.to_numeric(t, errors="coerce").fillna(0.0).astype("float64")
+
 def money_input(label: str, value: float = 0.0, key: str | None = None) -> float:
     default = f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
     raw = st.text_input(label, default, key=key)
@@ -27,6 +65,10 @@ def money_input(label: str, value: float = 0.0, key: str | None = None) -> float
 def modal_or_expander(title: str):
     return getattr(st, "modal", lambda t: st.expander(t, expanded=True))(title)
 
+# texto livre (Descrição) em strings Arrow: um buffer contíguo em vez de um
+# objeto Python por célula
+_TEXTO = pd.StringDtype("pyarrow")
+
 def _norm_txt(s: pd.Series | str):
     if isinstance(s, pd.Series):
         t = s.astype("string").fillna("")
@@ -41,47 +83,92 @@ def _norm_txt(s: pd.Series | str):
 def parse_data_col(series: pd.Series) -> pd.Series:
     """Converte a coluna Data de forma tolerante a formatos variados e seriais."""
     s = series.astype(str).str.strip()
-    d = pd.to_datetime(s, dayfirst=True, errors="coerce", utc=False, infer_datetime_format=True)
+    # o formato que o app grava primeiro (rápido); o resto passa pela inferência
+    d = pd.to_datetime(s, format="%d/%m/%Y", errors="coerce")
+    outros = d.isna() & s.ne("")
+    if outros.any():
+        d.loc[outros] = pd.to_datetime(s.loc[outros], dayfirst=True, errors="coerce", utc=False)
     mask_serial = d.isna() & s.str.match(r"^\d+(\.0+)?$")
     if mask_serial.any():
         base = pd.Timestamp("1899-12-30")  # base correta para Excel/Sheets
         d.loc[mask_serial] = base + pd.to_timedelta(s.loc[mask_serial].astype(float), unit="D")
     return d
 
-def _ajusta_sinal(row):
-    v = row["Valor"]
-    if pd.isna(v): 
-        return v
-    return -abs(v) if row["Tipo"] in ["Despesa","Transferência"] else abs(v)
+def _ajusta_sinal(df: pd.DataFrame) -> pd.Series:
+    """Valor com o sinal do Tipo: despesas/transferências negativas, receitas positivas.
+    Saldos ficam como declarados (conta pode estar no negativo)."""
+    v = df["Valor"]
+    tipo = df["Tipo"].astype("string")
+    neg = tipo.isin(["Despesa", "Transferência"]).fillna(False).to_numpy()
+    pos = (tipo == "Receita").fillna(False).to_numpy()
+    return v.where(~neg, -v.abs()).where(~pos, v.abs())
 
-def section(st, title, sums_df, name_col, val_col, counts_df, cnt_name, cmap=None):
+# ---- seções com gráfico de pizza ---- #
+_MAX_FIGURAS = 64
+
+def _figuras(st):
+    @st.cache_resource(show_spinner=False)
+    def _store():
+        return {"lock": threading.Lock(), "lru": OrderedDict()}
+    return _store()
+
+def agrupar(dados, name_col, val_col="Valor", cnt_name="Lançamentos"):
+    """Total (em módulo) e quantidade por grupo, num groupby só."""
+    g = dados.groupby(name_col, observed=True)[val_col].agg(["sum", "count"])
+    return pd.DataFrame({name_col: g.index.astype(object), val_col: g["sum"].abs().to_numpy(),
+                         cnt_name: g["count"].to_numpy()})
+
+def _montar_secao(dados, name_col, val_col, cnt_name, cmap):
     import plotly.express as px
-    st.subheader(title)
-    if sums_df.empty:
-        st.info("Sem dados para exibir.")
-        return
+    tbl = agrupar(dados, name_col, val_col, cnt_name)
+    if tbl.empty:
+        return None, None
     palette = ["#4f81bd", "#6fa8dc", "#b7e1cd", "#f4cccc", "#fce5cd"]
-    fig = px.pie(sums_df, names=name_col, values=val_col, hole=0.35,
+    fig = px.pie(tbl, names=name_col, values=val_col, hole=0.35,
                  color_discrete_sequence=(palette if cmap is None else None),
                  color=name_col if cmap else None, color_discrete_map=cmap)
     fig.update_traces(textposition="inside", textinfo="percent+label")
     fig.update_layout(margin=dict(l=0, r=0, t=20, b=0))
 
+    tbl = tbl.sort_values(val_col, ascending=False)
+    total_cnt, total_val = tbl[cnt_name].sum(), tbl[val_col].sum()
+    # linhas e total pelo mesmo formatador
+    txt = fmt_currency_series(np.append(tbl[val_col].to_numpy(dtype="float64"), total_val))
+    tbl = pd.DataFrame({name_col: tbl[name_col], cnt_name: tbl[cnt_name],
+                        "Total": txt.iloc[:-1].to_numpy()})
+    tabela = tabela_html(tbl, {cnt_name: "center", "Total": "right"},
+                         rodape=["Total", total_cnt, txt.iloc[-1]])
+    return fig, tabela
+
+def section(st, title, dados, name_col, val_col="Valor", cnt_name="Lançamentos",
+            cmap=None, chave=None):
+    """Pizza + tabela de `dados` agrupados por `name_col`.
+
+    Com `chave` (ex.: (versão dos dados, período)), figura e tabela ficam num
+    LRU compartilhado entre sessões, indexado também pela seção e pelo cmap:
+    rerun sem mudança de dados ou de mês não refaz groupby nem px.pie.
+    """
+    st.subheader(title)
+    if chave is None:
+        fig, tabela = _montar_secao(dados, name_col, val_col, cnt_name, cmap)
+    else:
+        k = (chave, title, name_col, tuple(sorted((cmap or {}).items())))
+        store = _figuras(st)
+        with store["lock"]:
+            achado = store["lru"].get(k)
+            if achado is not None:
+                store["lru"].move_to_end(k)
+        if achado is None:
+            achado = _montar_secao(dados, name_col, val_col, cnt_name, cmap)
+            with store["lock"]:
+                store["lru"][k] = achado
+                while len(store["lru"]) > _MAX_FIGURAS:
+                    store["lru"].popitem(last=False)
+        fig, tabela = achado
+    if fig is None:
+        st.info("Sem dados para exibir.")
+        return
+
     col_graf, col_tbl = st.columns([3, 2], gap="medium")
     with col_graf: st.plotly_chart(fig, use_container_width=True)
-
-    tbl = sums_df.merge(counts_df, on=name_col).sort_values(val_col, ascending=False)
-    total_cnt, total_val = tbl[cnt_name].sum(), tbl[val_col].abs().sum()
-
-    html = ("<table class='tbl'><thead><tr>"
-            f"<th>{name_col}</th><th>{cnt_name}</th><th>Total</th>"
-            "</tr></thead><tbody>")
-    for _, r in tbl.iterrows():
-        html += (f"<tr><td>{r[name_col]}</td>"
-                 f"<td class='center'>{r[cnt_name]}</td>"
-                 f"<td class='right'>{fmt_currency(abs(r[val_col]))}</td></tr>")
-    html += (f"<tr><td><strong>Total</strong></td>"
-             f"<td class='center'><strong>{total_cnt}</strong></td>"
-             f"<td class='right'><strong>{fmt_currency(total_val)}</strong></td></tr>"
-             "</tbody></table>")
-    with col_tbl: st.markdown(html, unsafe_allow_html=True)
+    with col_tbl: st.markdown(tabela, unsafe_allow_html=True)